@@ -1,5 +1,4 @@
 import os
-import logging
 
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
@@ -7,51 +6,111 @@ from sqlalchemy.orm import DeclarativeBase
 from werkzeug.middleware.proxy_fix import ProxyFix
 from flask_login import LoginManager
 
-# Set up logging
-logging.basicConfig(level=logging.DEBUG)
+from config import Config, configs
+from db_routing import RoutingSession
 
 class Base(DeclarativeBase):
     pass
 
-# Initialize SQLAlchemy
-db = SQLAlchemy(model_class=Base)
+# Initialize extensions; they are bound to an app in create_app()
+db = SQLAlchemy(model_class=Base, session_options={'class_': RoutingSession})
 
-# Create the Flask app
-app = Flask(__name__)
+login_manager = LoginManager()
+login_manager.login_view = 'main.login'
+login_manager.login_message_category = 'info'
 
-# Set secret key from environment variable
-app.config['SECRET_KEY'] = 'thisthatthusthup'
 
-# Configure proxy settings
-app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
+def create_app(config=None):
+    """
+    Create and configure the Flask app.
 
-# Configure database connection using environment variables
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///nutritrack.db'
-app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
-    "pool_recycle": 300,
-    "pool_pre_ping": True,
-}
-app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    Args:
+        config: Config class, name of one in config.configs, or a mapping of overrides.
+                Defaults to the FLASK_CONFIG environment variable, then Config.
 
-# Initialize the app with the SQLAlchemy extension
-db.init_app(app)
+    Returns:
+        Flask app
+    """
+    app = Flask(__name__)
 
-# Set up login manager
-login_manager = LoginManager()
-login_manager.init_app(app)
-login_manager.login_view = 'login'
-login_manager.login_message_category = 'info'
+    app.config.from_object(Config)
+    config = config or os.environ.get('FLASK_CONFIG')
+    if isinstance(config, str):
+        app.config.from_object(configs[config])
+    elif isinstance(config, dict):
+        app.config.from_mapping(config)
+    elif config is not None:
+        app.config.from_object(config)
+
+    if app.config['PAGE_CACHE_DIR'] is None:
+        app.config['PAGE_CACHE_DIR'] = os.path.join(app.instance_path, 'page_cache')
+    if app.config['JINJA_BYTECODE_CACHE_DIR'] is None:
+        app.config['JINJA_BYTECODE_CACHE_DIR'] = os.path.join(app.instance_path, 'jinja_cache')
+
+    # Set up logging
+    from log_config import configure_logging
+    configure_logging(app)
+
+    # Configure proxy settings
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
+
+    # Initialize the app with the extensions
+    from engine_profiles import apply_engine_profile, install_sqlite_pragmas
+    from db_routing import READ_BIND, configure_read_bind, init_read_routing
+    apply_engine_profile(app)
+    configure_read_bind(app)
+    db.init_app(app)
+    with app.app_context():
+        for bind_key, engine in db.engines.items():
+            install_sqlite_pragmas(app, engine, read_only=bind_key == READ_BIND)
+    init_read_routing(app, db)
+    login_manager.init_app(app)
+
+    # Query count, SQL time, duration and response size per endpoint on /metrics
+    from metrics import init_metrics
+    init_metrics(app, db)
+
+    # Per-view query budgets and N+1 detection, on under TestingConfig
+    from query_guard import init_query_guard
+    init_query_guard(app, db)
+
+    # Admin-only cProfile runs of single requests, see profiling.py
+    from profiling import init_profiling
+    init_profiling(app, db)
+
+    # Server-Timing header with db, render, upstream and aggregate phases
+    from server_timing import init_server_timing
+    init_server_timing(app, db)
+
+    # Slow-query log: `flask slow-queries summary`
+    from slow_queries import init_slow_queries
+    init_slow_queries(app, db)
+
+    # Set up template bytecode cache and precompile command
+    from templating import init_templating
+    init_templating(app)
+
+    # Import models and routes
+    import models  # noqa: F401
+    from routes import bp
+    app.register_blueprint(bp)
+
+    # Daily totals and rolling statistics: `flask stats rebuild`
+    from rolling_stats import init_rolling_stats
+    init_rolling_stats(app, db)
+
+    # Schema migrations: `flask db upgrade`
+    from migrations import init_migrations
+    init_migrations(app, db)
+
+    # Cold log archival: `flask archive compact`
+    from archive import init_archive
+    init_archive(app)
 
-# Import models and routes
-with app.app_context():
-    from models import User, CustomItem, Meal, MealItem, FoodLog, ExerciseLog  # noqa: F401
-    import routes  # noqa: F401
-    
-    # Create all database tables
-    db.create_all()
+    return app
 
 # Load user for login manager
 @login_manager.user_loader
 def load_user(user_id):
-    from models import User
-    return User.query.get(int(user_id))
+    from user_cache import load_cached_user
+    return load_cached_user(int(user_id))
@@ -0,0 +1,259 @@
+'''
+Cold-data archival for HealthTracker
+Food and exercise logs older than ARCHIVE_AFTER_DAYS are compacted into one
+segment per user, kind and year: each column is stored as a packed array
+(dates as integers, nutrients as doubles, strings as indexes into a shared
+dictionary) and the whole segment is zlib-compressed. The *_logs_between
+helpers return hot rows and archived rows together, so reports do not need to
+know where a log lives.
+
+Usage: flask archive compact [--older-than-days N]
+'''
+import json
+import math
+import struct
+import zlib
+from array import array
+from collections import namedtuple
+from datetime import datetime, date, timedelta
+
+import click
+import pytz
+import sqlalchemy as sa
+from flask.cli import AppGroup
+
+from app import db
+from models import FoodLog, ExerciseLog, ArchiveSegment
+from page_cache import LRUBackend
+
+tz_ist = pytz.timezone('Asia/Kolkata')
+
+# (column, storage) per kind; storage is 'datetime', 'date', 'str', 'float' or 'int'
+FOOD_COLUMNS = [
+    ('date', 'datetime'), ('only_date', 'date'), ('meal_type', 'str'), ('description', 'str'),
+    ('name', 'str'), ('quantity', 'float'), ('calories', 'float'), ('protein', 'float'),
+    ('carbohydrates', 'float'), ('fiber', 'float'), ('sugar', 'float'), ('sodium', 'float'),
+    ('custom_item_id', 'int'), ('meal_id', 'int'),
+]
+EXERCISE_COLUMNS = [
+    ('date', 'datetime'), ('only_date', 'date'), ('name', 'str'), ('duration', 'int'),
+    ('calories_burned', 'float'), ('description', 'str'),
+]
+
+# Read-only stand-ins for archived rows, with the attributes reports use on FoodLog/ExerciseLog
+ArchivedFoodLog = namedtuple('ArchivedFoodLog', [name for name, _ in FOOD_COLUMNS])
+ArchivedExerciseLog = namedtuple('ArchivedExerciseLog', [name for name, _ in EXERCISE_COLUMNS])
+
+KINDS = {
+    'food': (FoodLog, FOOD_COLUMNS, ArchivedFoodLog),
+    'exercise': (ExerciseLog, EXERCISE_COLUMNS, ArchivedExerciseLog),
+}
+
+_TYPECODES = {'datetime': 'q', 'date': 'i', 'str': 'i', 'float': 'd', 'int': 'q'}
+_EPOCH = datetime(1970, 1, 1)
+_NULL_INT = -(2 ** 63)
+
+# Decoded segments keyed by (segment id, updated_at)
+_decoded_segments = LRUBackend(max_entries=128)
+
+
+def encode_segment(rows, columns):
+    """
+    Encode rows into a compressed columnar payload.
+
+    Args:
+        rows: Objects with an attribute per column
+        columns: FOOD_COLUMNS or EXERCISE_COLUMNS
+
+    Returns:
+        bytes
+    """
+    strings = []
+    string_ids = {}
+    blobs = []
+    header = {'rows': len(rows), 'strings': strings, 'columns': []}
+
+    for name, storage in columns:
+        values = array(_TYPECODES[storage])
+        for row in rows:
+            value = getattr(row, name)
+            if storage == 'datetime':
+                values.append(_NULL_INT if value is None else (value.replace(tzinfo=None) - _EPOCH) // timedelta(microseconds=1))
+            elif storage == 'date':
+                values.append(0 if value is None else value.toordinal())
+            elif storage == 'str':
+                if value is None:
+                    values.append(-1)
+                else:
+                    if value not in string_ids:
+                        string_ids[value] = len(strings)
+                        strings.append(value)
+                    values.append(string_ids[value])
+            elif storage == 'float':
+                values.append(math.nan if value is None else float(value))
+            else:
+                values.append(_NULL_INT if value is None else int(value))
+        blob = values.tobytes()
+        header['columns'].append([name, values.typecode, len(blob)])
+        blobs.append(blob)
+
+    header_bytes = json.dumps(header).encode('utf-8')
+    return zlib.compress(struct.pack('<I', len(header_bytes)) + header_bytes + b''.join(blobs))
+
+
+def decode_segment(payload, columns, row_type):
+    """Decode a payload produced by encode_segment() into row_type tuples."""
+    raw = zlib.decompress(payload)
+    (header_length,) = struct.unpack_from('<I', raw)
+    header = json.loads(raw[4:4 + header_length].decode('utf-8'))
+    strings = header['strings']
+    storage_of = dict(columns)
+
+    offset = 4 + header_length
+    decoded = {}
+    for name, typecode, length in header['columns']:
+        values = array(typecode)
+        values.frombytes(raw[offset:offset + length])
+        offset += length
+        storage = storage_of[name]
+        if storage == 'datetime':
+            decoded[name] = [None if v == _NULL_INT else _EPOCH + timedelta(microseconds=v) for v in values]
+        elif storage == 'date':
+            decoded[name] = [None if v == 0 else date.fromordinal(v) for v in values]
+        elif storage == 'str':
+            decoded[name] = [None if v < 0 else strings[v] for v in values]
+        elif storage == 'float':
+            decoded[name] = [None if math.isnan(v) else v for v in values]
+        else:
+            decoded[name] = [None if v == _NULL_INT else v for v in values]
+
+    return [row_type(*row) for row in zip(*(decoded[name] for name, _ in columns))]
+
+
+def _date_key(log):
+    return (log.date is None, log.date or _EPOCH)
+
+
+def _segment_rows(segment, kind):
+    key = (segment.id, segment.updated_at)
+    rows = _decoded_segments.get(key)
+    if rows is None:
+        _, columns, row_type = KINDS[kind]
+        rows = decode_segment(segment.payload, columns, row_type)
+        _decoded_segments.set(key, rows)
+    return rows
+
+
+def _archived_rows(user_id, kinds, start_date, end_date):
+    segments = ArchiveSegment.query.filter(
+        ArchiveSegment.user_id == user_id,
+        ArchiveSegment.kind.in_(kinds),
+        ArchiveSegment.first_date <= end_date,
+        ArchiveSegment.last_date >= start_date,
+    ).all()
+    rows = {kind: [] for kind in kinds}
+    for segment in segments:
+        rows[segment.kind].extend(
+            row for row in _segment_rows(segment, segment.kind) if start_date <= row.only_date <= end_date
+        )
+    return rows
+
+
+def archived_logs_between(kind, user_id, start_date, end_date):
+    """Archived rows of one kind whose only_date falls within [start_date, end_date]."""
+    return _archived_rows(user_id, [kind], start_date, end_date)[kind]
+
+
+def archived_logs_by_kind(user_id, start_date, end_date):
+    """Archived food and exercise rows within [start_date, end_date] from a single segment lookup, keyed by kind."""
+    return _archived_rows(user_id, list(KINDS), start_date, end_date)
+
+
+def _logs_between(kind, user_id, start_date, end_date):
+    model = KINDS[kind][0]
+    hot = model.query.filter(
+        model.user_id == user_id,
+        model.only_date >= start_date,
+        model.only_date <= end_date
+    ).order_by(model.date).all()
+    cold = archived_logs_between(kind, user_id, start_date, end_date)
+    if not cold:
+        return hot
+    return sorted(cold + hot, key=_date_key)
+
+
+def food_logs_between(user_id, start_date, end_date):
+    """Food logs (live and archived) for a user between two dates inclusive, ordered by date."""
+    return _logs_between('food', user_id, start_date, end_date)
+
+
+def exercise_logs_between(user_id, start_date, end_date):
+    """Exercise logs (live and archived) for a user between two dates inclusive, ordered by date."""
+    return _logs_between('exercise', user_id, start_date, end_date)
+
+
+def compact(cutoff, echo=click.echo):
+    """
+    Move logs dated before ``cutoff`` into archive segments.
+
+    Each (user, kind, year) is merged into its segment and the live rows are
+    deleted in a single transaction.
+
+    Returns:
+        Number of rows archived
+    """
+    archived = 0
+    for kind, (model, columns, row_type) in KINDS.items():
+        year = sa.extract('year', model.only_date)
+        pairs = db.session.query(model.user_id, year).filter(
+            model.only_date < cutoff
+        ).distinct().all()
+        db.session.rollback()
+
+        for user_id, segment_year in pairs:
+            segment_year = int(segment_year)
+            rows = model.query.filter(
+                model.user_id == user_id,
+                model.only_date >= date(segment_year, 1, 1),
+                model.only_date <= date(segment_year, 12, 31),
+                model.only_date < cutoff
+            ).order_by(model.date).all()
+            if not rows:
+                continue
+
+            segment = ArchiveSegment.query.filter_by(user_id=user_id, kind=kind, year=segment_year).first()
+            existing = decode_segment(segment.payload, columns, row_type) if segment else []
+            merged = sorted(existing + rows, key=_date_key)
+            if segment is None:
+                segment = ArchiveSegment(user_id=user_id, kind=kind, year=segment_year)
+                db.session.add(segment)
+            segment.payload = encode_segment(merged, columns)
+            segment.row_count = len(merged)
+            segment.first_date = min(log.only_date for log in merged)
+            segment.last_date = max(log.only_date for log in merged)
+            segment.updated_at = datetime.now(pytz.utc).replace(tzinfo=None)
+
+            ids = [row.id for row in rows]
+            db.session.execute(sa.delete(model).where(model.id.in_(ids)))
+            db.session.commit()
+
+            archived += len(ids)
+            echo(f'  {kind} {segment_year} user {user_id}: archived {len(ids)} rows ({segment.row_count} in segment)')
+    return archived
+
+
+def init_archive(app):
+    """Register the 'flask archive' command group."""
+    group = AppGroup('archive', help='Manage cold log archives.')
+
+    @group.command('compact')
+    @click.option('--older-than-days', type=click.IntRange(min=31), default=None,
+                  help='Archive logs older than this many days (defaults to ARCHIVE_AFTER_DAYS).')
+    def compact_command(older_than_days):
+        """Move old food and exercise logs into archive segments."""
+        days = older_than_days or app.config['ARCHIVE_AFTER_DAYS']
+        cutoff = datetime.now(tz_ist).date() - timedelta(days=days)
+        count = compact(cutoff)
+        click.echo(f'Archived {count} rows dated before {cutoff}')
+
+    app.cli.add_command(group)
@@ -0,0 +1,146 @@
+'''
+Concurrency benchmark for the SQLite engine profile
+Runs reader threads (weekly report style aggregation) alongside writer threads
+(NLP style food log inserts) against a scratch database, once with SQLite's
+default rollback journal and once with the tuned WAL profile, and reports
+throughput, latency and lock errors for each.
+
+Usage: python benchmarks/concurrency.py [--readers 8] [--writers 2] [--seconds 10]
+'''
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func  # noqa: E402
+from sqlalchemy.exc import OperationalError  # noqa: E402
+
+from app import create_app, db  # noqa: E402
+from migrations import upgrade  # noqa: E402
+from models import User, FoodLog  # noqa: E402
+
+SCENARIOS = {
+    'rollback-journal': {'SQLITE_JOURNAL_MODE': 'DELETE', 'SQLITE_SYNCHRONOUS': 'FULL'},
+    'wal-tuned': {},
+}
+
+USERS = 20
+DAYS = 90
+
+
+def seed(app):
+    with app.app_context():
+        upgrade(db.engine, db.metadata, echo=lambda message: None)
+        rng = random.Random(1)
+        today = datetime.now().date()
+        for i in range(USERS):
+            user = User(username=f'bench{i}', email=f'bench{i}@example.com')
+            user.set_password('benchmark')
+            db.session.add(user)
+            db.session.flush()
+            for day in range(DAYS):
+                logged = today - timedelta(days=day)
+                for _ in range(3):
+                    db.session.add(FoodLog(user_id=user.id, name='meal', quantity=1, date=datetime.combine(logged, datetime.min.time()),
+                                           only_date=logged, calories=rng.uniform(100, 900), protein=20,
+                                           carbohydrates=50, fiber=5, sugar=10, sodium=400))
+        db.session.commit()
+
+
+def reader(app, stop, latencies, errors):
+    rng = random.Random()
+    today = datetime.now().date()
+    with app.app_context():
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                db.session.query(FoodLog.only_date, func.sum(FoodLog.calories)).filter(
+                    FoodLog.user_id == rng.randint(1, USERS),
+                    FoodLog.only_date >= today - timedelta(days=6),
+                ).group_by(FoodLog.only_date).all()
+                db.session.rollback()
+                latencies.append(time.perf_counter() - start)
+            except OperationalError:
+                db.session.rollback()
+                errors.append(1)
+
+
+def writer(app, stop, latencies, errors):
+    rng = random.Random()
+    with app.app_context():
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                db.session.add(FoodLog(user_id=rng.randint(1, USERS), name='snack', quantity=1, date=datetime.now(),
+                                       only_date=datetime.now().date(), calories=150, protein=3,
+                                       carbohydrates=20, fiber=1, sugar=8, sodium=90))
+                db.session.commit()
+                latencies.append(time.perf_counter() - start)
+            except OperationalError:
+                db.session.rollback()
+                errors.append(1)
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def run_scenario(overrides, args):
+    with tempfile.TemporaryDirectory() as tmp:
+        config = {'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+                  'LOG_LEVEL': 'WARNING', 'PAGE_CACHE_BACKEND': 'null', **overrides}
+        app = create_app(config)
+        seed(app)
+
+        stop = threading.Event()
+        results = {'read': ([], []), 'write': ([], [])}
+        threads = [threading.Thread(target=reader, args=(app, stop, *results['read'])) for _ in range(args.readers)]
+        threads += [threading.Thread(target=writer, args=(app, stop, *results['write'])) for _ in range(args.writers)]
+        for thread in threads:
+            thread.start()
+        time.sleep(args.seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        with app.app_context():
+            db.engine.dispose()
+
+        report = {}
+        for kind, (latencies, errors) in results.items():
+            report[kind] = {
+                'ops_per_sec': len(latencies) / args.seconds,
+                'p50_ms': statistics.median(latencies) * 1000 if latencies else 0.0,
+                'p95_ms': percentile(latencies, 95) * 1000,
+                'errors': len(errors),
+            }
+        return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=10)
+    args = parser.parse_args()
+
+    results = {name: run_scenario(overrides, args) for name, overrides in SCENARIOS.items()}
+    print(f"{'scenario':<18}{'kind':<7}{'ops/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'errors':>8}")
+    for name, report in results.items():
+        for kind, row in report.items():
+            print(f"{name:<18}{kind:<7}{row['ops_per_sec']:>10.1f}{row['p50_ms']:>10.2f}{row['p95_ms']:>10.2f}{row['errors']:>8}")
+    print(json.dumps(results))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,286 @@
+'''
+Synthetic dataset generator for HealthTracker benchmarks
+Writes users with custom food items, meals and a history of food and exercise
+logs into a database, using bulk inserts inside large transactions.
+Distributions aim to look like real use:
+- users log on most days, but not all, and adherence varies from user to user
+- breakfast, lunch, dinner and snacks each have their own time-of-day spread
+- each user keeps returning to a few favourite custom items (Zipf-like reuse)
+- some entries are saved meals, and exercise frequency and intensity vary per user
+
+The same --seed always produces the same dataset. Every user's password is
+'benchmark', and the emails are user<N>@example.com.
+
+Usage: python benchmarks/dataset.py --database sqlite:///instance/bench.db
+           [--users 10000] [--days 730] [--seed 1]
+'''
+import argparse
+import math
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytz  # noqa: E402
+import sqlalchemy as sa  # noqa: E402
+from werkzeug.security import generate_password_hash  # noqa: E402
+
+from app import create_app, db  # noqa: E402
+from migrations import upgrade  # noqa: E402
+from models import User, CustomItem, Meal, MealItem, FoodLog, ExerciseLog  # noqa: E402
+
+PASSWORD = 'benchmark'
+
+# name, unit, calories, protein, carbohydrates, fiber, sugar, sodium per unit
+CATALOG = [
+    ('oats', 'cup', 307, 10.7, 54.8, 8.2, 0.8, 5),
+    ('poha', 'cup', 180, 3.5, 34, 1.8, 1.5, 280),
+    ('idli', 'piece', 58, 1.6, 12, 0.6, 0.1, 65),
+    ('dosa', 'piece', 168, 3.9, 29, 1.1, 0.5, 380),
+    ('boiled egg', 'piece', 78, 6.3, 0.6, 0, 0.6, 62),
+    ('whole wheat bread', 'slice', 81, 4, 13.8, 1.9, 1.4, 146),
+    ('milk', 'cup', 122, 8.1, 11.7, 0, 12.3, 100),
+    ('greek yogurt', 'cup', 130, 23, 9, 0, 7, 75),
+    ('banana', 'piece', 105, 1.3, 27, 3.1, 14, 1),
+    ('apple', 'piece', 95, 0.5, 25, 4.4, 19, 2),
+    ('chapati', 'piece', 120, 3.1, 18, 2, 0.4, 190),
+    ('brown rice', 'cup', 216, 5, 44.8, 3.5, 0.7, 10),
+    ('white rice', 'cup', 205, 4.3, 44.5, 0.6, 0.1, 2),
+    ('dal', 'cup', 230, 18, 40, 15.6, 3.6, 4),
+    ('rajma', 'cup', 210, 13, 37, 11, 1, 350),
+    ('chole', 'cup', 270, 14.5, 45, 12.5, 8, 400),
+    ('paneer', 'piece', 265, 18.3, 1.2, 0, 1.2, 18),
+    ('chicken breast', 'piece', 165, 31, 0, 0, 0, 74),
+    ('chicken curry', 'cup', 290, 25, 8, 2, 3, 620),
+    ('fish fillet', 'piece', 206, 22, 0, 0, 0, 61),
+    ('mixed salad', 'cup', 35, 2, 7, 2.5, 3, 25),
+    ('sabzi', 'cup', 150, 4, 18, 5, 6, 300),
+    ('curd rice', 'cup', 250, 7, 38, 1, 4, 420),
+    ('almonds', 'piece', 7, 0.3, 0.2, 0.1, 0, 0),
+    ('peanut butter', 'tbsp', 94, 4, 3, 1, 1.5, 73),
+    ('protein shake', 'cup', 160, 25, 6, 1, 3, 180),
+    ('samosa', 'piece', 262, 3.5, 24, 2, 1, 420),
+    ('biscuits', 'piece', 45, 0.6, 6.5, 0.2, 2, 35),
+    ('masala chai', 'cup', 105, 3, 15, 0, 12, 40),
+    ('coffee', 'cup', 60, 3, 6, 0, 5, 40),
+]
+NUTRIENTS = ('calories', 'protein', 'carbohydrates', 'fiber', 'sugar', 'sodium')
+
+# meal_type -> (chance of being logged on an active day, mean minutes after midnight, spread in minutes)
+MEAL_TIMES = {
+    'breakfast': (0.82, 8 * 60 + 30, 60),
+    'lunch': (0.9, 13 * 60 + 15, 45),
+    'dinner': (0.88, 20 * 60 + 45, 60),
+}
+SNACKS_PER_DAY = 0.9
+
+# name, MET
+EXERCISES = [('walking', 3.5), ('running', 9.8), ('cycling', 7.5), ('yoga', 2.5), ('swimming', 6), ('weight training', 5)]
+
+GENDERS = ['male', 'female', 'other']
+ACTIVITY_LEVELS = [('sedentary', 30), ('light', 30), ('moderate', 25), ('active', 10), ('very_active', 5)]
+MOTIVES = [('lose', 50), ('maintain', 30), ('gain', 20)]
+
+tz_ist = pytz.timezone('Asia/Kolkata')
+
+
+def weighted(rng, pairs):
+    return rng.choices([value for value, _ in pairs], [weight for _, weight in pairs])[0]
+
+
+class Generator:
+    """Builds rows for one user at a time and bulk-inserts them in batches."""
+
+    def __init__(self, connection, seed, days, batch_size, today):
+        self.connection = connection
+        self.seed = seed
+        self.days = days
+        self.batch_size = batch_size
+        self.today = today
+        self.password_hash = generate_password_hash(PASSWORD)
+        self.next_id = {CustomItem: 1, Meal: 1}
+        self.pending = {model: [] for model in (User, CustomItem, Meal, MealItem, FoodLog, ExerciseLog)}
+        self.counts = dict.fromkeys(self.pending, 0)
+
+    def add(self, model, row):
+        rows = self.pending[model]
+        rows.append(row)
+        if len(rows) >= self.batch_size:
+            self.flush(model)
+
+    def flush(self, model=None):
+        # Parents first, so foreign keys are satisfied on databases that enforce them
+        for current in ([model] if model else self.pending):
+            rows = self.pending[current]
+            if rows:
+                if current is not User:
+                    self.flush_parents(current)
+                self.connection.execute(sa.insert(current), rows)
+                self.counts[current] += len(rows)
+                self.pending[current] = []
+
+    def flush_parents(self, model):
+        parents = {CustomItem: [User], Meal: [User], MealItem: [Meal, CustomItem],
+                   FoodLog: [User, CustomItem, Meal], ExerciseLog: [User]}[model]
+        for parent in parents:
+            self.flush(parent)
+
+    def take_id(self, model):
+        self.next_id[model] += 1
+        return self.next_id[model] - 1
+
+    def user(self, user_id):
+        # Seeded per user, so the data does not depend on batch or transaction sizes
+        rng = random.Random(self.seed * 1_000_003 + user_id)
+        gender = rng.choices(GENDERS, [48, 48, 4])[0]
+        height = rng.gauss(172 if gender == 'male' else 160, 7)
+        bmi = min(max(rng.lognormvariate(math.log(24), 0.15), 16), 45)
+        weight = round(bmi * (height / 100) ** 2, 1)
+        history = rng.randint(min(30, self.days), self.days)
+        signup = self.today - timedelta(days=history - 1)
+        self.add(User, dict(
+            id=user_id, username=f'user{user_id}', email=f'user{user_id}@example.com',
+            password_hash=self.password_hash, created_at=datetime.combine(signup, datetime.min.time()),
+            weight=weight, height=round(height, 1), age=rng.randint(18, 70), gender=gender,
+            activity_level=weighted(rng, ACTIVITY_LEVELS), motive=weighted(rng, MOTIVES),
+        ))
+
+        # Custom items, ranked by how much this user likes them
+        items = []
+        for entry in rng.sample(CATALOG, min(len(CATALOG), max(3, int(rng.lognormvariate(math.log(10), 0.5))))):
+            item_id = self.take_id(CustomItem)
+            items.append((item_id, entry))
+            name, unit, *nutrients = entry
+            self.add(CustomItem, dict(id=item_id, user_id=user_id, name=name, unit=unit, quantity=1,
+                                      created_at=datetime.combine(signup, datetime.min.time()),
+                                      **dict(zip(NUTRIENTS, nutrients))))
+        preference = [1 / (rank + 1) ** 1.2 for rank in range(len(items))]
+
+        # Saved meals made of a few favourite items
+        meals = []
+        for index in range(rng.choices(range(7), [25, 20, 20, 15, 10, 5, 5])[0]):
+            meal_id = self.take_id(Meal)
+            # The meal goes in before its items, so a batch flush that splits them still finds the parent
+            self.add(Meal, dict(id=meal_id, user_id=user_id, name=f'meal {index + 1}',
+                                created_at=datetime.combine(signup, datetime.min.time())))
+            totals = dict.fromkeys(NUTRIENTS, 0.0)
+            for item_id, (_, _, *nutrients) in rng.sample(items, min(len(items), rng.randint(2, 5))):
+                quantity = rng.choice([0.5, 1, 1, 1.5, 2])
+                self.add(MealItem, dict(meal_id=meal_id, custom_item_id=item_id, quantity=quantity))
+                for field, amount in zip(NUTRIENTS, nutrients):
+                    totals[field] += amount * quantity
+            meals.append((meal_id, f'meal {index + 1}', totals))
+
+        adherence = rng.betavariate(5, 2)
+        exercise_rate = rng.betavariate(1.5, 3)
+        favourite_exercises = rng.sample(EXERCISES, 2)
+        for offset in range(history):
+            day = signup + timedelta(days=offset)
+            if rng.random() < adherence:
+                self.food_day(rng, user_id, day, items, preference, meals)
+            if rng.random() < exercise_rate:
+                self.exercise(rng, user_id, day, weight, favourite_exercises)
+
+    def food_day(self, rng, user_id, day, items, preference, meals):
+        midnight = datetime.combine(day, datetime.min.time())
+        entries = []
+        for meal_type, (chance, mean, spread) in MEAL_TIMES.items():
+            if rng.random() < chance:
+                entries.append((meal_type, min(max(rng.gauss(mean, spread), 0), 1439)))
+        snacks = 0
+        while rng.random() < SNACKS_PER_DAY / (snacks + 1.5):
+            entries.append(('snack', rng.uniform(10 * 60, 23 * 60)))
+            snacks += 1
+
+        for meal_type, minute in entries:
+            moment = midnight + timedelta(minutes=minute)
+            if meals and meal_type != 'snack' and rng.random() < 0.12:
+                meal_id, name, totals = rng.choice(meals)
+                self.add(FoodLog, dict(user_id=user_id, date=moment, only_date=day, meal_type=meal_type,
+                                       name=name, quantity=1, custom_item_id=None, meal_id=meal_id,
+                                       description=f'Added meal: {name}', **totals))
+                continue
+            for _ in range(rng.choices([1, 2, 3], [50, 35, 15])[0]):
+                item_id, (name, unit, *nutrients) = rng.choices(items, preference)[0]
+                quantity = rng.choice([0.5, 1, 1, 1, 1.5, 2, 3])
+                from_item = rng.random() < 0.6
+                self.add(FoodLog, dict(
+                    user_id=user_id, date=moment, only_date=day, meal_type=meal_type, name=name,
+                    quantity=quantity, custom_item_id=item_id if from_item else None, meal_id=None,
+                    description=None if from_item else f'{quantity:g} {unit} {name}',
+                    **{field: round(amount * quantity, 2) for field, amount in zip(NUTRIENTS, nutrients)},
+                ))
+
+    def exercise(self, rng, user_id, day, weight, favourites):
+        name, met = rng.choice(favourites)
+        duration = int(min(max(rng.lognormvariate(math.log(35), 0.4), 10), 180))
+        moment = datetime.combine(day, datetime.min.time()) + timedelta(minutes=rng.choice([6.5, 7, 18, 19]) * 60)
+        self.add(ExerciseLog, dict(user_id=user_id, date=moment, only_date=day, name=name, duration=duration,
+                                   calories_burned=round(met * weight * duration / 60, 1),
+                                   description=f'{name} for {duration} minutes'))
+
+
+def generate(database_url, users, days, seed=1, batch_size=10000, users_per_transaction=500, echo=print):
+    """
+    Create the schema if needed and fill an empty database with synthetic users.
+
+    Args:
+        database_url: SQLAlchemy URL of the target database
+        users: Number of users to create
+        days: Longest history, in days up to today
+        seed: Random seed; the same seed gives the same data
+        batch_size: Rows per bulk insert statement
+        users_per_transaction: Users written per committed transaction
+        echo: Progress callback
+
+    Returns:
+        Dict of row counts per table
+    """
+    app = create_app({'SQLALCHEMY_DATABASE_URI': database_url, 'LOG_LEVEL': 'WARNING', 'PAGE_CACHE_BACKEND': 'null'})
+    with app.app_context():
+        upgrade(db.engine, db.metadata, echo=lambda message: None)
+        engine = db.engine
+        with engine.connect() as connection:
+            if connection.execute(sa.select(sa.func.count()).select_from(User)).scalar():
+                raise SystemExit(f'{database_url} already has users; generate into an empty database')
+            if engine.dialect.name == 'sqlite':
+                # Generated data can be regenerated, so trade durability for speed
+                connection.exec_driver_sql('PRAGMA synchronous=OFF')
+
+            generator = Generator(connection, seed, days, batch_size, datetime.now(tz_ist).date())
+            start = time.perf_counter()
+            for user_id in range(1, users + 1):
+                generator.user(user_id)
+                if user_id % users_per_transaction == 0 or user_id == users:
+                    generator.flush()
+                    connection.commit()
+                    rows = sum(generator.counts.values())
+                    echo(f'  {user_id}/{users} users, {rows} rows, {rows / (time.perf_counter() - start):.0f} rows/s')
+        engine.dispose()
+    return {model.__tablename__: count for model, count in generator.counts.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database', required=True, help='SQLAlchemy URL, e.g. sqlite:///instance/bench.db')
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--days', type=int, default=730)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--batch-size', type=int, default=10000)
+    parser.add_argument('--users-per-transaction', type=int, default=500)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    counts = generate(args.database, args.users, args.days, seed=args.seed, batch_size=args.batch_size,
+                      users_per_transaction=args.users_per_transaction)
+    elapsed = time.perf_counter() - start
+    for table, count in counts.items():
+        print(f'{table:<14}{count:>12}')
+    print(f'{sum(counts.values())} rows in {elapsed:.1f}s')
+
+
+if __name__ == '__main__':
+    main()
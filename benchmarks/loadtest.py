@@ -0,0 +1,321 @@
+'''
+End-to-end load test for HealthTracker
+Seeds a scratch database with N users, each with up to M days of food and
+exercise logs, custom items and meals (see dataset.py). It then serves the app (in-process, or under
+gunicorn with wsgi.py) with the NLP endpoints pointed at a local stub. C
+virtual users log in and drive weighted scenarios for a fixed duration:
+dashboard, NLP food and exercise logging, daily/weekly/monthly reports, chart
+data and autocomplete.
+
+Prints p50/p95/p99 latency, throughput and error rate per route and writes
+the same figures as JSON, for comparing runs against each other.
+
+Usage: python benchmarks/loadtest.py [--users 20] [--days 90] [--concurrency 8]
+           [--duration 30] [--server werkzeug|gunicorn] [--workers 2] [--threads 4]
+           [--upstream-latency-ms 50] [--output loadtest.json]
+'''
+import argparse
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from werkzeug.serving import make_server  # noqa: E402
+
+from app import create_app  # noqa: E402
+from dataset import CATALOG, EXERCISES, PASSWORD, generate  # noqa: E402
+
+# Scenario name -> relative weight
+SCENARIOS = {
+    'dashboard': 25,
+    'log_food': 8,
+    'log_exercise': 4,
+    'daily_report': 10,
+    'weekly_report': 15,
+    'monthly_report': 10,
+    'chart_data': 15,
+    'autocomplete': 13,
+}
+
+CSRF_PATTERN = re.compile(r'name="csrf_token" type="hidden" value="([^"]+)"')
+
+
+class StubUpstream(BaseHTTPRequestHandler):
+    """Answers the food parser and exercise API with canned results after a fixed delay."""
+    latency = 0.0
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        time.sleep(self.latency)
+        if self.path.endswith('/process_text'):
+            name, _, calories, protein, carbohydrates, fiber, sugar, sodium = random.choice(CATALOG)
+            payload = {'found': {name: {'value': '1 serving', 'calories': calories, 'protein': protein,
+                                        'carbohydrates': carbohydrates, 'fiber': fiber, 'sugar': sugar,
+                                        'sodium': sodium, 'quantity': 1}},
+                       'missing': []}
+        else:
+            name, met = random.choice(EXERCISES)
+            payload = {'exercises': [{'user_input': name, 'duration_min': 30, 'nf_calories': round(met * 70 / 2, 1),
+                                      'query': body.get('query')}]}
+        data = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub(latency_ms):
+    StubUpstream.latency = latency_ms / 1000
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubUpstream)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}'
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_app(args, settings):
+    """Serve the app on a free port; returns (base_url, stop callable)."""
+    port = free_port()
+    if args.server == 'gunicorn':
+        env = dict(os.environ, FLASK_CONFIG='production', GUNICORN_BIND=f'127.0.0.1:{port}',
+                   WEB_CONCURRENCY=str(args.workers), GUNICORN_THREADS=str(args.threads),
+                   **{key: str(value) for key, value in settings.items()})
+        process = subprocess.Popen([sys.executable, '-m', 'gunicorn', 'wsgi:app'], cwd=ROOT, env=env,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        def stop():
+            process.terminate()
+            process.wait()
+    else:
+        app = create_app({'SQLALCHEMY_DATABASE_URI': settings['DATABASE_URL'],
+                          'NLP_FOOD_PARSER_URL': settings['NLP_FOOD_PARSER_URL'],
+                          'NLP_EXERCISE_URL': settings['NLP_EXERCISE_URL'],
+                          'PAGE_CACHE_DIR': settings['PAGE_CACHE_DIR'],
+                          'LOG_LEVEL': settings['LOG_LEVEL'],
+                          'LOG_LEVELS': 'werkzeug=WARNING'})
+        server = make_server('127.0.0.1', port, app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        stop = server.shutdown
+
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            requests.get(base_url + '/login', timeout=1)
+            return base_url, stop
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    stop()
+    raise RuntimeError('The app did not start listening within 30 seconds')
+
+
+class VirtualUser:
+    """One logged-in browser session picking weighted scenarios until the deadline."""
+
+    def __init__(self, base_url, email, rng, record):
+        self.base_url = base_url
+        self.email = email
+        self.rng = rng
+        self.record = record
+        self.http = requests.Session()
+        self.csrf_token = None
+
+    def request(self, route, method, path, expected=(200,), **kwargs):
+        start = time.perf_counter()
+        try:
+            response = self.http.request(method, self.base_url + path, allow_redirects=False, timeout=30, **kwargs)
+            ok = response.status_code in expected
+        except requests.RequestException:
+            response, ok = None, False
+        self.record(route, time.perf_counter() - start, ok)
+        return response
+
+    def login(self):
+        page = self.http.get(self.base_url + '/login', timeout=30).text
+        self.csrf_token = CSRF_PATTERN.search(page).group(1)
+        response = self.request('POST /login', 'POST', '/login', expected=(302,),
+                                data={'email': self.email, 'password': PASSWORD, 'csrf_token': self.csrf_token})
+        if response is None or not response.headers.get('Location', '').endswith('/dashboard'):
+            raise RuntimeError(f'Login failed for {self.email}')
+
+    def dashboard(self):
+        self.request('GET /dashboard', 'GET', '/dashboard')
+
+    def log_food(self):
+        self.request('POST /process_query', 'POST', '/process_query', expected=(302,),
+                     data={'query': 'a bowl of dal with two chapatis', 'csrf_token': self.csrf_token})
+
+    def log_exercise(self):
+        self.request('POST /process_exercise_query', 'POST', '/process_exercise_query', expected=(302,),
+                     data={'query': 'ran for 30 minutes', 'csrf_token': self.csrf_token})
+
+    def daily_report(self):
+        day = datetime.now().date() - timedelta(days=self.rng.randint(0, 30))
+        self.request('GET /daily', 'GET', f'/daily?date={day.isoformat()}')
+
+    def weekly_report(self):
+        start = datetime.now().date() - timedelta(days=7 * self.rng.randint(0, 12))
+        self.request('GET /weekly', 'GET', f'/weekly?start_date={start.isoformat()}')
+
+    def monthly_report(self):
+        month = datetime.now().date().replace(day=1) - timedelta(days=28 * self.rng.randint(0, 3))
+        self.request('GET /monthly', 'GET', f'/monthly?month={month.month}&year={month.year}')
+
+    def chart_data(self):
+        period = self.rng.choice(['week', 'month', 'year'])
+        self.request('GET /api/chart_data', 'GET', f'/api/chart_data?period={period}')
+
+    def autocomplete(self):
+        # One request per keystroke once the search box has two characters
+        name = self.rng.choice(CATALOG)[0]
+        for length in range(2, min(len(name), 5) + 1):
+            self.request('GET /search_food_items', 'GET', '/search_food_items', params={'query': name[:length]})
+
+    def run(self, ready, window, think_time):
+        names = list(SCENARIOS)
+        weights = [SCENARIOS[name] for name in names]
+        try:
+            self.login()
+        except Exception:
+            ready.abort()
+            raise
+        # The load window opens once every virtual user has logged in
+        ready.wait()
+        deadline = window['deadline']
+        while time.time() < deadline:
+            getattr(self, self.rng.choices(names, weights)[0])()
+            if think_time:
+                time.sleep(think_time)
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def summarize(samples, elapsed):
+    routes = {}
+    for route, entries in sorted(samples.items()):
+        latencies = [latency for latency, _ in entries]
+        errors = sum(1 for _, ok in entries if not ok)
+        routes[route] = {
+            'requests': len(entries),
+            'throughput_rps': len(entries) / elapsed,
+            'error_rate': errors / len(entries),
+            'p50_ms': percentile(latencies, 50) * 1000,
+            'p95_ms': percentile(latencies, 95) * 1000,
+            'p99_ms': percentile(latencies, 99) * 1000,
+        }
+    everything = [entry for entries in samples.values() for entry in entries]
+    latencies = [latency for latency, _ in everything]
+    total = {
+        'requests': len(everything),
+        'throughput_rps': len(everything) / elapsed,
+        'error_rate': sum(1 for _, ok in everything if not ok) / len(everything) if everything else 0.0,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+    }
+    return routes, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=30, help='Seconds of load after everyone has logged in')
+    parser.add_argument('--think-ms', type=float, default=0)
+    parser.add_argument('--server', choices=['werkzeug', 'gunicorn'], default='werkzeug')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--upstream-latency-ms', type=float, default=50)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', default='loadtest.json')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = f"sqlite:///{os.path.join(tmp, 'loadtest.db')}"
+        settings = {'DATABASE_URL': database_url, 'LOG_LEVEL': 'WARNING',
+                    'PAGE_CACHE_DIR': os.path.join(tmp, 'page_cache')}
+        seed_start = time.perf_counter()
+        generate(database_url, args.users, args.days, seed=args.seed, echo=lambda message: None)
+        emails = [f'user{user_id}@example.com' for user_id in range(1, args.users + 1)]
+        print(f'Seeded {args.users} users with up to {args.days} days in {time.perf_counter() - seed_start:.1f}s')
+
+        stub, stub_url = start_stub(args.upstream_latency_ms)
+        settings['NLP_FOOD_PARSER_URL'] = stub_url + '/process_text'
+        settings['NLP_EXERCISE_URL'] = stub_url + '/v2/natural/exercise'
+        base_url, stop_app = start_app(args, settings)
+
+        samples = {}
+        lock = threading.Lock()
+
+        def record(route, latency, ok):
+            with lock:
+                samples.setdefault(route, []).append((latency, ok))
+
+        try:
+            clients = [VirtualUser(base_url, emails[i % len(emails)], random.Random(args.seed + i), record)
+                       for i in range(args.concurrency)]
+            window = {}
+
+            def open_window():
+                window['start'] = time.time()
+                window['deadline'] = window['start'] + args.duration
+
+            ready = threading.Barrier(len(clients), action=open_window)
+            threads = [threading.Thread(target=client.run, args=(ready, window, args.think_ms / 1000))
+                       for client in clients]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.time() - window['start']
+        finally:
+            stop_app()
+            stub.shutdown()
+
+    routes, total = summarize(samples, elapsed)
+    print(f"{'route':<30}{'reqs':>7}{'rps':>8}{'err %':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for route, row in list(routes.items()) + [('total', total)]:
+        print(f"{route:<30}{row['requests']:>7}{row['throughput_rps']:>8.1f}{row['error_rate'] * 100:>7.1f}"
+              f"{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}")
+
+    report = {
+        'parameters': {key: value for key, value in vars(args).items() if key != 'output'},
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'duration_s': elapsed,
+        'routes': routes,
+        'total': total,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f'Report written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+'''
+Memory benchmark for report data loading
+Seeds a scratch database with one user's food and exercise logs, then loads a
+date range the way the reports used to (lists of FoodLog/ExerciseLog objects)
+and as a DailySeries, reporting peak traced memory and load time for each.
+
+Usage: python benchmarks/memory.py [--days 365] [--entries-per-day 6]
+'''
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db  # noqa: E402
+from archive import food_logs_between, exercise_logs_between  # noqa: E402
+from migrations import upgrade  # noqa: E402
+from models import User, FoodLog, ExerciseLog  # noqa: E402
+from timeseries import load_series  # noqa: E402
+
+
+def seed(app, days, entries_per_day):
+    with app.app_context():
+        upgrade(db.engine, db.metadata, echo=lambda message: None)
+        rng = random.Random(1)
+        user = User(username='bench', email='bench@example.com')
+        user.set_password('benchmark')
+        db.session.add(user)
+        db.session.flush()
+        today = datetime.now().date()
+        for day in range(days):
+            logged = today - timedelta(days=day)
+            moment = datetime.combine(logged, datetime.min.time())
+            for _ in range(entries_per_day):
+                db.session.add(FoodLog(user_id=user.id, name='meal', quantity=1, date=moment, only_date=logged,
+                                       calories=rng.uniform(100, 900), protein=20, carbohydrates=50,
+                                       fiber=5, sugar=10, sodium=400))
+            db.session.add(ExerciseLog(user_id=user.id, name='walk', duration=30, date=moment, only_date=logged,
+                                       calories_burned=rng.uniform(100, 300)))
+        db.session.commit()
+        return user.id, today - timedelta(days=days - 1), today
+
+
+def orm_objects(user_id, start_date, end_date):
+    return food_logs_between(user_id, start_date, end_date), exercise_logs_between(user_id, start_date, end_date)
+
+
+def daily_series(user_id, start_date, end_date):
+    return load_series(user_id, start_date, end_date)
+
+
+def measure(app, loader, *args):
+    with app.app_context():
+        gc.collect()
+        tracemalloc.start()
+        start = time.perf_counter()
+        result = loader(*args)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del result
+        db.session.remove()
+    return {'peak_kib': peak / 1024, 'load_ms': elapsed * 1000}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--entries-per-day', type=int, default=6)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+                          'LOG_LEVEL': 'WARNING', 'PAGE_CACHE_BACKEND': 'null'})
+        user_id, start_date, end_date = seed(app, args.days, args.entries_per_day)
+
+        # Warm up imports, mapper configuration and the connection pool before tracing
+        measure(app, daily_series, user_id, start_date, start_date)
+        results = {
+            'orm_objects': measure(app, orm_objects, user_id, start_date, end_date),
+            'daily_series': measure(app, daily_series, user_id, start_date, end_date),
+        }
+        with app.app_context():
+            db.engine.dispose()
+
+    print(f"{'loader':<14}{'peak KiB':>12}{'load ms':>10}")
+    for name, row in results.items():
+        print(f"{name:<14}{row['peak_kib']:>12.1f}{row['load_ms']:>10.2f}")
+    print(json.dumps(results))
+
+
+if __name__ == '__main__':
+    main()
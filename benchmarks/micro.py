@@ -0,0 +1,254 @@
+'''
+Micro-benchmarks for the calculator and report aggregation hot paths
+Times, at several data sizes and on seeded in-memory fixtures (no database):
+- recommendations: get_full_recommendations for one user and for batches
+- meal totals: the six Meal.total_* properties over meals of growing size
+- bucketing: filling a DailySeries from log rows, then day, week and month totals
+- chart: chart_series for the week, month and year charts, and range_series
+  downsampling 5 and 20 years of days to 200 points
+
+Each case is timed as --repeat samples of per-call time. --save stores them
+as the baseline; later runs compare against it with a one-sided Mann-Whitney U
+test and exit non-zero when a case is slower with p < --alpha and its median
+by more than --threshold. Samples within one run miss the run-to-run drift of
+the host (about 10% on a shared VM), which is what the threshold absorbs; keep
+the host quiet, or raise it. Baselines only compare on the machine that made them.
+
+Usage: python benchmarks/micro.py [--save] [--baseline PATH] [--filter TEXT]
+           [--repeat 20] [--alpha 0.01] [--threshold 0.10]
+'''
+import argparse
+import gc
+import json
+import math
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dataset import CATALOG, NUTRIENTS  # noqa: E402
+from models import CustomItem, Meal, MealItem  # noqa: E402
+from nutrition_calculator import get_full_recommendations  # noqa: E402
+from timeseries import FOOD_FIELDS, DailySeries, chart_series, chart_start, range_series  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'micro_baseline.json')
+# Fixed so fixtures, and so results, do not depend on the day the suite runs
+TODAY = date(2025, 6, 15)
+SEED = 1
+# Each sample runs the case enough times to take at least this long
+SAMPLE_SECONDS = 0.02
+
+
+def make_users(count, rng):
+    return [SimpleNamespace(weight=rng.uniform(45, 120), height=rng.uniform(150, 200), age=rng.randint(18, 80),
+                            gender=rng.choice(['male', 'female', 'other']),
+                            activity_level=rng.choice(['sedentary', 'light', 'moderate', 'active', 'very_active']),
+                            motive=rng.choice(['lose', 'maintain', 'gain']))
+            for _ in range(count)]
+
+
+def make_meal(items, rng):
+    meal = Meal(name='bench', user_id=1)
+    for name, unit, *values in rng.choices(CATALOG, k=items):
+        item = CustomItem(name=name, unit=unit, quantity=1, user_id=1, **dict(zip(NUTRIENTS, values)))
+        meal.meal_items.append(MealItem(custom_item=item, quantity=rng.uniform(0.5, 3)))
+    return meal
+
+
+def make_rows(days, rng, entries_per_day=6):
+    """(only_date, nutrients) food rows and (only_date, calories_burned, minutes) exercise rows."""
+    food, exercise = [], []
+    for offset in range(days):
+        day = TODAY - timedelta(days=offset)
+        for _ in range(entries_per_day):
+            food.append((day, rng.choice(CATALOG)[2:]))
+        if rng.random() < 0.6:
+            exercise.append((day, rng.uniform(100, 600), rng.randint(10, 90)))
+    return food, exercise
+
+
+def bucket(days, food, exercise):
+    series = DailySeries(TODAY - timedelta(days=days - 1), TODAY)
+    for day, values in food:
+        series.add(day, 'food_entries', 1)
+        for field, amount in zip(FOOD_FIELDS, values):
+            series.add(day, field, amount)
+    for day, burned, minutes in exercise:
+        series.add(day, 'exercise_entries', 1)
+        series.add(day, 'calories_burned', burned)
+        series.add(day, 'minutes', minutes)
+    series.daily('calories')
+    for start in range(0, days, 7):
+        series.total('calories', series.start_date + timedelta(days=start), series.start_date + timedelta(days=start + 6))
+    for start in range(0, days, 30):
+        series.total('calories', series.start_date + timedelta(days=start), series.start_date + timedelta(days=start + 29))
+    return series
+
+
+def meal_totals(meal):
+    return (meal.total_calories, meal.total_protein, meal.total_carbs,
+            meal.total_fiber, meal.total_sugar, meal.total_sodium)
+
+
+def chart_case(period):
+    rng = random.Random(SEED)
+    start = chart_start(period, TODAY)
+    days = (TODAY - start).days + 1
+    food, exercise = make_rows(days, rng)
+    series = bucket(days, food, exercise)
+    return lambda: chart_series(series, period, TODAY)
+
+
+def range_case(days):
+    rng = random.Random(SEED)
+    food, exercise = make_rows(days, rng, entries_per_day=2)
+    series = bucket(days, food, exercise)
+    return lambda: range_series(series, 'day', 200)
+
+
+def build_cases():
+    """Name -> zero-argument callable; fixtures are built here, outside the timed code."""
+    rng = random.Random(SEED)
+    cases = {}
+    user = make_users(1, rng)[0]
+    cases['recommendations/scalar'] = lambda: get_full_recommendations(user)
+    for count in (100, 1000, 10000):
+        users = make_users(count, rng)
+        cases[f'recommendations/batch-{count}'] = lambda users=users: [get_full_recommendations(u) for u in users]
+    for items in (5, 20, 100):
+        meal = make_meal(items, rng)
+        cases[f'meal_totals/{items}-items'] = lambda meal=meal: meal_totals(meal)
+    for days in (30, 365, 730):
+        food, exercise = make_rows(days, rng)
+        cases[f'bucketing/{days}-days'] = lambda days=days, food=food, exercise=exercise: bucket(days, food, exercise)
+    for period in ('week', 'month', 'year'):
+        cases[f'chart/{period}'] = chart_case(period)
+    for years in (5, 20):
+        cases[f'chart/range-{years}y'] = range_case(years * 365)
+    return cases
+
+
+def calibrate(case):
+    """Calls per sample needed for a sample to take at least SAMPLE_SECONDS."""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            case()
+        if time.perf_counter() - start >= SAMPLE_SECONDS:
+            return number
+        number *= 2
+
+
+def time_calls(case, number):
+    """Per-call seconds over ``number`` calls, with the collector paused."""
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        for _ in range(number):
+            case()
+        return (time.perf_counter() - start) / number
+    finally:
+        gc.enable()
+
+
+def run_cases(cases, repeat):
+    """
+    Sample every case ``repeat`` times.
+
+    Samples are taken round-robin, one per case in turn, so a slow patch on
+    the host spreads across all cases instead of landing on one.
+
+    Returns:
+        Dict of case name -> per-call seconds per sample
+    """
+    numbers = {name: calibrate(case) for name, case in cases.items()}
+    samples = {name: [] for name in cases}
+    for _ in range(repeat):
+        for name, case in cases.items():
+            samples[name].append(time_calls(case, numbers[name]))
+    return samples
+
+
+def slower_p_value(baseline, current):
+    """
+    One-sided Mann-Whitney U test that ``current`` tends to be larger than ``baseline``.
+
+    Uses the normal approximation with tie correction, fine from about 8 samples each.
+
+    Returns:
+        p-value; small means current is significantly slower
+    """
+    n1, n2 = len(current), len(baseline)
+    ranked = sorted([(value, 0) for value in current] + [(value, 1) for value in baseline])
+    ranks = [0.0] * len(ranked)
+    tie_term = 0
+    i = 0
+    while i < len(ranked):
+        j = i
+        while j + 1 < len(ranked) and ranked[j + 1][0] == ranked[i][0]:
+            j += 1
+        for k in range(i, j + 1):
+            ranks[k] = (i + j) / 2 + 1
+        tie_term += (j - i + 1) ** 3 - (j - i + 1)
+        i = j + 1
+    rank_sum = sum(rank for rank, (_, group) in zip(ranks, ranked) if group == 0)
+    u = rank_sum - n1 * (n1 + 1) / 2
+    n = n1 + n2
+    variance = n1 * n2 / 12 * ((n + 1) - tie_term / (n * (n - 1)))
+    if variance <= 0:
+        return 1.0
+    z = (u - n1 * n2 / 2 - 0.5) / math.sqrt(variance)
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save', action='store_true', help='store this run as the baseline')
+    parser.add_argument('--filter', default='', help='only run cases whose name contains this')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--alpha', type=float, default=0.01)
+    parser.add_argument('--threshold', type=float, default=0.10, help='smallest median slowdown that fails')
+    args = parser.parse_args()
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.save:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['cases']
+
+    cases = {name: case for name, case in build_cases().items() if args.filter in name}
+    results = run_cases(cases, args.repeat)
+    failures = []
+    print(f"{'case':<34}{'median µs':>12}{'IQR µs':>10}{'change':>9}{'p':>9}")
+    for name, samples in results.items():
+        median = statistics.median(samples)
+        quartiles = statistics.quantiles(samples, n=4)
+        line = f'{name:<34}{median * 1e6:>12.2f}{(quartiles[2] - quartiles[0]) * 1e6:>10.2f}'
+        if name in baseline:
+            change = median / statistics.median(baseline[name]) - 1
+            p = slower_p_value(baseline[name], samples)
+            line += f'{change:>+9.1%}{p:>9.4f}'
+            if p < args.alpha and change > args.threshold:
+                failures.append(name)
+                line += '  SLOWER'
+        print(line)
+
+    if args.save:
+        with open(args.baseline, 'w') as f:
+            json.dump({'python': sys.version.split()[0], 'repeat': args.repeat, 'cases': results}, f, indent=1)
+        print(f'baseline saved to {args.baseline}')
+    elif not baseline:
+        print(f'no baseline at {args.baseline}; run with --save to create one')
+    if failures:
+        print(f"significantly slower: {', '.join(failures)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,245 @@
+'''
+Query budget check for HealthTracker views
+Generates a small seeded dataset, logs in as one of its users and requests
+every GET view of the main blueprint, then posts to every mutating view (the
+NLP endpoints against a local stub, see loadtest.py), counting the SQL
+statements each request runs against its @query_budget and looking for N+1
+repeats (see query_guard.py). Edits and deletes go to rows the run creates,
+and registration and login are posted last from a fresh client. Also checks
+that /metrics stays closed to forged and proxied requests, with and without
+METRICS_TOKEN. Exits non-zero when a view is over budget, repeats a
+statement, has no budget, fails or flashes an error, or one of its methods was
+never requested, or /metrics answers the wrong requests; run it in CI next to
+the test suite.
+
+Usage: python benchmarks/query_budgets.py [--users 3] [--days 180] [--seed 1]
+'''
+import argparse
+import os
+import sys
+import tempfile
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import g  # noqa: E402
+
+from app import create_app, db  # noqa: E402
+from dataset import PASSWORD, generate  # noqa: E402
+from loadtest import start_stub  # noqa: E402
+from models import User, CustomItem, Meal, MealItem  # noqa: E402
+
+# Query strings for views whose behaviour depends on them; others are requested bare
+VARIANTS = {
+    'main.chart_data': ['?period=week', '?period=month', '?period=year'],
+    'main.weight_data': ['', '?start=2015-01-01'],
+    'main.chart_range': ['', '?start=2015-01-01&granularity=day', '?start=2024-01-01&end=2024-03-31&granularity=week'],
+    'main.search_food_items': ['?query=ch'],
+    'main.daily_report': ['', '?date=2024-01-01'],
+}
+
+# Names of the item and meal the run creates, and then edits and deletes
+NEW_ITEM = 'Budget check item'
+NEW_MEAL = 'Budget check meal'
+ITEM_FORM = {'name': NEW_ITEM, 'description': 'Created by the query budget check', 'unit': 'g', 'quantity': 100,
+             'calories': 120, 'protein': 5, 'carbohydrates': 20, 'fiber': 2, 'sugar': 3, 'sodium': 50}
+
+# (endpoint, URL argument -> sample_arguments key, body) for every mutating view, in the order they
+# are posted; body maps the sample arguments to the test client's keyword arguments. Logging goes to
+# the seeded meal and item, so the ones the run creates can be deleted without touching the logs
+POSTS = [
+    ('main.add_food_item', {}, lambda arguments: {'data': ITEM_FORM}),
+    ('main.add_meal', {}, lambda arguments: {'data': {'name': NEW_MEAL, 'description': ''}}),
+    ('main.edit_food_item', {'item_id': 'new_item_id'}, lambda arguments: {'data': dict(ITEM_FORM, calories=150)}),
+    ('main.edit_meal', {'meal_id': 'new_meal_id'},
+     lambda arguments: {'data': {'name': NEW_MEAL, 'description': 'Edited by the query budget check'}}),
+    ('main.add_meal_item', {'meal_id': 'new_meal_id'},
+     lambda arguments: {'data': {'custom_item_id': arguments['new_item_id'], 'quantity': 50}}),
+    ('main.add_meal_to_log', {'meal_id': 'meal_id'}, lambda arguments: {}),
+    ('main.log_food_batch', {}, lambda arguments: {'json': {'entries': [
+        {'meal_id': arguments['meal_id'], 'meal_type': 'lunch'},
+        {'custom_item_id': arguments['item_id'], 'quantity': 2, 'date': (date.today() - timedelta(days=1)).isoformat()},
+    ]}}),
+    ('main.process_food_query', {}, lambda arguments: {'data': {'query': 'two eggs and a slice of toast'}}),
+    ('main.process_exercise_query', {}, lambda arguments: {'data': {'query': 'ran for 30 minutes'}}),
+    ('main.log_weight', {}, lambda arguments: {'data': {'weight': 71.5}}),
+    ('main.profile', {}, lambda arguments: {'data': arguments['profile']}),
+    ('main.delete_meal_item', {'meal_item_id': 'new_meal_item_id'}, lambda arguments: {}),
+    ('main.delete_meal', {'meal_id': 'new_meal_id'}, lambda arguments: {}),
+    ('main.delete_food_item', {'item_id': 'new_item_id'}, lambda arguments: {}),
+]
+
+NEW_USER = {'username': 'budgetcheck', 'email': 'budgetcheck@example.com', 'password': PASSWORD,
+            'confirm_password': PASSWORD, 'weight': 68, 'height': 172, 'age': 30, 'gender': 'other',
+            'activity_level': 'moderate', 'motive': 'maintain'}
+
+
+def sample_arguments(user_id):
+    """URL arguments and form values pointing at rows the user owns, including the ones the run created."""
+    meal = Meal.query.filter_by(user_id=user_id).first()
+    new_item = CustomItem.query.filter_by(user_id=user_id, name=NEW_ITEM).first()
+    new_meal = Meal.query.filter_by(user_id=user_id, name=NEW_MEAL).first()
+    new_meal_item = MealItem.query.filter_by(meal_id=new_meal.id).first() if new_meal else None
+    user = db.session.get(User, user_id)
+    return {
+        'item_id': CustomItem.query.filter_by(user_id=user_id).first().id,
+        'meal_id': meal.id,
+        'meal_item_id': MealItem.query.filter_by(meal_id=meal.id).first().id,
+        'new_item_id': new_item.id if new_item else None,
+        'new_meal_id': new_meal.id if new_meal else None,
+        'new_meal_item_id': new_meal_item.id if new_meal_item else None,
+        'profile': {'username': user.username, 'email': user.email, 'weight': user.weight + 0.5,
+                    'height': user.height, 'age': user.age, 'gender': user.gender,
+                    'activity_level': user.activity_level, 'motive': user.motive},
+    }
+
+
+def get_views(app):
+    """(endpoint, rule) for every GET route of the main blueprint."""
+    for rule in app.url_map.iter_rules():
+        if rule.endpoint.startswith('main.') and 'GET' in rule.methods:
+            yield rule.endpoint, rule
+
+
+def measure(client, method, path, **kwargs):
+    """
+    Make one request and count its statements.
+
+    Returns:
+        (response, statements, query guard problems, error flashes)
+    """
+    with client:
+        response = client.open(path, method=method, **kwargs)
+        statements = len(g.get('query_shapes', ()))
+        problems = g.get('query_problems', [])
+    # Redirects are not followed, so the flashes are still in the session; clear them for the next request
+    with client.session_transaction() as session:
+        errors = [message for category, message in session.pop('_flashes', []) if category == 'danger']
+    return response, statements, problems, errors
+
+
+def check(app, email):
+    """Request every view of the main blueprint, logged in as ``email``, and return (rows, failures)."""
+    client = app.test_client()
+    client.post('/login', data={'email': email, 'password': PASSWORD})
+    with app.app_context():
+        user_id = User.query.filter_by(email=email).one().id
+        arguments = sample_arguments(user_id)
+
+    rows, failures, requested = [], [], set()
+
+    def run(client, endpoint, method, path, **kwargs):
+        budget = getattr(app.view_functions[endpoint], '_query_budget', None)
+        if budget is None and (endpoint, method) not in requested:
+            failures.append(f'{endpoint} has no @query_budget')
+        requested.add((endpoint, method))
+        response, statements, problems, errors = measure(client, method, path, **kwargs)
+        rows.append((method, path, response.status_code, statements, budget))
+        failures.extend(problems)
+        if response.status_code >= 400:
+            failures.append(f'{method} {path} answered {response.status_code}')
+        elif method == 'POST' and response.status_code == 200:
+            # The form views redirect on success and render the form again when it does not validate
+            failures.append(f'{method} {path} rendered its form again instead of saving it')
+        failures.extend(f'{method} {path} flashed an error: {error}' for error in errors)
+
+    def build(endpoint, values):
+        with app.test_request_context():
+            return app.url_map.bind('localhost').build(endpoint, values)
+
+    # Logging out ends the session the other views need, so it goes last
+    for endpoint, rule in sorted(get_views(app), key=lambda view: view[0]):
+        if endpoint == 'main.logout':
+            continue
+        path = build(endpoint, {name: arguments[name] for name in rule.arguments})
+        for query in VARIANTS.get(endpoint, ['']):
+            run(client, endpoint, 'GET', path + query)
+
+    for endpoint, names, body in POSTS:
+        with app.app_context():
+            arguments = sample_arguments(user_id)
+        path = build(endpoint, {name: arguments[key] for name, key in names.items()})
+        run(client, endpoint, 'POST', path, **body(arguments))
+
+    run(client, 'main.logout', 'GET', build('main.logout', {}))
+
+    # Signing up and logging in start from a client with no session
+    client = app.test_client()
+    run(client, 'main.register', 'POST', build('main.register', {}), data=NEW_USER)
+    run(client, 'main.login', 'POST', build('main.login', {}),
+        data={'email': NEW_USER['email'], 'password': NEW_USER['password']})
+
+    for rule in app.url_map.iter_rules():
+        for method in sorted(rule.methods & {'GET', 'POST'}):
+            if rule.endpoint.startswith('main.') and (rule.endpoint, method) not in requested:
+                failures.append(f'{method} {rule.rule} ({rule.endpoint}) was never requested')
+    return rows, failures
+
+
+def check_metrics_access(app):
+    """Failures when /metrics answers a request it should refuse, or refuses a legitimate scrape."""
+    if not app.config['METRICS_ENABLED']:
+        return []
+    forged = {'REMOTE_ADDR': '203.0.113.9'}, {'X-Forwarded-For': '127.0.0.1'}
+    # Through a reverse proxy on the same host: the peer is local, the client is not
+    proxied = {'REMOTE_ADDR': '127.0.0.1'}, {'X-Forwarded-For': '198.51.100.7'}
+    token = 'budget-check-token'
+    cases = [
+        # (description, METRICS_TOKEN, environ, headers, expected status)
+        ('a forged X-Forwarded-For', None, *forged, 404),
+        ('a proxied public request', None, *proxied, 404),
+        ('a direct local scrape', None, {'REMOTE_ADDR': '127.0.0.1'}, {}, 200),
+        ('a proxied request without the token', token, *proxied, 404),
+        ('a proxied request with a wrong token', token, proxied[0],
+         dict(proxied[1], Authorization='Bearer wrong'), 404),
+        ('a direct local scrape without the token', token, {'REMOTE_ADDR': '127.0.0.1'}, {}, 404),
+        ('a proxied scrape with the token', token, proxied[0],
+         dict(proxied[1], Authorization=f'Bearer {token}'), 200),
+    ]
+    failures = []
+    configured = app.config['METRICS_TOKEN']
+    try:
+        for description, metrics_token, environ, headers, expected in cases:
+            app.config['METRICS_TOKEN'] = metrics_token
+            status = app.test_client().get('/metrics', environ_base=environ, headers=headers).status_code
+            if status != expected:
+                failures.append(f'/metrics answered {description} with {status}, expected {expected}')
+    finally:
+        app.config['METRICS_TOKEN'] = configured
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=3)
+    parser.add_argument('--days', type=int, default=180)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = f"sqlite:///{os.path.join(tmp, 'budgets.db')}"
+        generate(database_url, args.users, args.days, seed=args.seed, echo=lambda message: None)
+        stub, stub_url = start_stub(0)
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': database_url, 'TESTING': True, 'WTF_CSRF_ENABLED': False,
+            'PAGE_CACHE_BACKEND': 'null', 'QUERY_GUARD': 'warn', 'LOG_LEVEL': 'ERROR',
+            'NLP_FOOD_PARSER_URL': f'{stub_url}/process_text', 'NLP_EXERCISE_URL': f'{stub_url}/v2/natural/exercise',
+        })
+        try:
+            rows, failures = check(app, 'user1@example.com')
+            failures.extend(check_metrics_access(app))
+        finally:
+            stub.shutdown()
+            with app.app_context():
+                db.engine.dispose()
+
+    print(f"{'method':<7}{'path':<40}{'status':>7}{'queries':>9}{'budget':>8}")
+    for method, path, status, statements, budget in rows:
+        print(f"{method:<7}{path:<40}{status:>7}{statements:>9}{budget if budget is not None else '-':>8}")
+    for failure in failures:
+        print(f'FAIL {failure}')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+'''
+Startup benchmark for HealthTracker
+Measures, in fresh interpreter processes, how long a worker takes to import the
+app module, build the app with create_app() (time-to-ready) and produce its
+first rendered page, with a cold (empty) and a warm (precompiled) Jinja
+bytecode cache.
+
+Usage: python benchmarks/startup.py [--runs N]
+'''
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+REPORT_TEMPLATES = ['dashboard.html', 'daily_report.html', 'weekly_report.html', 'monthly_report.html', 'compare.html']
+
+PROBE = '''
+import json, time
+start = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app()
+ready = time.perf_counter()
+from flask import render_template
+with app.test_request_context('/'):
+    render_template('index.html')
+    first_render = time.perf_counter()
+    for name in %r:
+        app.jinja_env.get_template(name)
+    reports_loaded = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - start) * 1000,
+    'create_app_ms': (ready - imported) * 1000,
+    'time_to_ready_ms': (ready - start) * 1000,
+    'first_render_ms': (first_render - ready) * 1000,
+    'report_templates_ms': (reports_loaded - first_render) * 1000,
+    'time_to_first_render_ms': (first_render - start) * 1000,
+}))
+''' % (REPORT_TEMPLATES,)
+
+
+def run_probe(cache_dir):
+    env = dict(os.environ, JINJA_BYTECODE_CACHE_DIR=cache_dir)
+    output = subprocess.check_output([sys.executable, '-c', PROBE], cwd=ROOT, env=env, stderr=subprocess.DEVNULL)
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+def precompile(cache_dir):
+    env = dict(os.environ, JINJA_BYTECODE_CACHE_DIR=cache_dir, FLASK_APP='app')
+    subprocess.check_call([sys.executable, '-m', 'flask', 'precompile-templates'], cwd=ROOT, env=env,
+                          stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def summarize(samples):
+    return {key: statistics.median(sample[key] for sample in samples) for key in samples[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help='fresh processes per scenario')
+    args = parser.parse_args()
+
+    cold = []
+    for _ in range(args.runs):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cold.append(run_probe(cache_dir))
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        precompile(cache_dir)
+        warm = [run_probe(cache_dir) for _ in range(args.runs)]
+
+    results = {'cold': summarize(cold), 'warm': summarize(warm)}
+    print(f"{'median of %d runs' % args.runs:<28}{'cold':>10}{'warm':>10}")
+    for key in results['cold']:
+        print(f"{key:<28}{results['cold'][key]:>10.1f}{results['warm'][key]:>10.1f}")
+    print(json.dumps(results))
+
+
+if __name__ == '__main__':
+    main()
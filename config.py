@@ -0,0 +1,138 @@
+'''
+Configuration for HealthTracker
+Settings are read from the environment when the config class is defined;
+pass one of these classes (or a mapping of overrides) to create_app().
+'''
+import os
+
+
+class Config:
+    SECRET_KEY = os.environ.get('SECRET_KEY', 'thisthatthusthup')
+
+    # Database connection: 'sqlite' (local file, WAL) or 'server' (URI from DATABASE_URL).
+    # The profile fills in the URI when unset and the engine options, see engine_profiles.py
+    DB_ENGINE_PROFILE = os.environ.get('DB_ENGINE_PROFILE', 'sqlite')
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL')
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Schema migrations: rows per committed backfill batch and pause between batches (seconds)
+    MIGRATION_BATCH_SIZE = int(os.environ.get('MIGRATION_BATCH_SIZE', 1000))
+    MIGRATION_BATCH_PAUSE = float(os.environ.get('MIGRATION_BATCH_PAUSE', 0.05))
+
+    # Food and exercise logs older than this many days can be moved into archive segments
+    # with `flask archive compact`; reports read both transparently
+    ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', 365))
+
+    # SQLite profile
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+    SQLITE_CACHE_SIZE_KIB = int(os.environ.get('SQLITE_CACHE_SIZE_KIB', 64 * 1024))
+
+    # Read/write routing: read-only views query SQLALCHEMY_READ_DATABASE_URI (a replica), or a
+    # read-only connection to the SQLite file when unset. After a write, the user keeps reading
+    # from the primary for READ_YOUR_WRITES_SECONDS.
+    DB_READ_ROUTING = os.environ.get('DB_READ_ROUTING', '0') == '1'
+    SQLALCHEMY_READ_DATABASE_URI = os.environ.get('READ_DATABASE_URL')
+    READ_YOUR_WRITES_SECONDS = float(os.environ.get('READ_YOUR_WRITES_SECONDS', 5))
+
+    # Server profile
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 300))
+
+    # Natural-language food parser and exercise API, and their request timeout in seconds
+    NLP_FOOD_PARSER_URL = os.environ.get('NLP_FOOD_PARSER_URL', 'http://127.0.0.1:5001/process_text')
+    NLP_EXERCISE_URL = os.environ.get('NLP_EXERCISE_URL', 'https://trackapi.nutritionix.com/v2/natural/exercise')
+    NLP_TIMEOUT = float(os.environ.get('NLP_TIMEOUT', 10))
+
+    # Per-process cache of logged-in user profiles: max entries, and seconds a snapshot is trusted
+    # before its version is rechecked, which bounds how long an edit on another device goes unseen
+    USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', 1024))
+    USER_CACHE_TTL = float(os.environ.get('USER_CACHE_TTL', 60))
+
+    # Rendered report page cache: 'memory' (per-process LRU), 'filesystem' or 'null'
+    PAGE_CACHE_BACKEND = os.environ.get('PAGE_CACHE_BACKEND', 'memory')
+    PAGE_CACHE_SIZE = int(os.environ.get('PAGE_CACHE_SIZE', 256))
+    # Defaults to <instance>/page_cache when unset
+    PAGE_CACHE_DIR = os.environ.get('PAGE_CACHE_DIR')
+
+    # Range charts (/api/chart_range): most points returned and longest range, in days
+    CHART_MAX_POINTS = int(os.environ.get('CHART_MAX_POINTS', 200))
+    CHART_MAX_DAYS = int(os.environ.get('CHART_MAX_DAYS', 20 * 366))
+
+    # Batch food logging (/api/log_food): most meals and items in one request, and how far back they may be dated
+    BULK_LOG_MAX_ENTRIES = int(os.environ.get('BULK_LOG_MAX_ENTRIES', 50))
+    BULK_LOG_MAX_DAYS_BACK = int(os.environ.get('BULK_LOG_MAX_DAYS_BACK', 366))
+
+    # Weight trend: share of the gap between trend and reading closed per day (exponential smoothing)
+    WEIGHT_TREND_ALPHA = float(os.environ.get('WEIGHT_TREND_ALPHA', 0.1))
+
+    # Compiled template bytecode shared by all workers; fill it with `flask precompile-templates`.
+    # Defaults to <instance>/jinja_cache when unset, an empty string disables it.
+    JINJA_BYTECODE_CACHE_DIR = os.environ.get('JINJA_BYTECODE_CACHE_DIR')
+
+    # Per-endpoint request, response size and SQL metrics in Prometheus text format on /metrics.
+    # With METRICS_TOKEN set, scrapes must send 'Authorization: Bearer <token>' (required behind a
+    # reverse proxy); otherwise only direct, unproxied connections from these addresses are served
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    METRICS_ALLOWED_ADDRESSES = os.environ.get('METRICS_ALLOWED_ADDRESSES', '127.0.0.1,::1').split(',')
+
+    # Per-request statement checks against each view's @query_budget: '' (off), 'warn' or 'raise';
+    # the same statement shape run this many times in one request counts as an N+1
+    QUERY_GUARD = os.environ.get('QUERY_GUARD', '')
+    QUERY_GUARD_REPEAT_LIMIT = int(os.environ.get('QUERY_GUARD_REPEAT_LIMIT', 5))
+
+    # Users (comma-separated emails) who may profile a request with `X-Profile: 1` or `?_profile=1`;
+    # profiles go to PROFILE_DIR, <instance>/profiles when unset
+    PROFILER_ADMINS = [email.strip() for email in os.environ.get('PROFILER_ADMINS', '').split(',') if email.strip()]
+    PROFILE_DIR = os.environ.get('PROFILE_DIR')
+
+    # Per-phase request timings (db, render, upstream, aggregate) in a Server-Timing response header
+    SERVER_TIMING = os.environ.get('SERVER_TIMING', '1') == '1'
+
+    # Slow-query log: statements taking at least SLOW_QUERY_MS (0 disables it) go to a rotating
+    # JSON-lines file, <instance>/slow_queries.log when unset, optionally with their query plan.
+    # On SQLite the time of a SELECT excludes fetching its rows past the first, so set the
+    # threshold lower there. Summarize it with `flask slow-queries summary`
+    SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 0))
+    SLOW_QUERY_EXPLAIN = os.environ.get('SLOW_QUERY_EXPLAIN', '0') == '1'
+    SLOW_QUERY_LOG = os.environ.get('SLOW_QUERY_LOG')
+    SLOW_QUERY_LOG_MAX_BYTES = int(os.environ.get('SLOW_QUERY_LOG_MAX_BYTES', 10 * 1024 * 1024))
+    SLOW_QUERY_LOG_BACKUPS = int(os.environ.get('SLOW_QUERY_LOG_BACKUPS', 5))
+
+    # Logging: root level, per-module levels ('routes=DEBUG,sqlalchemy.engine=WARNING'),
+    # 'text' or 'json' output, and whether records are written from a background thread
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+    LOG_LEVELS = os.environ.get('LOG_LEVELS', '')
+    LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text')
+    LOG_QUEUE = True
+
+
+class DevelopmentConfig(Config):
+    DEBUG = True
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'DEBUG')
+
+
+class ProductionConfig(Config):
+    DEBUG = False
+    LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json')
+
+
+class TestingConfig(Config):
+    TESTING = True
+    WTF_CSRF_ENABLED = False
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    PAGE_CACHE_BACKEND = 'null'
+    JINJA_BYTECODE_CACHE_DIR = ''
+    QUERY_GUARD = 'raise'
+
+
+configs = {
+    'development': DevelopmentConfig,
+    'production': ProductionConfig,
+    'testing': TestingConfig,
+}
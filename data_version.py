@@ -0,0 +1,165 @@
+'''
+Per-user data version for HealthTracker
+Every write to a user's logs, items, meals or profile bumps a monotonically
+increasing counter, which report and chart routes turn into ETag and
+Last-Modified headers so unchanged views can be answered with 304.
+'''
+import hashlib
+from datetime import datetime
+from functools import wraps
+
+import pytz
+from flask import g, request, session, make_response
+from flask_login import current_user
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app import db
+from models import User, CustomItem, Meal, MealItem, FoodLog, ExerciseLog, DataVersion
+
+tz_ist = pytz.timezone('Asia/Kolkata')
+
+# INSERT constructs supporting ON CONFLICT DO UPDATE, by dialect name
+UPSERT_INSERTS = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+
+
+def _owner_id(session_, obj):
+    """Return the id of the user whose data ``obj`` belongs to, if any."""
+    if isinstance(obj, User):
+        return obj.id
+    if isinstance(obj, MealItem):
+        meal = obj.meal or (session_.get(Meal, obj.meal_id) if obj.meal_id else None)
+        return meal.user_id if meal else None
+    if isinstance(obj, (CustomItem, Meal, FoodLog, ExerciseLog)):
+        return obj.user_id
+    return None
+
+
+@event.listens_for(db.session, 'before_flush')
+def _bump_on_flush(session_, flush_context, instances):
+    """Bump the data version of every user touched by this flush."""
+    user_ids = set()
+    for obj in session_.new:
+        user_ids.add(_owner_id(session_, obj))
+    for obj in session_.dirty:
+        if session_.is_modified(obj, include_collections=False):
+            user_ids.add(_owner_id(session_, obj))
+    for obj in session_.deleted:
+        user_ids.add(_owner_id(session_, obj))
+    user_ids.discard(None)
+    bump_data_version(session_, user_ids)
+
+
+def bump_data_version(session_, user_ids):
+    """
+    Bump the data version of ``user_ids``; for writes that bypass the flush, like bulk inserts.
+
+    A user's row is created by their first write. Two first writes at once would
+    both insert it, so the row is upserted in one statement rather than looked up
+    and then added.
+    """
+    if not user_ids:
+        return
+    now = datetime.now(pytz.utc).replace(tzinfo=None)
+    table = DataVersion.__table__
+    dialect = session_.get_bind().dialect.name
+    if dialect not in UPSERT_INSERTS:
+        for user_id in user_ids:
+            data_version = session_.get(DataVersion, user_id)
+            if data_version is None:
+                session_.add(DataVersion(user_id=user_id, version=1, updated_at=now))
+            else:
+                data_version.version = DataVersion.version + 1
+                data_version.updated_at = now
+        return
+    insert = UPSERT_INSERTS[dialect](table)
+    statement = insert.on_conflict_do_update(
+        index_elements=[table.c.user_id],
+        set_={'version': table.c.version + 1, 'updated_at': insert.excluded.updated_at},
+    )
+    # In id order, so concurrent bumps of the same users take their row locks in the same order
+    session_.execute(statement, [{'user_id': user_id, 'version': 1, 'updated_at': now}
+                                 for user_id in sorted(user_ids)])
+
+
+def get_data_version(user_id):
+    """
+    Look up the current data version of a user.
+
+    Args:
+        user_id: Id of the user
+
+    Returns:
+        Tuple of (version, updated_at) where updated_at is a timezone-aware UTC datetime
+    """
+    row = db.session.query(DataVersion.version, DataVersion.updated_at).filter(
+        DataVersion.user_id == user_id
+    ).first()
+    if row is None:
+        return 0, datetime(1970, 1, 1, tzinfo=pytz.utc)
+    return row.version, pytz.utc.localize(row.updated_at.replace(microsecond=0))
+
+
+def current_data_version():
+    """Data version of the logged-in user, looked up at most once per request."""
+    if 'data_version' not in g:
+        g.data_version = get_data_version(current_user.id)
+    return g.data_version
+
+
+def make_etag(user_id, version):
+    """
+    Build the entity tag for the current request.
+
+    The tag covers the user, their data version, the requested URL and the
+    current IST date, since report and chart views default to "today".
+    """
+    today = datetime.now(tz_ist).date().isoformat()
+    material = f'{user_id}:{version}:{today}:{request.full_path}'
+    return hashlib.sha1(material.encode('utf-8')).hexdigest()
+
+
+def _set_validators(response, etag, last_modified):
+    response.set_etag(etag, weak=True)
+    response.last_modified = last_modified
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+
+def conditional(view):
+    """
+    Decorator for read-only views that answers revalidation requests with 304.
+
+    Must be applied below ``login_required``. Requests with pending flash
+    messages are always rendered in full, because the page is what consumes them,
+    and so are profiled requests.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if session.get('_flashes') or g.get('profiler'):
+            return view(*args, **kwargs)
+
+        version, updated_at = current_data_version()
+        etag = make_etag(current_user.id, version)
+        # Date-relative views change at midnight even without new data
+        midnight = tz_ist.localize(datetime.combine(datetime.now(tz_ist).date(), datetime.min.time()))
+        last_modified = max(updated_at, midnight.astimezone(pytz.utc))
+
+        if request.if_none_match:
+            not_modified = request.if_none_match.contains_weak(etag)
+        elif request.if_modified_since:
+            not_modified = last_modified <= request.if_modified_since
+        else:
+            not_modified = False
+
+        if not_modified:
+            response = make_response('', 304)
+            return _set_validators(response, etag, last_modified)
+
+        response = make_response(view(*args, **kwargs))
+        if response.status_code == 200:
+            _set_validators(response, etag, last_modified)
+        return response
+
+    return wrapper
@@ -0,0 +1,60 @@
+'''
+Shared SQL statement timing for HealthTracker
+One pair of engine listeners times every statement and hands it, with its
+duration, to the subscribers of that engine: the metrics counters, the query
+guard, request profiling, the Server-Timing header and the slow-query log.
+They used to time statements each with their own listeners and start-time
+stack; now each statement is timed once.
+
+A statement that fails is reported too, since it also took time and counts
+towards a request's queries.
+'''
+import time
+import weakref
+
+from sqlalchemy import event
+
+# engine -> callbacks, each called as callback(conn, statement, parameters, executemany, seconds)
+_subscribers = weakref.WeakKeyDictionary()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('_statement_start', []).append(time.perf_counter())
+
+
+def _notify(conn, statement, parameters, executemany):
+    started = conn.info['_statement_start'].pop()
+    elapsed = time.perf_counter() - started
+    for callback in _subscribers.get(conn.engine, ()):
+        callback(conn, statement, parameters, executemany, elapsed)
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    _notify(conn, statement, parameters, executemany)
+
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute
+    conn = exception_context.connection
+    if conn is not None and conn.info.get('_statement_start'):
+        context = exception_context.execution_context
+        _notify(conn, exception_context.statement, exception_context.parameters,
+                context.executemany if context is not None else False)
+
+
+def on_statement(engine, callback):
+    """
+    Call ``callback`` after every statement run on ``engine``.
+
+    Args:
+        engine: SQLAlchemy engine
+        callback: Called as callback(conn, statement, parameters, executemany, seconds);
+                  subscribing the same callback again has no effect
+    """
+    if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(engine, 'handle_error', _handle_error)
+    callbacks = _subscribers.setdefault(engine, [])
+    if callback not in callbacks:
+        callbacks.append(callback)
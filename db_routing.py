@@ -0,0 +1,90 @@
+'''
+Read/write session routing for HealthTracker
+Views marked with @read_only run their queries on a separate read engine, such
+as a replica or a read-only connection to a WAL SQLite file, while everything
+else stays on the primary. A user who has just written something keeps reading
+from the primary for a short window so they always see their own writes.
+'''
+import time
+from functools import wraps
+
+from flask import current_app, g, has_request_context, request, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+READ_BIND = 'read'
+
+# Flask session key holding the time of the user's last write
+LAST_WRITE_KEY = '_last_write'
+
+
+def read_only(view):
+    """Mark a view as read-only so its queries may go to the read engine."""
+    view._read_only = True
+    return view
+
+
+def _reads_from_replica():
+    if not has_request_context() or not g.get('read_only'):
+        return False
+    window = current_app.config['READ_YOUR_WRITES_SECONDS']
+    return time.time() - session.get(LAST_WRITE_KEY, 0) >= window
+
+
+class RoutingSession(Session):
+    """Session sending reads of read-only requests to the read engine and everything else to the primary."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and _reads_from_replica():
+            engine = self._db.engines.get(READ_BIND)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def configure_read_bind(app):
+    """
+    Add the 'read' bind to SQLALCHEMY_BINDS when read routing is enabled.
+
+    SQLALCHEMY_READ_DATABASE_URI names a replica explicitly. Otherwise, with the
+    SQLite profile, the primary file is opened again in read-only mode.
+    Must run after apply_engine_profile() and before db.init_app().
+    """
+    config = app.config
+    if not config['DB_READ_ROUTING']:
+        return
+
+    uri = config.get('SQLALCHEMY_READ_DATABASE_URI')
+    if not uri:
+        primary = make_url(config['SQLALCHEMY_DATABASE_URI'])
+        if primary.get_backend_name() != 'sqlite' or primary.database in (None, '', ':memory:'):
+            return
+        path = primary.database[len('file:'):] if primary.database.startswith('file:') else primary.database
+        uri = f'sqlite:///file:{path}?mode=ro&uri=true'
+
+    binds = dict(config.get('SQLALCHEMY_BINDS') or {})
+    binds[READ_BIND] = uri
+    config['SQLALCHEMY_BINDS'] = binds
+
+
+def _mark_write(session_, flush_context, instances):
+    if has_request_context() and (session_.new or session_.dirty or session_.deleted):
+        g.wrote_data = True
+
+
+def init_read_routing(app, db):
+    """Register the request hooks that drive routing and read-your-writes."""
+    if not event.contains(db.session, 'before_flush', _mark_write):
+        event.listen(db.session, 'before_flush', _mark_write)
+
+    @app.before_request
+    def _route_read_only_views():
+        view = app.view_functions.get(request.endpoint)
+        g.read_only = getattr(view, '_read_only', False)
+
+    @app.after_request
+    def _remember_write(response):
+        if g.get('wrote_data'):
+            session[LAST_WRITE_KEY] = time.time()
+        return response
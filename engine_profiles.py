@@ -0,0 +1,87 @@
+'''
+Database engine profiles for HealthTracker
+'sqlite' runs a local database file in WAL mode with tuned pragmas so writers
+do not block dashboard readers; 'server' connects to a networked database
+whose URI comes from the environment.
+'''
+import os
+
+from sqlalchemy import event
+
+PROFILES = ('sqlite', 'server')
+
+SQLITE_DEFAULT_URI = 'sqlite:///nutritrack.db'
+
+
+def apply_engine_profile(app):
+    """
+    Fill SQLALCHEMY_DATABASE_URI and SQLALCHEMY_ENGINE_OPTIONS from DB_ENGINE_PROFILE.
+
+    Must run before db.init_app(). Options already present in
+    SQLALCHEMY_ENGINE_OPTIONS take precedence over the profile's defaults.
+    """
+    config = app.config
+    profile = config.get('DB_ENGINE_PROFILE', 'sqlite')
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown DB_ENGINE_PROFILE {profile!r}, expected one of {PROFILES}")
+
+    if profile == 'sqlite':
+        config['SQLALCHEMY_DATABASE_URI'] = config.get('SQLALCHEMY_DATABASE_URI') or SQLITE_DEFAULT_URI
+        options = {
+            # Seconds the driver waits on a locked database before raising
+            'connect_args': {'timeout': config['SQLITE_BUSY_TIMEOUT_MS'] / 1000},
+        }
+    else:
+        uri = config.get('SQLALCHEMY_DATABASE_URI') or os.environ.get('DATABASE_URL')
+        if not uri:
+            raise RuntimeError("DB_ENGINE_PROFILE 'server' needs DATABASE_URL to be set")
+        config['SQLALCHEMY_DATABASE_URI'] = uri
+        options = {
+            'pool_size': config['DB_POOL_SIZE'],
+            'max_overflow': config['DB_MAX_OVERFLOW'],
+            'pool_recycle': config['DB_POOL_RECYCLE'],
+            'pool_pre_ping': True,
+        }
+
+    options.update(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+
+def sqlite_pragmas(config, read_only=False):
+    """
+    Build the PRAGMA statements run on every new SQLite connection.
+
+    Args:
+        config: Flask config with the SQLITE_* settings
+        read_only: Skip the pragmas that would write to the database file
+
+    Returns:
+        List of SQL statements
+    """
+    pragmas = [] if read_only else [
+        f"PRAGMA journal_mode={config['SQLITE_JOURNAL_MODE']}",
+        f"PRAGMA synchronous={config['SQLITE_SYNCHRONOUS']}",
+    ]
+    return pragmas + [
+        f"PRAGMA busy_timeout={int(config['SQLITE_BUSY_TIMEOUT_MS'])}",
+        f"PRAGMA mmap_size={int(config['SQLITE_MMAP_SIZE'])}",
+        # Negative values are KiB rather than pages
+        f"PRAGMA cache_size=-{int(config['SQLITE_CACHE_SIZE_KIB'])}",
+        "PRAGMA temp_store=MEMORY",
+    ]
+
+
+def install_sqlite_pragmas(app, engine, read_only=False):
+    """Run the configured pragmas on each new connection of a SQLite engine."""
+    if engine.dialect.name != 'sqlite':
+        return
+    pragmas = sqlite_pragmas(app.config, read_only=read_only)
+
+    @event.listens_for(engine, 'connect')
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
@@ -0,0 +1,195 @@
+'''
+Meal and food item logging for HealthTracker
+Builds FoodLog rows for saved meals and custom food items. The nutrients of
+every requested meal (summed over its items) and item (per unit) come from one
+query, instead of the Meal.total_* properties, which walk the items and load
+each custom item in Python once per nutrient.
+
+parse_entries validates the JSON body of the batch endpoint (/api/log_food);
+build_food_logs writes the rows with one INSERT and leaves the commit to the
+caller, so a batch is written in a single transaction.
+'''
+import math
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+import pytz
+import sqlalchemy as sa
+
+from app import db
+from data_version import bump_data_version
+from models import CustomItem, Meal, MealItem, FoodLog
+from rolling_stats import apply_inserted_food_logs
+
+tz_ist = pytz.timezone('Asia/Kolkata')
+
+MEAL_TYPES = ('breakfast', 'lunch', 'dinner', 'snack')
+NUTRIENTS = ('calories', 'protein', 'carbohydrates', 'fiber', 'sugar', 'sodium')
+# Largest quantity one entry may log, in servings or in the item's unit
+MAX_QUANTITY = 10000
+
+# kind is 'meal' or 'item'; quantity is servings of a meal or the amount of an item in its own unit;
+# when is a naive IST datetime, or None for now
+LogEntry = namedtuple('LogEntry', 'kind id quantity meal_type when')
+
+
+def nutrient_totals(user_id, meal_ids=(), item_ids=()):
+    """
+    Name, serving and nutrients of the user's meals (per serving) and custom items (per unit).
+
+    Args:
+        user_id: Owner; meals and items of other users are left out
+        meal_ids: Meal ids
+        item_ids: CustomItem ids
+
+    Returns:
+        Dict of (kind, id) -> dict of name, serving (1 for a meal, the item's
+        own quantity for an item) and the NUTRIENTS
+    """
+    selects = []
+    if meal_ids:
+        # Outer joins so a meal without items is still found, with zero totals
+        selects.append(sa.select(
+            sa.literal('meal').label('kind'), Meal.id, Meal.name, sa.literal(1.0).label('serving'),
+            *(sa.func.coalesce(sa.func.sum(getattr(CustomItem, nutrient) * MealItem.quantity / CustomItem.quantity),
+                               0).label(nutrient) for nutrient in NUTRIENTS)
+        ).select_from(Meal).outerjoin(MealItem, MealItem.meal_id == Meal.id).outerjoin(
+            CustomItem, CustomItem.id == MealItem.custom_item_id
+        ).where(Meal.user_id == user_id, Meal.id.in_(set(meal_ids))).group_by(Meal.id, Meal.name))
+    if item_ids:
+        selects.append(sa.select(
+            sa.literal('item').label('kind'), CustomItem.id, CustomItem.name, CustomItem.quantity.label('serving'),
+            *((getattr(CustomItem, nutrient) / CustomItem.quantity).label(nutrient) for nutrient in NUTRIENTS)
+        ).where(CustomItem.user_id == user_id, CustomItem.id.in_(set(item_ids))))
+    if not selects:
+        return {}
+    query = selects[0] if len(selects) == 1 else sa.union_all(*selects)
+    return {
+        (row.kind, row.id): dict({'name': row.name, 'serving': row.serving},
+                                 **{nutrient: getattr(row, nutrient) for nutrient in NUTRIENTS})
+        for row in db.session.execute(query)
+    }
+
+
+def _quantity(value, prefix):
+    # json.loads turns Infinity and 1e309 into inf, which would poison every sum it reaches
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value) \
+            or not 0 < value <= MAX_QUANTITY:
+        raise ValueError(f'{prefix}: quantity must be a number above 0 and at most {MAX_QUANTITY}')
+    return float(value)
+
+
+def _when(value, today, max_days_back, prefix):
+    """Naive IST datetime for an entry's date; a bare date is placed at noon of that day."""
+    if value is None:
+        return None
+    try:
+        when = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{prefix}: date must be an ISO date or datetime')
+    if len(value) == 10:
+        when = when.replace(hour=12)
+    if when.tzinfo is not None:
+        when = when.astimezone(tz_ist).replace(tzinfo=None)
+    if when.date() > today:
+        raise ValueError(f'{prefix}: date cannot be in the future')
+    if when.date() < today - timedelta(days=max_days_back):
+        raise ValueError(f'{prefix}: date cannot be more than {max_days_back} days ago')
+    return when
+
+
+def parse_entries(payload, today, max_entries, max_days_back):
+    """
+    Validate the body of a batch logging request.
+
+    Args:
+        payload: Decoded JSON, {"entries": [...]}; each entry has either meal_id
+                 or custom_item_id, and optionally quantity (servings of a meal,
+                 default 1, or the amount of an item in its unit, default the
+                 item's own quantity), meal_type and date (ISO date or datetime)
+        today: Today in IST; later dates are rejected
+        max_entries: Most entries accepted in one request
+        max_days_back: Earliest date accepted, in days before today
+
+    Returns:
+        List of LogEntry; quantity is None where the item's own quantity applies
+
+    Raises:
+        ValueError: With a message naming the first invalid entry
+    """
+    entries = payload.get('entries') if isinstance(payload, dict) else None
+    if not isinstance(entries, list) or not entries:
+        raise ValueError('entries must be a non-empty list')
+    if len(entries) > max_entries:
+        raise ValueError(f'at most {max_entries} entries can be logged at once')
+
+    parsed = []
+    for index, entry in enumerate(entries):
+        prefix = f'entries[{index}]'
+        if not isinstance(entry, dict):
+            raise ValueError(f'{prefix}: must be an object')
+        if ('meal_id' in entry) == ('custom_item_id' in entry):
+            raise ValueError(f'{prefix}: give either meal_id or custom_item_id')
+        kind, key = ('meal', 'meal_id') if 'meal_id' in entry else ('item', 'custom_item_id')
+        if isinstance(entry[key], bool) or not isinstance(entry[key], int):
+            raise ValueError(f'{prefix}: {key} must be an integer')
+        quantity = entry.get('quantity', 1 if kind == 'meal' else None)
+        if quantity is not None:
+            quantity = _quantity(quantity, prefix)
+        meal_type = entry.get('meal_type')
+        if meal_type is not None and meal_type not in MEAL_TYPES:
+            raise ValueError(f'{prefix}: meal_type must be one of {", ".join(MEAL_TYPES)}')
+        parsed.append(LogEntry(kind, entry[key], quantity, meal_type, _when(entry.get('date'), today, max_days_back, prefix)))
+    return parsed
+
+
+def build_food_logs(user_id, entries):
+    """
+    Insert a FoodLog for each entry with one executemany INSERT, without committing.
+
+    The ORM would insert the rows one statement at a time on SQLite, which
+    cannot return the ids of a multi-row insert in order, so the rows go
+    through a bulk INSERT and the rolling statistics and data version, which
+    otherwise follow the session's flushes, are updated here. Back-dated
+    entries get their only_date set from the entry's date, since the column
+    default would file them under today.
+
+    Args:
+        user_id: Owner of the logs and of the meals and items they refer to
+        entries: List of LogEntry
+
+    Returns:
+        The inserted rows as dicts, in entry order
+
+    Raises:
+        LookupError: When a meal or item does not exist or belongs to another user
+    """
+    totals = nutrient_totals(user_id,
+                             meal_ids=[entry.id for entry in entries if entry.kind == 'meal'],
+                             item_ids=[entry.id for entry in entries if entry.kind == 'item'])
+    missing = [f'{entry.kind} {entry.id}' for entry in entries if (entry.kind, entry.id) not in totals]
+    if missing:
+        raise LookupError(f'not found: {", ".join(dict.fromkeys(missing))}')
+
+    now = datetime.now(tz_ist).replace(tzinfo=None)
+    rows = []
+    for entry in entries:
+        values = totals[(entry.kind, entry.id)]
+        quantity = entry.quantity if entry.quantity is not None else values['serving']
+        when = entry.when or now
+        rows.append(dict(
+            user_id=user_id,
+            name=values['name'],
+            quantity=quantity,
+            date=when,
+            only_date=when.date(),
+            meal_type=entry.meal_type,
+            description=f"Added {'meal' if entry.kind == 'meal' else 'food item'}: {values['name']}",
+            meal_id=entry.id if entry.kind == 'meal' else None,
+            custom_item_id=entry.id if entry.kind == 'item' else None,
+            **{nutrient: values[nutrient] * quantity for nutrient in NUTRIENTS}
+        ))
+    db.session.execute(sa.insert(FoodLog.__table__), rows)
+    apply_inserted_food_logs(db.session, rows)
+    bump_data_version(db.session, {user_id})
+    return rows
@@ -1,6 +1,10 @@
+from datetime import datetime
+
+import pytz
 from flask_wtf import FlaskForm
-from wtforms import StringField, PasswordField, SubmitField, TextAreaField, FloatField, SelectField, HiddenField
-from wtforms.validators import DataRequired, Email, EqualTo, Length, ValidationError, Optional
+from wtforms import StringField, PasswordField, SubmitField, TextAreaField, FloatField, SelectField, HiddenField, \
+    DateField
+from wtforms.validators import DataRequired, Email, EqualTo, Length, ValidationError, Optional, NumberRange
 from models import User
 
 class RegistrationForm(FlaskForm):
@@ -101,3 +105,12 @@ class ProfileForm(FlaskForm):
                                 ('gain', 'Gain weight')],
                         validators=[Optional()])
     submit = SubmitField('Update Profile')
+
+class WeightLogForm(FlaskForm):
+    weight = FloatField('Weight (kg)', validators=[DataRequired(), NumberRange(min=20, max=400)])
+    date = DateField('Date', validators=[Optional()])
+    submit = SubmitField('Log Weight')
+    
+    def validate_date(self, date):
+        if date.data and date.data > datetime.now(pytz.timezone('Asia/Kolkata')).date():
+            raise ValidationError('Weigh-ins cannot be dated in the future.')
@@ -0,0 +1,125 @@
+'''
+Logging setup for HealthTracker
+Leveled, structured logging with per-module levels. Records are handed to a
+background thread through a queue, so request handlers never block on console
+or file writes. High-volume events can be sampled by passing
+``extra={'sample_rate': 0.01}``.
+'''
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import random
+
+# Attributes every LogRecord has; anything else was passed through ``extra``
+_RESERVED_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'sample_rate'}
+
+_listener = None
+
+
+class SamplingFilter(logging.Filter):
+    """Drop a record with probability 1 - ``record.sample_rate``; records without one always pass."""
+
+    def filter(self, record):
+        rate = getattr(record, 'sample_rate', None)
+        if rate is None or rate >= 1:
+            return True
+        return random.random() < rate
+
+
+class StructuredFormatter(logging.Formatter):
+    """
+    Formatter that appends ``extra`` fields to the message.
+
+    Args:
+        json_output: Emit one JSON object per line instead of key=value text
+    """
+
+    def __init__(self, json_output=False):
+        super().__init__('%(asctime)s %(levelname)s %(name)s: %(message)s')
+        self.json_output = json_output
+
+    def _fields(self, record):
+        return {key: value for key, value in vars(record).items() if key not in _RESERVED_ATTRS}
+
+    def format(self, record):
+        fields = self._fields(record)
+        if self.json_output:
+            document = {
+                'time': self.formatTime(record),
+                'level': record.levelname,
+                'logger': record.name,
+                'message': record.getMessage(),
+                **fields,
+            }
+            if record.exc_info:
+                document['exc_info'] = self.formatException(record.exc_info)
+            return json.dumps(document, default=str)
+
+        line = super().format(record)
+        if fields:
+            line += ' ' + ' '.join(f'{key}={value}' for key, value in fields.items())
+        return line
+
+
+def parse_levels(spec):
+    """
+    Parse per-module levels written as 'routes=DEBUG,sqlalchemy.engine=WARNING'.
+
+    Args:
+        spec: Comma separated logger=LEVEL pairs, or a dict
+
+    Returns:
+        Dict of logger name to level name
+    """
+    if isinstance(spec, dict):
+        return spec
+    levels = {}
+    for item in (spec or '').split(','):
+        if '=' in item:
+            name, level = item.split('=', 1)
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def configure_logging(app):
+    """
+    Configure the root logger from app config.
+
+    Uses LOG_LEVEL, LOG_LEVELS, LOG_FORMAT ('text' or 'json') and LOG_QUEUE.
+    Calling it again replaces the handlers installed by the previous call.
+    """
+    global _listener
+
+    root = logging.getLogger()
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    for handler in list(root.handlers):
+        if getattr(handler, '_healthtracker', False):
+            root.removeHandler(handler)
+
+    output = logging.StreamHandler()
+    output.setFormatter(StructuredFormatter(json_output=app.config.get('LOG_FORMAT') == 'json'))
+
+    if app.config.get('LOG_QUEUE', True):
+        records = queue.SimpleQueue()
+        handler = logging.handlers.QueueHandler(records)
+        _listener = logging.handlers.QueueListener(records, output, respect_handler_level=True)
+        _listener.start()
+    else:
+        handler = output
+    handler.addFilter(SamplingFilter())
+    handler._healthtracker = True
+
+    root.addHandler(handler)
+    root.setLevel(app.config.get('LOG_LEVEL', 'INFO'))
+    for name, level in parse_levels(app.config.get('LOG_LEVELS')).items():
+        logging.getLogger(name).setLevel(level)
+
+
+@atexit.register
+def _stop_listener():
+    if _listener is not None:
+        _listener.stop()
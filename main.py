@@ -1,4 +1,10 @@
-from app import app  # noqa: F401
+'''
+Development server with the debugger and reloader.
+For production run `gunicorn wsgi:app` (see gunicorn.conf.py).
+'''
+from app import create_app
+
+app = create_app()
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
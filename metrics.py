@@ -0,0 +1,196 @@
+'''
+Request and SQL metrics for HealthTracker
+Engine events count the statements each request runs and the time spent in
+them; request hooks add the request duration and response size. Everything is
+kept per endpoint in in-process counters and histograms, exported in the
+Prometheus text format on /metrics.
+
+Behind a reverse proxy every request arrives from the proxy's address, so
+the address allowlist cannot tell a scraper from the public. With
+METRICS_TOKEN set, /metrics answers only requests carrying
+``Authorization: Bearer <token>``, which is the setting to use behind a
+proxy. Without it, /metrics answers only direct connections from
+METRICS_ALLOWED_ADDRESSES that carry no forwarding headers. That assumes the
+proxy sets X-Forwarded-For, as ProxyFix already requires.
+
+Each process keeps its own numbers, so under gunicorn every scrape reports the
+worker that answered it; scrape each worker, or run one worker while profiling.
+'''
+import hmac
+import threading
+import time
+from bisect import bisect_left
+
+from flask import Response, abort, current_app, g, has_request_context, request
+
+from db_events import on_statement
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+# Headers a reverse proxy adds; their presence means the peer address is the proxy's
+FORWARDING_HEADERS = ('X-Forwarded-For', 'X-Real-IP', 'Forwarded')
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter with labels."""
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label_values=(), amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for label_values, value in sorted(values.items()):
+            yield f'{self.name}{_format_labels(self.labels, label_values)} {_format_number(value)}'
+
+
+class Histogram:
+    """Cumulative-bucket histogram with labels."""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=DURATION_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, label_values=()):
+        with self._lock:
+            counts, total = self._values.get(label_values, (None, 0.0))
+            if counts is None:
+                counts = [0] * (len(self.buckets) + 1)
+            counts[bisect_left(self.buckets, value)] += 1
+            self._values[label_values] = (counts, total + value)
+
+    def samples(self):
+        with self._lock:
+            values = {key: (list(counts), total) for key, (counts, total) in self._values.items()}
+        for label_values, (counts, total) in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                labels = _format_labels(self.labels, label_values, [('le', _format_number(bound))])
+                yield f'{self.name}_bucket{labels} {cumulative}'
+            labels = _format_labels(self.labels, label_values)
+            yield f'{self.name}_sum{labels} {_format_number(total)}'
+            yield f'{self.name}_count{labels} {cumulative}'
+
+
+class Registry:
+    """The metrics of one app."""
+
+    def __init__(self):
+        self.requests = Counter('healthtracker_http_requests_total', 'Requests handled',
+                                ('endpoint', 'method', 'status'))
+        self.duration = Histogram('healthtracker_http_request_duration_seconds', 'Time to build the response',
+                                  ('endpoint',), DURATION_BUCKETS)
+        self.response_size = Histogram('healthtracker_http_response_size_bytes', 'Response body size',
+                                       ('endpoint',), SIZE_BUCKETS)
+        self.sql_queries = Histogram('healthtracker_sql_queries_per_request', 'SQL statements run per request',
+                                     ('endpoint',), QUERY_COUNT_BUCKETS)
+        self.sql_time = Histogram('healthtracker_sql_seconds_per_request', 'Time spent in SQL per request',
+                                  ('endpoint',), DURATION_BUCKETS)
+
+    def collectors(self):
+        return [self.requests, self.duration, self.response_size, self.sql_queries, self.sql_time]
+
+    def render(self):
+        """Return every metric in the Prometheus text exposition format."""
+        lines = []
+        for collector in self.collectors():
+            lines.append(f'# HELP {collector.name} {collector.documentation}')
+            lines.append(f'# TYPE {collector.name} {collector.kind}')
+            lines.extend(collector.samples())
+        return '\n'.join(lines) + '\n'
+
+
+def _count_statement(conn, statement, parameters, executemany, seconds):
+    if has_request_context():
+        g.sql_queries = g.get('sql_queries', 0) + 1
+        g.sql_time = g.get('sql_time', 0.0) + seconds
+
+
+def install_query_timing(engine):
+    """Count and time the statements run on an engine for the current request."""
+    on_statement(engine, _count_statement)
+
+
+def peer_address():
+    """Address of the connecting peer, before ProxyFix replaces it with the client-supplied X-Forwarded-For."""
+    return request.environ.get('werkzeug.proxy_fix.orig', {}).get('REMOTE_ADDR', request.remote_addr)
+
+
+def metrics_allowed():
+    """Whether the current request may read /metrics; see the module docstring."""
+    token = current_app.config['METRICS_TOKEN']
+    if token:
+        return hmac.compare_digest(request.headers.get('Authorization', '').encode(), f'Bearer {token}'.encode())
+    # A proxied request comes from the proxy's (often local) address, so it never qualifies
+    if any(header in request.headers for header in FORWARDING_HEADERS):
+        return False
+    return peer_address() in current_app.config['METRICS_ALLOWED_ADDRESSES']
+
+
+def init_metrics(app, db):
+    """Instrument every engine, add the request hooks and register /metrics."""
+    if not app.config['METRICS_ENABLED']:
+        return
+    registry = app.extensions['metrics'] = Registry()
+    with app.app_context():
+        for engine in db.engines.values():
+            install_query_timing(engine)
+
+    @app.before_request
+    def _start_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        endpoint = request.endpoint or 'unmatched'
+        if endpoint == 'metrics' or 'request_started' not in g:
+            return response
+        labels = (endpoint,)
+        registry.requests.inc((endpoint, request.method, str(response.status_code)))
+        registry.duration.observe(time.perf_counter() - g.request_started, labels)
+        size = response.calculate_content_length()
+        if size is not None:
+            registry.response_size.observe(size, labels)
+        registry.sql_queries.observe(g.get('sql_queries', 0), labels)
+        registry.sql_time.observe(g.get('sql_time', 0.0), labels)
+        return response
+
+    def metrics():
+        if not metrics_allowed():
+            abort(404)
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+    app.add_url_rule('/metrics', 'metrics', metrics)
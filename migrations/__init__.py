@@ -0,0 +1,215 @@
+'''
+Versioned schema migrations for HealthTracker
+Migrations live in migrations/versions as modules named NNNN_description.py,
+each exposing upgrade(ctx). Applied versions are recorded in the
+schema_migrations table. Helpers on MigrationContext are idempotent, create
+indexes without blocking writers where the database allows it, and backfill
+large tables in committed batches so no single transaction holds the write
+lock for long.
+
+Usage: flask db upgrade | flask db status
+'''
+import importlib
+import pkgutil
+import time
+from datetime import datetime
+
+import click
+import pytz
+import sqlalchemy as sa
+from flask.cli import AppGroup
+
+MIGRATIONS_TABLE = 'schema_migrations'
+
+_migrations_table = sa.Table(
+    MIGRATIONS_TABLE, sa.MetaData(),
+    sa.Column('version', sa.String(32), primary_key=True),
+    sa.Column('name', sa.String(200), nullable=False),
+    sa.Column('applied_at', sa.DateTime, nullable=False),
+)
+
+
+class MigrationContext:
+    """
+    Helpers handed to each migration's upgrade().
+
+    Args:
+        engine: Engine of the database being migrated
+        metadata: Metadata of the app's models
+        batch_size: Rows per committed chunk in backfill()
+        batch_pause: Seconds to sleep between chunks so other writers get the lock
+        echo: Callable used for progress output
+    """
+
+    def __init__(self, engine, metadata, batch_size=1000, batch_pause=0.0, echo=click.echo):
+        self.engine = engine
+        self.metadata = metadata
+        self.batch_size = batch_size
+        self.batch_pause = batch_pause
+        self.echo = echo
+
+    @property
+    def dialect(self):
+        return self.engine.dialect.name
+
+    def quote(self, name):
+        return self.engine.dialect.identifier_preparer.quote(name)
+
+    def execute(self, sql, **params):
+        """Run one SQL statement in its own transaction."""
+        with self.engine.begin() as conn:
+            return conn.execute(sa.text(sql), params)
+
+    def has_table(self, table):
+        return sa.inspect(self.engine).has_table(table)
+
+    def has_column(self, table, column):
+        return column in {c['name'] for c in sa.inspect(self.engine).get_columns(table)}
+
+    def has_index(self, table, index):
+        return index in {i['name'] for i in sa.inspect(self.engine).get_indexes(table)}
+
+    def table(self, name):
+        """Reflect a table as it currently exists in the database."""
+        return sa.Table(name, sa.MetaData(), autoload_with=self.engine)
+
+    def create_tables(self, *names):
+        """Create model tables (and their indexes) that do not exist yet."""
+        for name in names:
+            if not self.has_table(name):
+                self.echo(f'  creating table {name}')
+                self.metadata.tables[name].create(self.engine)
+
+    def add_column(self, table, column, ddl_type):
+        """Add a nullable column unless it already exists."""
+        if self.has_column(table, column):
+            return
+        self.echo(f'  adding column {table}.{column}')
+        self.execute(f'ALTER TABLE {self.quote(table)} ADD COLUMN {self.quote(column)} {ddl_type}')
+
+    def create_index(self, name, table, columns, unique=False):
+        """
+        Create an index unless it already exists.
+
+        PostgreSQL builds it CONCURRENTLY, outside a transaction, so writes continue
+        during the build. SQLite in WAL mode keeps serving readers while it builds.
+        """
+        if self.has_index(table, name):
+            return
+        self.echo(f'  creating index {name} on {table}')
+        column_list = ', '.join(self.quote(column) for column in columns)
+        unique_sql = 'UNIQUE ' if unique else ''
+        if self.dialect == 'postgresql':
+            with self.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+                conn.execute(sa.text(
+                    f'CREATE {unique_sql}INDEX CONCURRENTLY IF NOT EXISTS {self.quote(name)} '
+                    f'ON {self.quote(table)} ({column_list})'
+                ))
+        else:
+            self.execute(f'CREATE {unique_sql}INDEX IF NOT EXISTS {self.quote(name)} ON {self.quote(table)} ({column_list})')
+
+    def backfill(self, table, values, where):
+        """
+        Update matching rows in primary-key order, committing every batch_size rows.
+
+        Args:
+            table: Reflected table, see table()
+            values: Dict of column name to value or SQL expression
+            where: Expression selecting the rows that still need the update
+
+        Returns:
+            Number of rows updated
+        """
+        pk = table.c.id
+        last_id = None
+        updated = 0
+        while True:
+            with self.engine.begin() as conn:
+                query = sa.select(pk).where(where).order_by(pk).limit(self.batch_size)
+                if last_id is not None:
+                    query = query.where(pk > last_id)
+                ids = conn.execute(query).scalars().all()
+                if not ids:
+                    break
+                result = conn.execute(sa.update(table).where(pk.between(ids[0], ids[-1]), where).values(values))
+                updated += result.rowcount
+                last_id = ids[-1]
+            self.echo(f'  backfilled {updated} rows of {table.name}')
+            if self.batch_pause:
+                time.sleep(self.batch_pause)
+        return updated
+
+
+def discover():
+    """
+    Find the available migrations.
+
+    Returns:
+        List of (version, name, module) sorted by version
+    """
+    from migrations import versions
+
+    found = []
+    for info in pkgutil.iter_modules(versions.__path__):
+        version, _, name = info.name.partition('_')
+        if version.isdigit():
+            module = importlib.import_module(f'{versions.__name__}.{info.name}')
+            found.append((version, name, module))
+    return sorted(found, key=lambda migration: migration[0])
+
+
+def applied_versions(engine):
+    """Return the set of versions recorded in schema_migrations, creating the table if needed."""
+    _migrations_table.create(engine, checkfirst=True)
+    with engine.connect() as conn:
+        return set(conn.execute(sa.select(_migrations_table.c.version)).scalars())
+
+
+def upgrade(engine, metadata, target=None, **context_options):
+    """
+    Apply pending migrations in order, up to and including ``target``.
+
+    Returns:
+        List of versions applied
+    """
+    done = applied_versions(engine)
+    ctx = MigrationContext(engine, metadata, **context_options)
+    applied = []
+    for version, name, module in discover():
+        if target is not None and version > target:
+            break
+        if version in done:
+            continue
+        ctx.echo(f'Applying {version} {name}')
+        module.upgrade(ctx)
+        with engine.begin() as conn:
+            conn.execute(sa.insert(_migrations_table).values(version=version, name=name, applied_at=datetime.now(pytz.utc).replace(tzinfo=None)))
+        applied.append(version)
+    return applied
+
+
+def init_migrations(app, db):
+    """Register the 'flask db' command group."""
+    group = AppGroup('db', help='Manage database schema migrations.')
+
+    def _options():
+        return {
+            'batch_size': app.config['MIGRATION_BATCH_SIZE'],
+            'batch_pause': app.config['MIGRATION_BATCH_PAUSE'],
+        }
+
+    @group.command('upgrade')
+    @click.option('--target', default=None, help='Stop after this version.')
+    def upgrade_command(target):
+        """Apply pending migrations."""
+        applied = upgrade(db.engine, db.metadata, target=target, **_options())
+        click.echo(f'Applied {len(applied)} migration(s)' if applied else 'Database is up to date')
+
+    @group.command('status')
+    def status_command():
+        """List migrations and whether they have been applied."""
+        done = applied_versions(db.engine)
+        for version, name, _ in discover():
+            click.echo(f"{'applied' if version in done else 'pending':<8} {version} {name}")
+
+    app.cli.add_command(group)
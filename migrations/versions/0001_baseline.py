@@ -0,0 +1,7 @@
+'''
+Baseline schema: every table the app had before versioned migrations.
+'''
+
+
+def upgrade(ctx):
+    ctx.create_tables('user', 'custom_item', 'meal', 'meal_item', 'food_log', 'exercise_log', 'data_version')
@@ -0,0 +1,13 @@
+'''
+Profile columns on user, for databases created before the profile existed.
+Replaces the old db_update.py script.
+'''
+
+
+def upgrade(ctx):
+    ctx.add_column('user', 'weight', 'FLOAT')
+    ctx.add_column('user', 'height', 'FLOAT')
+    ctx.add_column('user', 'age', 'INTEGER')
+    ctx.add_column('user', 'gender', 'VARCHAR(10)')
+    ctx.add_column('user', 'activity_level', 'VARCHAR(20)')
+    ctx.add_column('user', 'motive', 'VARCHAR(20)')
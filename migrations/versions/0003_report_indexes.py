@@ -0,0 +1,10 @@
+'''
+Indexes for the per-user date range queries behind the dashboard, reports and charts.
+'''
+
+
+def upgrade(ctx):
+    ctx.create_index('ix_food_log_user_only_date', 'food_log', ['user_id', 'only_date'])
+    ctx.create_index('ix_food_log_user_date', 'food_log', ['user_id', 'date'])
+    ctx.create_index('ix_exercise_log_user_only_date', 'exercise_log', ['user_id', 'only_date'])
+    ctx.create_index('ix_exercise_log_user_date', 'exercise_log', ['user_id', 'date'])
@@ -0,0 +1,15 @@
+'''
+Fill only_date from date on log rows where it was never set, so reports keyed
+on only_date see them.
+'''
+import sqlalchemy as sa
+
+
+def upgrade(ctx):
+    for name in ('food_log', 'exercise_log'):
+        table = ctx.table(name)
+        if ctx.dialect == 'sqlite':
+            day = sa.func.date(table.c.date)
+        else:
+            day = sa.cast(table.c.date, sa.Date)
+        ctx.backfill(table, {'only_date': day}, table.c.only_date.is_(None) & table.c.date.isnot(None))
@@ -0,0 +1,7 @@
+'''
+Columnar archive segments holding compacted old food and exercise logs.
+'''
+
+
+def upgrade(ctx):
+    ctx.create_tables('archive_segment')
@@ -0,0 +1,7 @@
+'''
+Profile version on user, used to revalidate cached user snapshots.
+'''
+
+
+def upgrade(ctx):
+    ctx.add_column('user', 'profile_version', 'INTEGER NOT NULL DEFAULT 0')
@@ -0,0 +1,7 @@
+'''
+Daily totals and rolling statistics per user; both are built on first use.
+'''
+
+
+def upgrade(ctx):
+    ctx.create_tables('daily_total', 'rolling_stats')
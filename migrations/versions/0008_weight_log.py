@@ -0,0 +1,8 @@
+'''
+Weight log with its weekly rollup, and the smoothed trend weight on user.
+'''
+
+
+def upgrade(ctx):
+    ctx.create_tables('weight_log', 'weight_week')
+    ctx.add_column('user', 'trend_weight', 'FLOAT')
@@ -19,6 +19,11 @@ class User(UserMixin, db.Model):
     activity_level = db.Column(db.String(20))
     motive = db.Column(db.String(20))  # 'lose', 'maintain', 'gain'
     
+    # Bumped on every profile change so cached user snapshots can be revalidated
+    profile_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Smoothed body weight from the weight log, see weight_trend.py; None until the first weigh-in
+    trend_weight = db.Column(db.Float)
+    
     # Relationships
     custom_items = db.relationship('CustomItem', backref='user', lazy=True)
     meals = db.relationship('Meal', backref='user', lazy=True)
@@ -126,6 +131,11 @@ class MealItem(db.Model):
         return self.custom_item.sodium * (self.quantity / self.custom_item.quantity)
 
 class FoodLog(db.Model):
+    __table_args__ = (
+        db.Index('ix_food_log_user_only_date', 'user_id', 'only_date'),
+        db.Index('ix_food_log_user_date', 'user_id', 'date'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     date = db.Column(db.DateTime,default=lambda: datetime.now(pytz.timezone('Asia/Kolkata')).date())
@@ -151,6 +161,11 @@ class FoodLog(db.Model):
         return f'<FoodLog {self.id} on {self.date}>'
 
 class ExerciseLog(db.Model):
+    __table_args__ = (
+        db.Index('ix_exercise_log_user_only_date', 'user_id', 'only_date'),
+        db.Index('ix_exercise_log_user_date', 'user_id', 'date'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     date = db.Column(db.DateTime,default=lambda: datetime.now(pytz.timezone('Asia/Kolkata')).date())
@@ -162,3 +177,86 @@ class ExerciseLog(db.Model):
     
     def __repr__(self):
         return f'<ExerciseLog {self.name} on {self.date}>'
+
+class DataVersion(db.Model):
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(pytz.utc).replace(tzinfo=None))
+    
+    def __repr__(self):
+        return f'<DataVersion {self.version} for User {self.user_id}>'
+
+class ArchiveSegment(db.Model):
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'kind', 'year', name='uq_archive_segment_user_kind_year'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    kind = db.Column(db.String(20), nullable=False)  # food, exercise
+    year = db.Column(db.Integer, nullable=False)
+    row_count = db.Column(db.Integer, nullable=False)
+    first_date = db.Column(db.Date, nullable=False)
+    last_date = db.Column(db.Date, nullable=False)
+    # Compressed columnar encoding of the archived rows, see archive.py
+    payload = db.deferred(db.Column(db.LargeBinary, nullable=False))
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(pytz.utc).replace(tzinfo=None))
+    
+    def __repr__(self):
+        return f'<ArchiveSegment {self.kind} {self.year} for User {self.user_id}>'
+
+class DailyTotal(db.Model):
+    # Per-day sums of a user's food and exercise logs, kept up to date by rolling_stats.py
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    food_entries = db.Column(db.Integer, nullable=False, default=0)
+    exercise_entries = db.Column(db.Integer, nullable=False, default=0)
+    calories = db.Column(db.Float, nullable=False, default=0)
+    protein = db.Column(db.Float, nullable=False, default=0)
+    carbohydrates = db.Column(db.Float, nullable=False, default=0)
+    fiber = db.Column(db.Float, nullable=False, default=0)
+    sugar = db.Column(db.Float, nullable=False, default=0)
+    sodium = db.Column(db.Float, nullable=False, default=0)
+    calories_burned = db.Column(db.Float, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<DailyTotal {self.day} for User {self.user_id}>'
+
+class RollingStats(db.Model):
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    # Last closed day included in the windows and streaks
+    as_of = db.Column(db.Date, nullable=False)
+    # Window sums, adherence counts, streaks and the targets they were counted against, see rolling_stats.py
+    state = db.Column(db.JSON, nullable=False)
+    
+    def __repr__(self):
+        return f'<RollingStats as of {self.as_of} for User {self.user_id}>'
+
+class WeightLog(db.Model):
+    __table_args__ = (
+        db.Index('ix_weight_log_user_date', 'user_id', 'date'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    date = db.Column(db.DateTime, nullable=False)
+    weight = db.Column(db.Float, nullable=False)
+    # Exponentially smoothed weight up to and including this weigh-in
+    trend = db.Column(db.Float, nullable=False)
+    
+    def __repr__(self):
+        return f'<WeightLog {self.weight} on {self.date} for User {self.user_id}>'
+
+class WeightWeek(db.Model):
+    # Weekly rollup of the weight log, used for long-range charts
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    week_start = db.Column(db.Date, primary_key=True)  # Monday
+    count = db.Column(db.Integer, nullable=False)
+    total = db.Column(db.Float, nullable=False)
+    minimum = db.Column(db.Float, nullable=False)
+    maximum = db.Column(db.Float, nullable=False)
+    # Trend at the last weigh-in of the week
+    trend = db.Column(db.Float, nullable=False)
+    
+    def __repr__(self):
+        return f'<WeightWeek {self.week_start} for User {self.user_id}>'
@@ -284,23 +284,31 @@
 #
 # print(find_food('eat 2 apple'))
 
+import logging
+
 import requests
 import datetime
 import pytz
 
+from server_timing import timed
+
+logger = logging.getLogger(__name__)
+
 
 class NLPProcessor:
-    def __init__(self):
+    def __init__(self, food_url="http://127.0.0.1:5001/process_text",
+                 exercise_url="https://trackapi.nutritionix.com/v2/natural/exercise", timeout=10):
+        self.timeout = timeout
         self.nutritionix_config = {
             "exercise": {
-                "url": "https://trackapi.nutritionix.com/v2/natural/exercise",
+                "url": exercise_url,
                 "headers": {
                     "x-app-id": "127b9e9d",
                     "x-app-key": "d3f14705514a09f28cf0669fc0315c99"
                 }
             },
             "food": {
-                "url": "http://127.0.0.1:5001/process_text",
+                "url": food_url,
                 "headers": {
                     "x-app-id": "3db00a91",
                     "x-app-key": "8dc67612535c89a55858b8ab37364320"
@@ -315,17 +323,19 @@ class NLPProcessor:
             now_ist = datetime.datetime.now(tz_ist)
             date, time = str(now_ist.strftime("%Y-%m-%d %H:%M:%S")).split(" ")
 
-            response = requests.post(
-                url=self.nutritionix_config['exercise']['url'],
-                json={
-                    "query": user_input,
-                    "gender": gender,
-                    "weight_kg": weight,
-                    "height_cm": height,
-                    "age": age
-                },
-                headers=self.nutritionix_config['exercise']['headers']
-            )
+            with timed('upstream'):
+                response = requests.post(
+                    url=self.nutritionix_config['exercise']['url'],
+                    json={
+                        "query": user_input,
+                        "gender": gender,
+                        "weight_kg": weight,
+                        "height_cm": height,
+                        "age": age
+                    },
+                    headers=self.nutritionix_config['exercise']['headers'],
+                    timeout=self.timeout
+                )
             response.raise_for_status()
 
             exercises = []
@@ -342,7 +352,7 @@ class NLPProcessor:
             return exercises
 
         except Exception as e:
-            print(f"Exercise API Error: {str(e)}")
+            logger.warning('Exercise API error: %s', e)
             return []
 
     def process_food_query(self, user_input, user_id):
@@ -352,20 +362,20 @@ class NLPProcessor:
             now_ist = datetime.datetime.now(tz_ist)
             date, time = str(now_ist.strftime("%Y-%m-%d %H:%M:%S")).split(" ")
 
-            response = requests.post(
-                url=self.nutritionix_config['food']['url'],
-                json={"text": user_input}
-            )
+            with timed('upstream'):
+                response = requests.post(
+                    url=self.nutritionix_config['food']['url'],
+                    json={"text": user_input},
+                    timeout=self.timeout
+                )
             response.raise_for_status()
-            print(response.json())
-            data = response.json().get('found', {})
-            print(data)
-            missing = response.json().get('missing', [])
-            print(missing)
+            body = response.json()
+            data = body.get('found', {})
+            missing = body.get('missing', [])
+            logger.debug('food parser response', extra={'found': len(data), 'missing': len(missing)})
             food_items = []
 
             for food_name, details in data.items():
-                print(food_name, details)
                 food_items.append({
                     'food': food_name,
                     'date': date,
@@ -380,9 +390,8 @@ class NLPProcessor:
                     'quantity': details.get('quantity', 1),
                     'fiber': details.get('fiber', 0),
                 })
-            print(food_items)
             return food_items,missing
 
         except Exception as e:
-            print(f"Food API Error: {str(e)}")
+            logger.warning('Food API error: %s', e)
             return [], []
\ No newline at end of file
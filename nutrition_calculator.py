@@ -162,21 +162,31 @@ def calculate_exercise_recommendations(weight, motive, activity_level):
     }
 
 
+def effective_weight(user):
+    """
+    Weight used for recommendations: the smoothed trend from the weight log when
+    there is one, otherwise the weight entered on the profile.
+    """
+    return getattr(user, 'trend_weight', None) or user.weight
+
+
 def get_full_recommendations(user):
     """
     Generate comprehensive nutrition and exercise recommendations.
 
     Args:
-        user: Object with attributes weight (kg), height (cm), age (years), gender, activity_level, motive
+        user: Object with attributes weight (kg), height (cm), age (years), gender, activity_level, motive,
+              and optionally trend_weight (kg)
 
     Returns:
         Dict with BMR, TDEE, nutrition, and exercise recommendations
     """
-    bmr = calculate_bmr(user.weight, user.height, user.age, user.gender)
+    weight = effective_weight(user)
+    bmr = calculate_bmr(weight, user.height, user.age, user.gender)
     tdee = calculate_tdee(bmr, user.activity_level)
-    target_cal = calculate_target_calories(tdee, user.motive, user.weight)
-    nutrition = calculate_target_macros(target_cal, user.motive, user.weight)
-    exercise = calculate_exercise_recommendations(user.weight, user.motive, user.activity_level)
+    target_cal = calculate_target_calories(tdee, user.motive, weight)
+    nutrition = calculate_target_macros(target_cal, user.motive, weight)
+    exercise = calculate_exercise_recommendations(weight, user.motive, user.activity_level)
 
     return {
         'bmr': round(bmr),
@@ -184,3 +194,43 @@ def get_full_recommendations(user):
         'nutrition': nutrition,
         'exercise': exercise
     }
+
+
+# Targets used until the user completes their profile
+DEFAULT_TARGETS = {
+    'calories': 2000,
+    'protein': 50,
+    'carbohydrates': 250,
+    'fiber': 28,
+    'sugar': 50,
+    'sodium': 2300,
+}
+
+
+def has_complete_profile(user):
+    """Whether the user has every attribute get_full_recommendations needs."""
+    return all([user.weight, user.height, user.age, user.gender, user.activity_level, user.motive])
+
+
+def get_daily_targets(user):
+    """
+    Daily nutrient targets, keyed like the FoodLog columns.
+
+    Args:
+        user: Object with the attributes used by get_full_recommendations
+
+    Returns:
+        Dict of calories, protein, carbohydrates, fiber, sugar and sodium targets;
+        DEFAULT_TARGETS when the profile is incomplete
+    """
+    if not has_complete_profile(user):
+        return dict(DEFAULT_TARGETS)
+    nutrition = get_full_recommendations(user)['nutrition']
+    return {
+        'calories': nutrition['calories'],
+        'protein': nutrition['protein'],
+        'carbohydrates': nutrition['carbs'],
+        'fiber': nutrition['fiber'],
+        'sugar': nutrition['sugar'],
+        'sodium': nutrition['sodium'],
+    }
@@ -0,0 +1,204 @@
+'''
+Rendered page cache for HealthTracker reports
+Report pages are cached by (user, report type, period, data version), so going
+back through earlier days, weeks and months serves pre-rendered HTML. Any write
+bumps the user's data version and thereby retires their cached pages.
+'''
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from functools import wraps
+
+import pytz
+from flask import current_app, g, session
+from flask_login import current_user
+
+from data_version import current_data_version
+
+tz_ist = pytz.timezone('Asia/Kolkata')
+
+
+class NullBackend:
+    """Backend that never stores anything; used when caching is disabled."""
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value):
+        pass
+
+    def delete(self, key):
+        pass
+
+    def clear(self):
+        pass
+
+
+class LRUBackend:
+    """In-process, thread-safe LRU cache holding up to ``max_entries`` pages."""
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class FileSystemBackend:
+    """
+    On-disk cache shared by all workers on a host.
+
+    Pages are written atomically, one file per key. When more than
+    ``max_entries`` files exist the least recently written ones are removed.
+    """
+
+    def __init__(self, directory, max_entries=5000):
+        self.directory = directory
+        self.max_entries = max_entries
+        self._writes = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.html')
+
+    def get(self, key):
+        try:
+            with open(self._path(key), 'rb') as f:
+                return f.read().decode('utf-8')
+        except OSError:
+            return None
+
+    def set(self, key, value):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(value.encode('utf-8'))
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        self._writes += 1
+        if self._writes % 100 == 0:
+            self._prune()
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def _prune(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.html'):
+                path = os.path.join(self.directory, name)
+                try:
+                    entries.append((os.path.getmtime(path), path))
+                except OSError:
+                    continue
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort()
+        for _, path in entries[:len(entries) - self.max_entries]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name.endswith('.html'):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+
+def create_backend(config):
+    """
+    Build a cache backend from app config.
+
+    Args:
+        config: Flask config with PAGE_CACHE_BACKEND ('memory', 'filesystem' or 'null'),
+                PAGE_CACHE_SIZE and PAGE_CACHE_DIR
+
+    Returns:
+        Backend instance
+    """
+    backend = config.get('PAGE_CACHE_BACKEND', 'memory')
+    size = config.get('PAGE_CACHE_SIZE', 256)
+    if backend == 'memory':
+        return LRUBackend(max_entries=size)
+    if backend == 'filesystem':
+        return FileSystemBackend(config['PAGE_CACHE_DIR'], max_entries=size)
+    return NullBackend()
+
+
+def get_backend():
+    """Return the cache backend of the current app, creating it on first use."""
+    extensions = current_app.extensions
+    if 'page_cache' not in extensions:
+        extensions['page_cache'] = create_backend(current_app.config)
+    return extensions['page_cache']
+
+
+def cached_page(report_type, period):
+    """
+    Decorator caching the HTML a report view renders.
+
+    Args:
+        report_type: Name of the report, e.g. 'weekly'
+        period: Callable returning (period_key, is_historic) for the current request.
+                Pages for periods that are not yet over also depend on today's date.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # The page is what consumes pending flash messages, so never serve them from cache;
+            # profiled requests are rendered in full too
+            if session.get('_flashes') or g.get('profiler'):
+                return view(*args, **kwargs)
+
+            period_key, is_historic = period()
+            if not is_historic:
+                period_key = f'{period_key}@{datetime.now(tz_ist).date().isoformat()}'
+            version, _ = current_data_version()
+            key = f'{current_user.id}:{report_type}:{period_key}:{version}'
+
+            backend = get_backend()
+            html = backend.get(key)
+            if html is not None:
+                return html
+
+            result = view(*args, **kwargs)
+            if isinstance(result, str) and not session.get('_flashes'):
+                backend.set(key, result)
+            return result
+
+        return wrapper
+    return decorator
@@ -0,0 +1,112 @@
+'''
+On-demand request profiling for HealthTracker
+A user listed in PROFILER_ADMINS can add ``X-Profile: 1`` or ``?_profile=1``
+to any request to run it under cProfile. The request bypasses the page cache
+and revalidation so the full render is measured, and three files named after
+the request are written to PROFILE_DIR:
+- <name>.pstats: the profile, for `python -m pstats` or snakeviz
+- <name>.txt: the top functions by cumulative time
+- <name>.json: the request, its duration and every SQL statement with its timing
+
+The name is returned in the X-Profile response header.
+'''
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import time
+from datetime import datetime
+
+from flask import current_app, g, has_request_context, request
+from flask_login import current_user
+
+from db_events import on_statement
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = 'X-Profile'
+PROFILE_ARG = '_profile'
+# Functions listed in the .txt summary
+TOP_FUNCTIONS = 60
+
+
+def _record_statement(conn, statement, parameters, executemany, seconds):
+    if has_request_context() and g.get('profiler') is not None:
+        g.profile_queries.append({'statement': statement, 'parameters': repr(parameters)[:500],
+                                  'ms': round(seconds * 1000, 3)})
+
+
+def profiling_requested():
+    """Whether the current request asks to be profiled and comes from a profiler admin."""
+    if request.headers.get(PROFILE_HEADER) != '1' and request.args.get(PROFILE_ARG) != '1':
+        return False
+    if not current_user.is_authenticated:
+        return False
+    return current_user.email in current_app.config['PROFILER_ADMINS']
+
+
+def _write_profile(profiler, response, duration):
+    directory = current_app.config['PROFILE_DIR']
+    os.makedirs(directory, exist_ok=True)
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+    name = f"{stamp}-{(request.endpoint or 'unmatched').replace('.', '_')}-{current_user.id}"
+    path = os.path.join(directory, name)
+
+    profiler.dump_stats(f'{path}.pstats')
+    summary = io.StringIO()
+    pstats.Stats(profiler, stream=summary).sort_stats('cumulative').print_stats(TOP_FUNCTIONS)
+    with open(f'{path}.txt', 'w') as f:
+        f.write(summary.getvalue())
+
+    queries = g.profile_queries
+    with open(f'{path}.json', 'w') as f:
+        json.dump({
+            'method': request.method,
+            'path': request.full_path,
+            'endpoint': request.endpoint,
+            'user_id': current_user.id,
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 3),
+            'sql_count': len(queries),
+            'sql_ms': round(sum(query['ms'] for query in queries), 3),
+            'queries': queries,
+        }, f, indent=1)
+    return name
+
+
+def init_profiling(app, db):
+    """Register the profiling request hooks and SQL timing on every engine."""
+    if app.config['PROFILE_DIR'] is None:
+        app.config['PROFILE_DIR'] = os.path.join(app.instance_path, 'profiles')
+    if not app.config['PROFILER_ADMINS']:
+        return
+    with app.app_context():
+        for engine in db.engines.values():
+            on_statement(engine, _record_statement)
+
+    @app.before_request
+    def _start_profiler():
+        if profiling_requested():
+            g.profile_queries = []
+            g.profile_started = time.perf_counter()
+            g.profiler = cProfile.Profile()
+            g.profiler.enable()
+
+    @app.after_request
+    def _save_profile(response):
+        profiler = g.pop('profiler', None)
+        if profiler is None:
+            return response
+        profiler.disable()
+        duration = time.perf_counter() - g.profile_started
+        try:
+            name = _write_profile(profiler, response, duration)
+        except OSError:
+            logger.exception('could not write request profile')
+            return response
+        response.headers[PROFILE_HEADER] = name
+        logger.info('request profiled', extra={'profile': name, 'user_id': current_user.id,
+                                               'duration_ms': round(duration * 1000, 3)})
+        return response
@@ -0,0 +1,119 @@
+'''
+Query budgets and N+1 detection for HealthTracker
+Views declare how many SQL statements a request may run with @query_budget.
+When QUERY_GUARD is on, every statement of a request is recorded by shape
+(literals and parameter lists folded away), and after the view returns the
+request is checked against its budget and for one shape repeated
+QUERY_GUARD_REPEAT_LIMIT times or more, the usual sign of a query per row.
+
+QUERY_GUARD is 'raise' under TestingConfig, so a test client request that
+breaks either rule fails; 'warn' logs instead. benchmarks/query_budgets.py
+runs every budgeted view against a seeded dataset.
+'''
+import logging
+import re
+from collections import Counter
+
+from flask import current_app, g, has_request_context, request
+
+from db_events import on_statement
+
+logger = logging.getLogger(__name__)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PARAMETER_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+
+
+class QueryBudgetExceeded(AssertionError):
+    """A request ran more statements than its budget, or the same statement shape too often."""
+
+
+def query_budget(limit):
+    """
+    Declare the most SQL statements one request to a view may run.
+
+    Args:
+        limit: Statement budget, including the login and session queries
+
+    Returns:
+        Decorator marking the view
+    """
+    def decorator(view):
+        view._query_budget = limit
+        return view
+    return decorator
+
+
+def statement_shape(statement):
+    """
+    Normalize a SQL statement so queries differing only in values compare equal.
+
+    Args:
+        statement: SQL text as sent to the driver
+
+    Returns:
+        The statement with literals as ?, parameter lists as (?) and whitespace collapsed
+    """
+    shape = _STRING.sub('?', statement)
+    shape = _NUMBER.sub('?', shape)
+    shape = _PARAMETER_LIST.sub('(?)', shape)
+    return _WHITESPACE.sub(' ', shape).strip()
+
+
+def _record_statement(conn, statement, parameters, executemany, seconds):
+    if has_request_context() and 'query_shapes' in g:
+        g.query_shapes.append(statement_shape(statement))
+
+
+def check_request(endpoint, shapes, budget, repeat_limit):
+    """
+    Find the problems with the statements one request ran.
+
+    Args:
+        endpoint: Endpoint name, for the messages
+        shapes: Statement shapes in execution order
+        budget: The view's query budget, or None
+        repeat_limit: Times one shape may run before it counts as N+1
+
+    Returns:
+        List of problem descriptions, empty when the request is within its limits
+    """
+    problems = []
+    if budget is not None and len(shapes) > budget:
+        problems.append(f'{endpoint} ran {len(shapes)} statements, budget is {budget}')
+    for shape, count in Counter(shapes).most_common():
+        if count < repeat_limit:
+            break
+        problems.append(f'{endpoint} ran one statement {count} times (N+1?): {shape[:200]}')
+    return problems
+
+
+def init_query_guard(app, db):
+    """Record statement shapes per request and check them against the view's budget."""
+    mode = app.config['QUERY_GUARD']
+    if not mode:
+        return
+    with app.app_context():
+        for engine in db.engines.values():
+            on_statement(engine, _record_statement)
+
+    @app.before_request
+    def _start_recording():
+        g.query_shapes = []
+
+    @app.after_request
+    def _check_queries(response):
+        if 'query_shapes' not in g:
+            return response
+        view = current_app.view_functions.get(request.endpoint)
+        budget = getattr(view, '_query_budget', None)
+        g.query_problems = check_request(request.endpoint, g.query_shapes, budget,
+                                         current_app.config['QUERY_GUARD_REPEAT_LIMIT'])
+        if g.query_problems:
+            if mode == 'raise':
+                raise QueryBudgetExceeded('; '.join(g.query_problems))
+            for problem in g.query_problems:
+                logger.warning(problem, extra={'path': request.path})
+        return response
@@ -0,0 +1,396 @@
+'''
+Incremental rolling statistics for HealthTracker
+Each user has a DailyTotal row per day with logs, and one RollingStats row
+holding, as of the last closed day (yesterday):
+- 7- and 30-day window sums of calories, macros and calories burned, and the
+  number of days logged in each window, from which moving averages follow
+- per window, the number of logged days within each nutrient target
+- the current and longest streaks of consecutive days with food logged
+
+A session listener applies every food or exercise log insert, change or
+delete to its DailyTotal as a delta, and to the window counters when the day
+is already closed, so a back-dated log costs a few arithmetic updates. When a
+day closes, it is added to the windows and the day leaving each window is
+subtracted. Reading the statistics is a primary-key lookup plus today's
+total; only a change of targets, or a back-dated log that starts or ends a
+streak, triggers a recount over the stored daily totals.
+
+Users get their rows built from the logs (live and archived) on first read.
+Bulk inserts that bypass the flush pass their rows to apply_inserted_food_logs;
+`flask stats rebuild` rebuilds everything after other bulk changes.
+'''
+import copy
+from datetime import datetime, timedelta
+
+import click
+import pytz
+import sqlalchemy as sa
+from flask.cli import AppGroup
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from models import ArchiveSegment, DailyTotal, ExerciseLog, FoodLog, RollingStats, User
+from nutrition_calculator import get_daily_targets
+from timeseries import FOOD_FIELDS, load_series
+
+tz_ist = pytz.timezone('Asia/Kolkata')
+
+WINDOWS = (7, 30)
+METRICS = FOOD_FIELDS + ('calories_burned',)
+
+# How a day's total is compared with its target, within ADHERENCE_TOLERANCE:
+# 'range' is near the target, 'min' at least the target, 'max' at most the target
+ADHERENCE = {
+    'calories': 'range',
+    'protein': 'min',
+    'carbohydrates': 'range',
+    'fiber': 'min',
+    'sugar': 'max',
+    'sodium': 'max',
+}
+ADHERENCE_TOLERANCE = 0.10
+
+# Window sums are stored rounded so repeated +/- updates do not accumulate float noise
+_PRECISION = 6
+
+
+def within_target(value, target, rule):
+    """Whether a day's total of a nutrient meets its target under an ADHERENCE rule."""
+    if rule == 'min':
+        return value >= target * (1 - ADHERENCE_TOLERANCE)
+    if rule == 'max':
+        return value <= target * (1 + ADHERENCE_TOLERANCE)
+    return abs(value - target) <= target * ADHERENCE_TOLERANCE
+
+
+def _empty_window():
+    return {'sums': {metric: 0 for metric in METRICS}, 'logged_days': 0,
+            'within': {metric: 0 for metric in ADHERENCE}}
+
+
+def _empty_state(targets):
+    return {'targets': targets, 'windows': {str(window): _empty_window() for window in WINDOWS},
+            'streak': {'current': 0, 'longest': 0}}
+
+
+def _apply(window, values, sign, targets):
+    """Add (sign 1) or remove (sign -1) one day's totals, a dict or None, to a window's counters."""
+    if not values:
+        return
+    for metric in METRICS:
+        window['sums'][metric] = round(window['sums'][metric] + sign * values[metric], _PRECISION)
+    if values['food_entries'] > 0:
+        window['logged_days'] += sign
+        for metric, rule in ADHERENCE.items():
+            if within_target(values[metric], targets[metric], rule):
+                window['within'][metric] += sign
+
+
+def _values(total):
+    if total is None:
+        return None
+    return {name: getattr(total, name) for name in METRICS + ('food_entries', 'exercise_entries')}
+
+
+def _totals_between(user_id, start_date, end_date):
+    """Stored daily totals as a dict of day -> values."""
+    rows = db.session.execute(sa.select(DailyTotal).where(
+        DailyTotal.user_id == user_id,
+        DailyTotal.day >= start_date,
+        DailyTotal.day <= end_date
+    )).scalars()
+    return {row.day: _values(row) for row in rows}
+
+
+def _streaks(logged_days, through):
+    """Current streak ending at ``through`` and longest streak, from the set of logged days up to it."""
+    longest = run = 0
+    previous = None
+    for day in sorted(logged_days):
+        run = run + 1 if previous is not None and day - previous == timedelta(days=1) else 1
+        longest = max(longest, run)
+        previous = day
+    current = run if previous == through else 0
+    return {'current': current, 'longest': longest}
+
+
+def _logged_days(user_id, through):
+    return set(db.session.execute(sa.select(DailyTotal.day).where(
+        DailyTotal.user_id == user_id,
+        DailyTotal.day <= through,
+        DailyTotal.food_entries > 0
+    )).scalars())
+
+
+def _close_days(state, as_of, through, totals):
+    """
+    Slide the windows and streaks forward from ``as_of`` to ``through``.
+
+    Args:
+        state: RollingStats state, updated in place
+        as_of: Last day already counted
+        through: Last day to count
+        totals: Dict of day -> values covering the days closed and those leaving the windows
+    """
+    targets = state['targets']
+    streak = state['streak']
+    day = as_of
+    while day < through:
+        day += timedelta(days=1)
+        values = totals.get(day)
+        for window in WINDOWS:
+            counters = state['windows'][str(window)]
+            _apply(counters, values, 1, targets)
+            _apply(counters, totals.get(day - timedelta(days=window)), -1, targets)
+        if streak is not None:
+            streak['current'] = streak['current'] + 1 if values and values['food_entries'] > 0 else 0
+            streak['longest'] = max(streak['longest'], streak['current'])
+
+
+def _recount_windows(state, as_of, totals):
+    """Recount every window from stored totals, after the targets changed."""
+    for window in WINDOWS:
+        counters = state['windows'][str(window)] = _empty_window()
+        for offset in range(window):
+            _apply(counters, totals.get(as_of - timedelta(days=offset)), 1, state['targets'])
+
+
+def _first_log_day(user_id):
+    firsts = db.session.execute(sa.select(
+        sa.select(sa.func.min(FoodLog.only_date)).where(FoodLog.user_id == user_id).scalar_subquery(),
+        sa.select(sa.func.min(ExerciseLog.only_date)).where(ExerciseLog.user_id == user_id).scalar_subquery(),
+        sa.select(sa.func.min(ArchiveSegment.first_date)).where(ArchiveSegment.user_id == user_id).scalar_subquery(),
+    )).one()
+    days = [day for day in firsts if day is not None]
+    return min(days) if days else None
+
+
+def rebuild(user, today):
+    """
+    Rebuild a user's daily totals and rolling statistics from their logs.
+
+    Args:
+        user: User (or cached snapshot) whose targets the adherence counts use
+        today: The user's current date; days before it are closed
+
+    Returns:
+        The new RollingStats, added to the session but not committed
+    """
+    first = _first_log_day(user.id) or today
+    series = load_series(user.id, first, today)
+    columns = {name: series.daily(name) for name in METRICS + ('food_entries', 'exercise_entries')}
+    rows = []
+    for index, day in enumerate(series.dates()):
+        if columns['food_entries'][index] or columns['exercise_entries'][index]:
+            rows.append(dict({name: values[index] for name, values in columns.items()}, user_id=user.id, day=day))
+    db.session.execute(sa.delete(DailyTotal).where(DailyTotal.user_id == user.id))
+    if rows:
+        db.session.execute(sa.insert(DailyTotal), rows)
+
+    as_of = today - timedelta(days=1)
+    state = _empty_state(get_daily_targets(user))
+    _close_days(state, first - timedelta(days=1), as_of, {row['day']: row for row in rows})
+
+    stats = db.session.get(RollingStats, user.id)
+    if stats is None:
+        stats = RollingStats(user_id=user.id)
+        db.session.add(stats)
+    stats.as_of = as_of
+    stats.state = state
+    return stats
+
+
+def _bring_up_to_date(stats, user, today):
+    """Close the days since stats.as_of and recount what a target change or back-dated log invalidated."""
+    through = today - timedelta(days=1)
+    state = copy.deepcopy(stats.state)
+    targets = get_daily_targets(user)
+    if through > stats.as_of or state['targets'] != targets or state['streak'] is None:
+        oldest = min(stats.as_of + timedelta(days=1), through) - timedelta(days=max(WINDOWS))
+        totals = _totals_between(user.id, oldest, through)
+        _close_days(state, stats.as_of, through, totals)
+        if state['targets'] != targets:
+            state['targets'] = targets
+            _recount_windows(state, through, totals)
+        if state['streak'] is None:
+            state['streak'] = _streaks(_logged_days(user.id, through), through)
+        stats.as_of = through
+        stats.state = state
+        return True
+    return False
+
+
+def current_stats(user, today):
+    """
+    Rolling statistics for a user, closing any days that ended since the last read.
+
+    Args:
+        user: User (or cached snapshot)
+        today: The user's current date
+
+    Returns:
+        Dict of as_of, moving averages (per logged day), logged days and days
+        within target per window, the current streak including today, the
+        longest streak and the targets
+    """
+    stats = db.session.get(RollingStats, user.id)
+    if stats is None:
+        stats = rebuild(user, today)
+        changed = True
+    else:
+        changed = _bring_up_to_date(stats, user, today)
+    if changed:
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Another request built this user's statistics first
+            db.session.rollback()
+            stats = db.session.get(RollingStats, user.id)
+
+    state = stats.state
+    today_total = db.session.get(DailyTotal, (user.id, today))
+    streak = dict(state['streak'])
+    if today_total is not None and today_total.food_entries > 0:
+        streak['current'] += 1
+        streak['longest'] = max(streak['longest'], streak['current'])
+
+    windows = {}
+    for window in WINDOWS:
+        counters = state['windows'][str(window)]
+        logged = counters['logged_days']
+        windows[str(window)] = {
+            'logged_days': logged,
+            'average': {metric: round(counters['sums'][metric] / logged, 2) if logged else None
+                        for metric in METRICS},
+            'within_target': counters['within'],
+        }
+    return {
+        'as_of': stats.as_of.isoformat(),
+        'windows': windows,
+        'streak': streak,
+        'targets': state['targets'],
+    }
+
+
+def _log_values(obj, previous):
+    """(user_id, day, values) of a FoodLog or ExerciseLog as stored before this flush, or as it will be."""
+    state = sa.inspect(obj)
+
+    def value(name):
+        if previous:
+            history = state.attrs[name].history
+            if history.deleted:
+                return history.deleted[0]
+        return getattr(obj, name)
+
+    # A new log's only_date is filled in on insert by its column default, today in IST
+    day = value('only_date') or datetime.now(tz_ist).date()
+    if isinstance(obj, FoodLog):
+        values = {metric: value(metric) or 0 for metric in FOOD_FIELDS}
+        values.update(calories_burned=0, food_entries=1, exercise_entries=0)
+    else:
+        values = {metric: 0 for metric in FOOD_FIELDS}
+        values.update(calories_burned=value('calories_burned') or 0, food_entries=0, exercise_entries=1)
+    return value('user_id'), day, values
+
+
+def _add_delta(deltas, user_id, day, values, sign):
+    delta = deltas.setdefault((user_id, day), dict.fromkeys(values, 0))
+    for name, amount in values.items():
+        delta[name] += sign * amount
+
+
+def _apply_log_changes(session_, flush_context, instances):
+    """Apply the food and exercise logs changed in this flush to daily totals and closed windows."""
+    deltas = {}
+    for obj in session_.new:
+        if isinstance(obj, (FoodLog, ExerciseLog)):
+            _add_delta(deltas, *_log_values(obj, previous=False), 1)
+    for obj in session_.deleted:
+        if isinstance(obj, (FoodLog, ExerciseLog)):
+            _add_delta(deltas, *_log_values(obj, previous=True), -1)
+    for obj in session_.dirty:
+        if isinstance(obj, (FoodLog, ExerciseLog)) and session_.is_modified(obj, include_collections=False):
+            _add_delta(deltas, *_log_values(obj, previous=True), -1)
+            _add_delta(deltas, *_log_values(obj, previous=False), 1)
+    _apply_deltas(session_, deltas)
+
+
+def apply_inserted_food_logs(session_, rows):
+    """
+    Apply food logs written with a bulk INSERT, which the flush listener never sees.
+
+    Args:
+        session_: Session the insert ran in
+        rows: Inserted rows as dicts, each with user_id, only_date and the FOOD_FIELDS
+    """
+    deltas = {}
+    for row in rows:
+        values = {metric: row[metric] or 0 for metric in FOOD_FIELDS}
+        values.update(calories_burned=0, food_entries=1, exercise_entries=0)
+        _add_delta(deltas, row['user_id'], row['only_date'], values, 1)
+    _apply_deltas(session_, deltas)
+
+
+def _apply_deltas(session_, deltas):
+    """Add per-(user, day) deltas to the daily totals and to the windows of closed days."""
+    all_stats = {user_id: session_.get(RollingStats, user_id) for user_id in {user_id for user_id, _ in deltas}}
+    # The daily totals of every affected day in one query per user, not one per day
+    totals = {}
+    for user_id, stats in all_stats.items():
+        if stats is None:
+            continue
+        days = [day for owner, day in deltas if owner == user_id]
+        totals.update(((total.user_id, total.day), total) for total in session_.execute(
+            sa.select(DailyTotal).where(DailyTotal.user_id == user_id, DailyTotal.day.in_(days))).scalars())
+
+    for (user_id, day), delta in deltas.items():
+        stats = all_stats[user_id]
+        if stats is None:
+            # Not built yet; the first read builds everything from the logs
+            continue
+        total = totals.get((user_id, day))
+        before = _values(total)
+        if total is None:
+            total = DailyTotal(user_id=user_id, day=day, **{name: 0 for name in delta})
+            session_.add(total)
+        for name, amount in delta.items():
+            setattr(total, name, (getattr(total, name) or 0) + amount)
+
+        if day > stats.as_of:
+            continue
+        after = _values(total)
+        state = copy.deepcopy(stats.state)
+        for window in WINDOWS:
+            if (stats.as_of - day).days < window:
+                counters = state['windows'][str(window)]
+                _apply(counters, before, -1, state['targets'])
+                _apply(counters, after, 1, state['targets'])
+        if bool(before and before['food_entries'] > 0) != (after['food_entries'] > 0):
+            # The day starts or ends a run of logged days; recount streaks on the next read
+            state['streak'] = None
+        stats.state = state
+
+
+def init_rolling_stats(app, db):
+    """Keep daily totals up to date on every flush and register the 'flask stats' commands."""
+    if not event.contains(db.session, 'before_flush', _apply_log_changes):
+        event.listen(db.session, 'before_flush', _apply_log_changes)
+
+    group = AppGroup('stats', help='Manage rolling statistics.')
+
+    @group.command('rebuild')
+    @click.option('--user', 'user_id', type=int, default=None, help='Only this user id.')
+    def rebuild_command(user_id):
+        """Rebuild daily totals and rolling statistics from the logs."""
+        today = datetime.now(pytz.timezone('Asia/Kolkata')).date()
+        query = sa.select(User).order_by(User.id)
+        if user_id is not None:
+            query = query.where(User.id == user_id)
+        for user in db.session.execute(query).scalars():
+            rebuild(user, today)
+            db.session.commit()
+            click.echo(f'  rebuilt statistics for user {user.id}')
+
+    app.cli.add_command(group)
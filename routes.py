@@ -1,36 +1,70 @@
-from flask import render_template, redirect, url_for, flash, request, jsonify, session
+from flask import Blueprint, current_app, render_template, redirect, url_for, flash, request, jsonify, session, \
+    make_response, get_flashed_messages
+from flask_wtf.csrf import generate_csrf, validate_csrf
 from flask_login import login_user, logout_user, login_required, current_user
 from sqlalchemy import func, cast, Date
+from sqlalchemy.orm import selectinload
 from datetime import datetime, timedelta, date
-from app import app, db
+from app import db
 from models import User, CustomItem, Meal, MealItem, FoodLog, ExerciseLog
 from forms import RegistrationForm, LoginForm, NaturalLanguageInputForm_Food, CustomItemForm, MealForm, MealItemForm, \
-    ProfileForm, NaturalLanguageInputForm_Exercise
-from nlp_processor import NLPProcessor
+    ProfileForm, NaturalLanguageInputForm_Exercise, WeightLogForm
+from data_version import conditional
+from page_cache import cached_page
+from db_routing import read_only
+from query_guard import query_budget
+from server_timing import timed_view
+from archive import food_logs_between, exercise_logs_between
+from food_logging import NUTRIENTS, LogEntry, parse_entries, build_food_logs
+from nutrition_calculator import get_daily_targets, has_complete_profile
+from rolling_stats import current_stats
+from timeseries import GRANULARITIES, load_series, chart_start, chart_series, auto_granularity, range_series
+from user_cache import cache_user, invalidate_user
+from weight_trend import record_weight, weight_series
+import hashlib
 import json
+import logging
 import pytz
 from werkzeug.security import generate_password_hash
+from wtforms.validators import ValidationError
+
+bp = Blueprint('main', __name__)
+logger = logging.getLogger(__name__)
 
-# Initialize NLP Processor
-nlp_processor = NLPProcessor()
 tz_ist = pytz.timezone('Asia/Kolkata')
+
+# NLP Processor, created on first use so importing the routes stays cheap
+_nlp_processor = None
+
+def get_nlp_processor():
+    global _nlp_processor
+    if _nlp_processor is None:
+        from nlp_processor import NLPProcessor
+        config = current_app.config
+        _nlp_processor = NLPProcessor(food_url=config['NLP_FOOD_PARSER_URL'],
+                                      exercise_url=config['NLP_EXERCISE_URL'],
+                                      timeout=config['NLP_TIMEOUT'])
+    return _nlp_processor
+
 # Custom Jinja filters
-@app.template_filter('round_up_to_nearest')
+@bp.app_template_filter('round_up_to_nearest')
 def round_up_to_nearest(value, base):
     return ((value + base - 1) // base) * base
 
 # Home route
-@app.route('/')
+@bp.route('/')
+@query_budget(2)
 def index():
     if current_user.is_authenticated:
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('main.dashboard'))
     return render_template('index.html')
 
 # Authentication routes
-@app.route('/register', methods=['GET', 'POST'])
+@bp.route('/register', methods=['GET', 'POST'])
+@query_budget(12)
 def register():
     if current_user.is_authenticated:
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('main.dashboard'))
     
     form = RegistrationForm()
     if form.validate_on_submit():
@@ -47,17 +81,23 @@ def register():
         user.set_password(form.password.data)
         
         db.session.add(user)
+        if user.weight:
+            # The registration weight is the first weigh-in of the weight log
+            db.session.flush()
+            record_weight(user.id, user.weight)
         db.session.commit()
+        invalidate_user(user.id)
         
         flash('Your account has been created! You can now log in.', 'success')
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     
     return render_template('register.html', form=form)
 
-@app.route('/login', methods=['GET', 'POST'])
+@bp.route('/login', methods=['GET', 'POST'])
+@query_budget(3)
 def login():
     if current_user.is_authenticated:
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('main.dashboard'))
     
     form = LoginForm()
     if form.validate_on_submit():
@@ -65,66 +105,84 @@ def login():
         
         if user and user.check_password(form.password.data):
             login_user(user)
+            cache_user(user)
             next_page = request.args.get('next')
             flash('Login successful!', 'success')
-            return redirect(next_page or url_for('dashboard'))
+            return redirect(next_page or url_for('main.dashboard'))
         else:
             flash('Login failed. Please check your email and password.', 'danger')
     
     return render_template('login.html', form=form)
 
-@app.route('/logout')
+@bp.route('/logout')
+@query_budget(2)
 @login_required
 def logout():
     logout_user()
     flash('You have been logged out.', 'info')
-    return redirect(url_for('index'))
+    return redirect(url_for('main.index'))
 
-# Main dashboard
-@app.route('/dashboard')
+# Main dashboard: a static shell filled in by dashboard.js from /api/dashboard
+@bp.route('/dashboard')
+@query_budget(2)
 @login_required
 def dashboard():
-    form_food = NaturalLanguageInputForm_Food()
-    form_exercise = NaturalLanguageInputForm_Exercise()
-    
-    # Get today's date and the date range for past week and month
-    tz_ist = pytz.timezone('Asia/Kolkata')
-    time = datetime.now(tz_ist).time()
+    # The shell has no user data, CSRF token or flash messages, so every user gets the same page
+    html = current_app.extensions.get('dashboard_shell')
+    if html is None:
+        html = render_template(
+            'dashboard.html',
+            form=NaturalLanguageInputForm_Food(),
+            exercise_form=NaturalLanguageInputForm_Exercise(),
+            defer_flashes=True
+        )
+        if not current_app.jinja_env.auto_reload:
+            current_app.extensions['dashboard_shell'] = html
+
+    response = make_response(html)
+    response.set_etag(hashlib.sha1(html.encode('utf-8')).hexdigest(), weak=True)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+@bp.route('/api/dashboard')
+@query_budget(8)
+@read_only
+@login_required
+@timed_view('aggregate')
+def dashboard_data():
+    """Everything the dashboard shows, plus the page's pending flash messages and a CSRF token."""
     today = datetime.now(tz_ist).date()
-    week_ago = today - timedelta(days=7)
-    month_ago = today - timedelta(days=30)
-    print(time)
-    print(today)
-    print(week_ago)
-    print(month_ago)
-    
-    # Get user's calorie requirements
-    user_has_complete_profile = all([
-        current_user.weight, 
-        current_user.height, 
-        current_user.age, 
-        current_user.gender, 
-        current_user.activity_level, 
-        current_user.motive
-    ])
-    
-    if user_has_complete_profile:
-        from nutrition_calculator import get_full_recommendations
-        recommendations = get_full_recommendations(current_user)
-        target_calories = recommendations['nutrition']['calories']
-        target_protein = recommendations['nutrition']['protein']
-        target_carbs = recommendations['nutrition']['carbs']
-        target_fiber = recommendations['nutrition']['fiber']
-        target_sugar = recommendations['nutrition']['sugar']
-        target_sodium = recommendations['nutrition']['sodium']
-    else:
-        # Default values if user hasn't completed their profile
-        target_calories = 2000
-        target_protein = 50
-        target_carbs = 250
-        target_fiber = 28
-        target_sugar = 50
-        target_sodium = 2300
+    state = _dashboard_state(today)
+    state['messages'] = get_flashed_messages(with_categories=True)
+    state['csrf_token'] = generate_csrf() if current_app.config.get('WTF_CSRF_ENABLED', True) else None
+    return jsonify(state)
+
+
+def _round(value):
+    return None if value is None else round(value, 2)
+
+
+def _dashboard_state(today):
+    """
+    Today's totals, targets and percentages, the 7-day series and recent logs for the current user.
+
+    Args:
+        today: The user's current date
+
+    Returns:
+        Dict ready for JSON
+    """
+    # Get user's calorie requirements (defaults until the profile is complete)
+    user_has_complete_profile = has_complete_profile(current_user)
+    targets = get_daily_targets(current_user)
+    target_calories = targets['calories']
+    target_protein = targets['protein']
+    target_carbs = targets['carbohydrates']
+    target_fiber = targets['fiber']
+    target_sugar = targets['sugar']
+    target_sodium = targets['sodium']
 
     # FoodLog.query.filter_by(user_id=current_user.id)
     # Calculate today's nutrition summary
@@ -133,7 +191,8 @@ def dashboard():
         FoodLog.only_date == today
     ).all()
 
-    print(1,todays_food)
+    logger.debug('dashboard view', extra={'user_id': current_user.id, 'today': today,
+                                          'food_logs_today': len(todays_food), 'sample_rate': 0.1})
 
     today_calories = sum(log.calories for log in todays_food)
     today_protein = sum(log.protein for log in todays_food)
@@ -172,32 +231,12 @@ def dashboard():
     
     today_calories_burned = sum(log.calories_burned for log in todays_exercise)
     
-    # Calculate calorie data for the past week (for chart)
-    daily_calories = []
-    daily_calories_burned = []
-    daily_labels = []
-    daily_targets = []
-    
-    for i in range(7):
-        day = today - timedelta(days=6-i)
-        daily_labels.append(day.strftime('%a'))
-        daily_targets.append(target_calories)
-        
-        # Food calories for this day
-        day_food = FoodLog.query.filter(
-            FoodLog.user_id == current_user.id,
-            FoodLog.only_date == day
-        ).all()
-        day_calories = sum(log.calories for log in day_food)
-        daily_calories.append(day_calories)
-        
-        # Exercise calories for this day
-        day_exercise = ExerciseLog.query.filter(
-            ExerciseLog.user_id == current_user.id,
-            ExerciseLog.only_date == day
-        ).all()
-        day_calories_burned = sum(log.calories_burned for log in day_exercise)
-        daily_calories_burned.append(day_calories_burned)
+    # Calculate calorie data for the past week (for chart), from one aggregate query
+    week = load_series(current_user.id, today - timedelta(days=6), today)
+    daily_labels = [day.strftime('%a') for day in week.dates()]
+    daily_targets = [target_calories] * week.days
+    daily_calories = week.daily('calories')
+    daily_calories_burned = week.daily('calories_burned')
     
     # Get recent food logs
     recent_food_logs = FoodLog.query.filter_by(user_id=current_user.id).order_by(FoodLog.date.desc()).limit(5).all()
@@ -205,39 +244,54 @@ def dashboard():
     # Get recent exercise logs
     recent_exercise_logs = ExerciseLog.query.filter_by(user_id=current_user.id).order_by(ExerciseLog.date.desc()).limit(5).all()
     
-    return render_template(
-        'dashboard.html', 
-        form=form_food,
-        exercise_form = form_exercise,
-        today_calories=today_calories,
-        today_protein=today_protein,
-        today_carbs=today_carbs,
-        today_fiber=today_fiber,
-        today_sugar=today_sugar,
-        today_sodium=today_sodium,
-        today_calories_burned=today_calories_burned,
-        net_calories=today_calories - today_calories_burned,
-        target_calories=target_calories,
-        target_protein=target_protein,
-        target_carbs=target_carbs,
-        target_fiber=target_fiber,
-        target_sugar=target_sugar,
-        target_sodium=target_sodium,
-        calories_percent=calories_percent,
-        protein_percent=protein_percent,
-        carbs_percent=carbs_percent,
-        fiber_percent=fiber_percent,
-        daily_labels=json.dumps(daily_labels),
-        daily_calories=json.dumps(daily_calories),
-        daily_calories_burned=json.dumps(daily_calories_burned),
-        daily_targets=json.dumps(daily_targets),
-        recent_food_logs=recent_food_logs,
-        recent_exercise_logs=recent_exercise_logs,
-        has_complete_profile=user_has_complete_profile
-    )
+    date_format = '%b %d, %Y %I:%M %p'
+    return {
+        'date': today.isoformat(),
+        'has_complete_profile': user_has_complete_profile,
+        'today': {
+            'calories': _round(today_calories),
+            'protein': _round(today_protein),
+            'carbohydrates': _round(today_carbs),
+            'fiber': _round(today_fiber),
+            'sugar': _round(today_sugar),
+            'sodium': _round(today_sodium),
+            'calories_burned': _round(today_calories_burned),
+            'net_calories': _round(today_calories - today_calories_burned),
+        },
+        'targets': {
+            'calories': target_calories,
+            'protein': target_protein,
+            'carbohydrates': target_carbs,
+            'fiber': target_fiber,
+            'sugar': target_sugar,
+            'sodium': target_sodium,
+        },
+        'percent': {
+            'calories': calories_percent,
+            'protein': protein_percent,
+            'carbohydrates': carbs_percent,
+            'fiber': fiber_percent,
+        },
+        'week': {
+            'labels': daily_labels,
+            'calories': [_round(value) for value in daily_calories],
+            'calories_burned': [_round(value) for value in daily_calories_burned],
+            'targets': daily_targets,
+        },
+        'recent_food_logs': [
+            {'name': log.name, 'calories': _round(log.calories), 'date': log.date.strftime(date_format)}
+            for log in recent_food_logs
+        ],
+        'recent_exercise_logs': [
+            {'name': log.name, 'duration': log.duration, 'calories_burned': _round(log.calories_burned),
+             'date': log.date.strftime(date_format)}
+            for log in recent_exercise_logs
+        ],
+    }
 
 # Natural language processing routes
-@app.route('/process_query', methods=['POST'])
+@bp.route('/process_query', methods=['POST'])
+@query_budget(8)
 @login_required
 def process_food_query():
     form = NaturalLanguageInputForm_Food()
@@ -245,10 +299,9 @@ def process_food_query():
         query = form.query.data
         
         # First try to process as a food query
-        food_results, missing  = nlp_processor.process_food_query(query, current_user.id)
-        print(missing, 111111)
-        print(food_results)
-        print(datetime.now(tz_ist), 11)
+        food_results, missing  = get_nlp_processor().process_food_query(query, current_user.id)
+        logger.info('food query processed', extra={'user_id': current_user.id,
+                                                   'found': len(food_results), 'missing': len(missing)})
         if food_results or missing:
             for food_result in food_results:
                 # Add to food log
@@ -266,30 +319,32 @@ def process_food_query():
                     description=query
                 )
                 db.session.add(food_log)
-                db.session.commit()
                 flash(f"Added {food_result['food']} with {food_result['calories']} calories to your food log!", 'success')
+            # One commit for the whole query rather than one per food
+            db.session.commit()
             if missing:
                 for item in missing:
                     flash(f"Couldn't find {item} in your food item database. Please add it to your food item database.", 'warning')
 
-            return redirect(url_for('dashboard'))
+            return redirect(url_for('main.dashboard'))
         else:
             flash("Couldn't understand your input. Please try again with more details.", 'danger')
-            return redirect(url_for('dashboard'))
+            return redirect(url_for('main.dashboard'))
     
     flash('Invalid form submission.', 'danger')
-    return redirect(url_for('dashboard'))
+    return redirect(url_for('main.dashboard'))
 
 
 # for processing the exercise query
-@app.route('/process_exercise_query', methods=['POST'])
+@bp.route('/process_exercise_query', methods=['POST'])
+@query_budget(8)
 @login_required
 def process_exercise_query():
     form = NaturalLanguageInputForm_Exercise()
     if form.validate_on_submit():
         query = form.query.data
-        exercise_result = nlp_processor.process_exercise_query(user_input=query, gender=current_user.gender, weight=current_user.weight, height=current_user.height,age=current_user.age)
-        print(exercise_result)
+        exercise_result = get_nlp_processor().process_exercise_query(user_input=query, gender=current_user.gender, weight=current_user.weight, height=current_user.height,age=current_user.age)
+        logger.info('exercise query processed', extra={'user_id': current_user.id, 'found': len(exercise_result)})
         if exercise_result:
             # Add to exercise log
             for exercise in exercise_result:
@@ -301,27 +356,29 @@ def process_exercise_query():
                         description=query
                     )
                 db.session.add(exercise_log)
-                db.session.commit()
 
                 flash(
                     f"Added {exercise['exercise']} burning {exercise['calories']} calories to your exercise log!",
                     'success')
-            return redirect(url_for('dashboard'))
+            db.session.commit()
+            return redirect(url_for('main.dashboard'))
         else:
             flash("Couldn't understand your input. Please try again with more details.", 'danger')
-            return redirect(url_for('dashboard'))
+            return redirect(url_for('main.dashboard'))
 
     flash('Invalid form submission.', 'danger')
-    return redirect(url_for('dashboard'))
+    return redirect(url_for('main.dashboard'))
 # Food item management routes
-@app.route('/food_items')
+@bp.route('/food_items')
+@query_budget(3)
 @login_required
 def food_items():
     form = CustomItemForm()
     items = CustomItem.query.filter_by(user_id=current_user.id).order_by(CustomItem.name).all()
     return render_template('food_items.html', items=items, form=form)
 
-@app.route('/add_food_item', methods=['POST'])
+@bp.route('/add_food_item', methods=['POST'])
+@query_budget(5)
 @login_required
 def add_food_item():
     form = CustomItemForm()
@@ -347,9 +404,10 @@ def add_food_item():
             for error in errors:
                 flash(f'{getattr(form, field).label.text}: {error}', 'danger')
     
-    return redirect(url_for('food_items'))
+    return redirect(url_for('main.food_items'))
 
-@app.route('/edit_food_item/<int:item_id>', methods=['GET', 'POST'])
+@bp.route('/edit_food_item/<int:item_id>', methods=['GET', 'POST'])
+@query_budget(7)
 @login_required
 def edit_food_item(item_id):
     item = CustomItem.query.get_or_404(item_id)
@@ -357,7 +415,7 @@ def edit_food_item(item_id):
     # Check if item belongs to the current user
     if item.user_id != current_user.id:
         flash('You are not authorized to edit this item.', 'danger')
-        return redirect(url_for('food_items'))
+        return redirect(url_for('main.food_items'))
     
     form = CustomItemForm()
     
@@ -387,11 +445,12 @@ def edit_food_item(item_id):
         
         db.session.commit()
         flash(f'Food item "{item.name}" updated successfully!', 'success')
-        return redirect(url_for('food_items'))
+        return redirect(url_for('main.food_items'))
     
     return render_template('food_items.html', form=form, edit_item=item, items=CustomItem.query.filter_by(user_id=current_user.id).all())
 
-@app.route('/delete_food_item/<int:item_id>', methods=['POST'])
+@bp.route('/delete_food_item/<int:item_id>', methods=['POST'])
+@query_budget(7)
 @login_required
 def delete_food_item(item_id):
     item = CustomItem.query.get_or_404(item_id)
@@ -399,15 +458,16 @@ def delete_food_item(item_id):
     # Check if item belongs to the current user
     if item.user_id != current_user.id:
         flash('You are not authorized to delete this item.', 'danger')
-        return redirect(url_for('food_items'))
+        return redirect(url_for('main.food_items'))
     
     db.session.delete(item)
     db.session.commit()
     flash(f'Food item "{item.name}" deleted successfully!', 'success')
-    return redirect(url_for('food_items'))
+    return redirect(url_for('main.food_items'))
 
 # Meal management routes
-@app.route('/meals')
+@bp.route('/meals')
+@query_budget(6)
 @login_required
 def meals():
     meal_form = MealForm()
@@ -419,14 +479,18 @@ def meals():
         for item in CustomItem.query.filter_by(user_id=current_user.id).order_by(CustomItem.name).all()
     ]
     
-    meals = Meal.query.filter_by(user_id=current_user.id).order_by(Meal.name).all()
+    # Load every meal's items and their food items up front; the per-meal totals would otherwise lazy-load them row by row
+    meals = Meal.query.filter_by(user_id=current_user.id).options(
+        selectinload(Meal.meal_items).selectinload(MealItem.custom_item)
+    ).order_by(Meal.name).all()
     
     return render_template('meals.html', 
                           meals=meals, 
                           meal_form=meal_form, 
                           meal_item_form=meal_item_form)
 
-@app.route('/add_meal', methods=['POST'])
+@bp.route('/add_meal', methods=['POST'])
+@query_budget(5)
 @login_required
 def add_meal():
     form = MealForm()
@@ -444,17 +508,20 @@ def add_meal():
             for error in errors:
                 flash(f'{getattr(form, field).label.text}: {error}', 'danger')
     
-    return redirect(url_for('meals'))
+    return redirect(url_for('main.meals'))
 
-@app.route('/edit_meal/<int:meal_id>', methods=['GET', 'POST'])
+@bp.route('/edit_meal/<int:meal_id>', methods=['GET', 'POST'])
+@query_budget(9)
 @login_required
 def edit_meal(meal_id):
-    meal = Meal.query.get_or_404(meal_id)
+    meal = Meal.query.options(
+        selectinload(Meal.meal_items).selectinload(MealItem.custom_item)
+    ).get_or_404(meal_id)
     
     # Check if meal belongs to the current user
     if meal.user_id != current_user.id:
         flash('You are not authorized to edit this meal.', 'danger')
-        return redirect(url_for('meals'))
+        return redirect(url_for('main.meals'))
     
     form = MealForm()
     
@@ -468,11 +535,12 @@ def edit_meal(meal_id):
         
         db.session.commit()
         flash(f'Meal "{meal.name}" updated successfully!', 'success')
-        return redirect(url_for('meals'))
+        return redirect(url_for('main.meals'))
     
     return render_template('edit_meal.html', form=form, meal=meal)
 
-@app.route('/delete_meal/<int:meal_id>', methods=['POST'])
+@bp.route('/delete_meal/<int:meal_id>', methods=['POST'])
+@query_budget(7)
 @login_required
 def delete_meal(meal_id):
     meal = Meal.query.get_or_404(meal_id)
@@ -480,14 +548,15 @@ def delete_meal(meal_id):
     # Check if meal belongs to the current user
     if meal.user_id != current_user.id:
         flash('You are not authorized to delete this meal.', 'danger')
-        return redirect(url_for('meals'))
+        return redirect(url_for('main.meals'))
     
     db.session.delete(meal)
     db.session.commit()
     flash(f'Meal "{meal.name}" deleted successfully!', 'success')
-    return redirect(url_for('meals'))
+    return redirect(url_for('main.meals'))
 
-@app.route('/add_meal_item/<int:meal_id>', methods=['POST'])
+@bp.route('/add_meal_item/<int:meal_id>', methods=['POST'])
+@query_budget(10)
 @login_required
 def add_meal_item(meal_id):
     meal = Meal.query.get_or_404(meal_id)
@@ -495,7 +564,7 @@ def add_meal_item(meal_id):
     # Check if meal belongs to the current user
     if meal.user_id != current_user.id:
         flash('You are not authorized to modify this meal.', 'danger')
-        return redirect(url_for('meals'))
+        return redirect(url_for('main.meals'))
     
     form = MealItemForm()
     
@@ -510,7 +579,7 @@ def add_meal_item(meal_id):
         food_item = CustomItem.query.get(form.custom_item_id.data)
         if not food_item or food_item.user_id != current_user.id:
             flash('Invalid food item selected.', 'danger')
-            return redirect(url_for('meals'))
+            return redirect(url_for('main.meals'))
         
         meal_item = MealItem(
             meal_id=meal.id,
@@ -526,9 +595,10 @@ def add_meal_item(meal_id):
             for error in errors:
                 flash(f'{getattr(form, field).label.text}: {error}', 'danger')
     
-    return redirect(url_for('meals'))
+    return redirect(url_for('main.meals'))
 
-@app.route('/search_food_items')
+@bp.route('/search_food_items')
+@query_budget(3)
 @login_required
 def search_food_items():
     """API endpoint to search for food items by name"""
@@ -556,7 +626,8 @@ def search_food_items():
     
     return jsonify(results)
 
-@app.route('/delete_meal_item/<int:meal_item_id>', methods=['POST'])
+@bp.route('/delete_meal_item/<int:meal_item_id>', methods=['POST'])
+@query_budget(10)
 @login_required
 def delete_meal_item(meal_item_id):
     meal_item = MealItem.query.get_or_404(meal_item_id)
@@ -565,16 +636,17 @@ def delete_meal_item(meal_item_id):
     # Check if the meal belongs to the current user
     if meal.user_id != current_user.id:
         flash('You are not authorized to modify this meal.', 'danger')
-        return redirect(url_for('meals'))
+        return redirect(url_for('main.meals'))
     
     food_item = CustomItem.query.get(meal_item.custom_item_id)
     db.session.delete(meal_item)
     db.session.commit()
     
     flash(f'Removed {food_item.name} from meal "{meal.name}"!', 'success')
-    return redirect(url_for('meals'))
+    return redirect(url_for('main.meals'))
 
-@app.route('/add_meal_to_log/<int:meal_id>', methods=['POST'])
+@bp.route('/add_meal_to_log/<int:meal_id>', methods=['POST'])
+@query_budget(10)
 @login_required
 def add_meal_to_log(meal_id):
     meal = Meal.query.get_or_404(meal_id)
@@ -582,31 +654,55 @@ def add_meal_to_log(meal_id):
     # Check if meal belongs to the current user
     if meal.user_id != current_user.id:
         flash('You are not authorized to use this meal.', 'danger')
-        return redirect(url_for('meals'))
-    
-    # Create a food log entry for the entire meal
-    food_log = FoodLog(
-        user_id=current_user.id,
-        name=meal.name,
-        quantity=1,
-        calories=meal.total_calories,
-        protein=meal.total_protein,
-        carbohydrates=meal.total_carbs,
-        fiber=meal.total_fiber,
-        sugar=meal.total_sugar,
-        sodium=meal.total_sodium,
-        description=f"Added meal: {meal.name}",
-        meal_id=meal.id
-    )
+        return redirect(url_for('main.meals'))
     
-    db.session.add(food_log)
+    # Create a food log entry for the entire meal, its totals summed in one query
+    food_log, = build_food_logs(current_user.id, [LogEntry('meal', meal.id, 1, None, None)])
     db.session.commit()
     
-    flash(f'Added meal "{meal.name}" with {meal.total_calories} calories to your food log!', 'success')
-    return redirect(url_for('dashboard'))
+    flash(f'Added meal "{food_log["name"]}" with {food_log["calories"]} calories to your food log!', 'success')
+    return redirect(url_for('main.dashboard'))
+
+@bp.route('/api/log_food', methods=['POST'])
+@query_budget(10)
+@login_required
+def log_food_batch():
+    """
+    Log several saved meals and custom items in one request and one transaction.
+
+    Takes a JSON body of {"entries": [...]}, each entry with meal_id or
+    custom_item_id and optional quantity, meal_type and (back-dated) date; see
+    food_logging.parse_entries. Nothing is logged unless every entry is valid.
+    """
+    if current_app.config.get('WTF_CSRF_ENABLED', True):
+        try:
+            validate_csrf(request.headers.get('X-CSRFToken'))
+        except ValidationError as e:
+            return jsonify({'error': str(e)}), 400
+    today = datetime.now(tz_ist).date()
+    try:
+        entries = parse_entries(request.get_json(silent=True), today, current_app.config['BULK_LOG_MAX_ENTRIES'],
+                                current_app.config['BULK_LOG_MAX_DAYS_BACK'])
+        logs = build_food_logs(current_user.id, entries)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 404
+    logged = [{
+        'name': log['name'],
+        'quantity': log['quantity'],
+        'meal_type': log['meal_type'],
+        'date': log['only_date'].isoformat(),
+        'calories': round(log['calories'], 2),
+    } for log in logs]
+    totals = {nutrient: round(sum(log[nutrient] for log in logs), 2) for nutrient in NUTRIENTS}
+    db.session.commit()
+    logger.info('food batch logged', extra={'user_id': current_user.id, 'entries': len(logs)})
+    return jsonify({'logged': logged, 'totals': totals}), 201
 
 # User profile route
-@app.route('/profile', methods=['GET', 'POST'])
+@bp.route('/profile', methods=['GET', 'POST'])
+@query_budget(14)
 @login_required
 def profile():
     form = ProfileForm()
@@ -625,143 +721,180 @@ def profile():
         # Check if the username is being changed and is already taken
         if form.username.data != current_user.username and User.query.filter_by(username=form.username.data).first():
             flash('That username is already taken. Please choose another one.', 'danger')
-            return redirect(url_for('profile'))
+            return redirect(url_for('main.profile'))
         
         # Check if the email is being changed and is already registered
         if form.email.data != current_user.email and User.query.filter_by(email=form.email.data).first():
             flash('That email is already registered. Please use a different one.', 'danger')
-            return redirect(url_for('profile'))
+            return redirect(url_for('main.profile'))
         
-        current_user.username = form.username.data
-        current_user.email = form.email.data
-        current_user.weight = form.weight.data
-        current_user.height = form.height.data
-        current_user.age = form.age.data
-        current_user.gender = form.gender.data
-        current_user.activity_level = form.activity_level.data
-        current_user.motive = form.motive.data
+        # current_user is a cached read-only snapshot, so update the stored user
+        user = db.session.get(User, current_user.id)
+        user.username = form.username.data
+        user.email = form.email.data
+        if form.weight.data and form.weight.data != user.weight:
+            # A changed weight is a new weigh-in, which also updates user.weight and the trend
+            record_weight(user.id, form.weight.data)
+        user.height = form.height.data
+        user.age = form.age.data
+        user.gender = form.gender.data
+        user.activity_level = form.activity_level.data
+        user.motive = form.motive.data
+        user.profile_version = User.profile_version + 1
         
         db.session.commit()
+        cache_user(user)
         flash('Your profile has been updated!', 'success')
-        return redirect(url_for('profile'))
+        return redirect(url_for('main.profile'))
     
-    return render_template('profile.html', form=form)
+    return render_template('profile.html', form=form, weight_form=WeightLogForm())
+
+@bp.route('/log_weight', methods=['POST'])
+@query_budget(12)
+@login_required
+def log_weight():
+    form = WeightLogForm()
+    if form.validate_on_submit():
+        when = None
+        if form.date.data and form.date.data != datetime.now(tz_ist).date():
+            # Back-dated weigh-ins are placed at noon of their day
+            when = datetime.combine(form.date.data, datetime.min.time()).replace(hour=12)
+        record_weight(current_user.id, form.weight.data, when)
+        db.session.commit()
+        user = cache_user(db.session.get(User, current_user.id))
+        flash(f'Logged {form.weight.data} kg. Your trend weight is now {user.trend_weight:.1f} kg.', 'success')
+    else:
+        for errors in form.errors.values():
+            for error in errors:
+                flash(error, 'danger')
+    return redirect(url_for('main.profile'))
+
+@bp.route('/api/weight')
+@query_budget(4)
+@read_only
+@login_required
+@conditional
+@timed_view('aggregate')
+def weight_data():
+    """Weight readings and trend for a date range, from the weekly rollup for long ranges."""
+    today = datetime.now(tz_ist).date()
+    try:
+        start, end, _, points = _chart_range_args(today)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(dict(weight_series(current_user.id, start, end, points), start=start.isoformat(), end=end.isoformat()))
 
 # API routes for chart data
-@app.route('/api/chart_data')
+@bp.route('/api/chart_data')
+@query_budget(4)
+@read_only
 @login_required
+@conditional
+@timed_view('aggregate')
 def chart_data():
     # Get date range parameters
     period = request.args.get('period', 'week')
     
     today = datetime.now(tz_ist).date()
     
-    if period == 'week':
-        days = 7
-        start_date = today - timedelta(days=days-1)
-        date_format = '%a'  # Abbreviated weekday name
-    elif period == 'month':
-        days = 30
-        start_date = today - timedelta(days=days-1)
-        date_format = '%d'  # Day of month
-    else:  # year
-        # Group by month for a year
-        months = 12
-        start_date = (today - timedelta(days=365)).replace(day=1)
-        date_format = '%b'  # Abbreviated month name
-        
-    # Initialize data structures
-    if period == 'year':
-        # For year, we group by month
-        labels = [(today - timedelta(days=30*i)).strftime(date_format) for i in range(months-1, -1, -1)]
-        food_data = [0] * months
-        exercise_data = [0] * months
-        
-        # Get food logs for the past year
-        food_logs = FoodLog.query.filter(
-            FoodLog.user_id == current_user.id,
-            FoodLog.date >= start_date
-        ).all()
-        
-        # Get exercise logs for the past year
-        exercise_logs = ExerciseLog.query.filter(
-            ExerciseLog.user_id == current_user.id,
-            ExerciseLog.date >= start_date
-        ).all()
-        
-        # Aggregate data by month
-        for log in food_logs:
-            month_idx = months - 1 - ((today.year - log.date.year) * 12 + (today.month - log.date.month))
-            if 0 <= month_idx < months:
-                food_data[month_idx] += log.calories
-        
-        for log in exercise_logs:
-            month_idx = months - 1 - ((today.year - log.date.year) * 12 + (today.month - log.date.month))
-            if 0 <= month_idx < months:
-                exercise_data[month_idx] += log.calories_burned
-    else:
-        # For week or month, we group by day
-        labels = [(start_date + timedelta(days=i)).strftime(date_format) for i in range(days)]
-        food_data = [0] * days
-        exercise_data = [0] * days
-        
-        # Get food logs for the period
-        food_logs = FoodLog.query.filter(
-            FoodLog.user_id == current_user.id,
-            FoodLog.only_date >= start_date,
-            FoodLog.only_date <= today
-        ).all()
-        
-        # Get exercise logs for the period
-        exercise_logs = ExerciseLog.query.filter(
-            ExerciseLog.user_id == current_user.id,
-            ExerciseLog.only_date >= start_date,
-            ExerciseLog.only_date <= today
-        ).all()
-        
-        # Aggregate data by day
-        for log in food_logs:
-            day_idx = (log.date.date() - start_date).days
-            if 0 <= day_idx < days:
-                food_data[day_idx] += log.calories
-        
-        for log in exercise_logs:
-            day_idx = (log.date.date() - start_date).days
-            if 0 <= day_idx < days:
-                exercise_data[day_idx] += log.calories_burned
-    
-    # Calculate net calories (intake - burned)
-    net_data = [food_data[i] - exercise_data[i] for i in range(len(food_data))]
-    
-    return jsonify({
-        'labels': labels,
-        'foodData': food_data,
-        'exerciseData': exercise_data,
-        'netData': net_data
-    })
+    # Daily totals for the whole period, grouped by day (week, month) or calendar month (year)
+    series = load_series(current_user.id, chart_start(period, today), today)
+    return jsonify(chart_series(series, period, today))
+
+@bp.route('/api/stats')
+@query_budget(12)
+@login_required
+@conditional
+@timed_view('aggregate')
+def rolling_statistics():
+    """7- and 30-day moving averages, days within target and logging streaks."""
+    return jsonify(current_stats(current_user, datetime.now(tz_ist).date()))
+
+
+# Smallest point count a range chart can be asked for (LTTB keeps at least 3 per metric)
+MIN_CHART_POINTS = 6
+
+
+def _chart_range_args(today):
+    """Parse start, end, granularity and points for the range chart views; raises ValueError with a message."""
+    try:
+        end = datetime.strptime(request.args['end'], '%Y-%m-%d').date() if 'end' in request.args else today
+        start = (datetime.strptime(request.args['start'], '%Y-%m-%d').date() if 'start' in request.args
+                 else end - timedelta(days=364))
+    except ValueError:
+        raise ValueError('start and end must be dates in YYYY-MM-DD form')
+    if start > end:
+        raise ValueError('start must not be after end')
+    if (end - start).days + 1 > current_app.config['CHART_MAX_DAYS']:
+        raise ValueError(f"ranges are limited to {current_app.config['CHART_MAX_DAYS']} days")
+
+    max_points = current_app.config['CHART_MAX_POINTS']
+    try:
+        points = int(request.args.get('points', max_points))
+    except ValueError:
+        raise ValueError('points must be a whole number')
+    points = min(max(points, MIN_CHART_POINTS), max_points)
+
+    granularity = request.args.get('granularity', 'auto')
+    if granularity == 'auto':
+        granularity = auto_granularity(start, end, points)
+    elif granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be auto or one of {', '.join(GRANULARITIES)}")
+    return start, end, granularity, points
+
+
+@bp.route('/api/chart_range')
+@query_budget(4)
+@read_only
+@login_required
+@conditional
+@timed_view('aggregate')
+def chart_range():
+    """
+    Calorie chart data for any date range, bucketed by day, week or month and
+    downsampled on the server to at most ``points`` points.
+    """
+    today = datetime.now(tz_ist).date()
+    try:
+        start, end, granularity, points = _chart_range_args(today)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    series = load_series(current_user.id, start, end)
+    return jsonify(dict(range_series(series, granularity, points), start=start.isoformat(), end=end.isoformat()))
 
 # Error handlers
-@app.errorhandler(404)
+@bp.app_errorhandler(404)
 def page_not_found(e):
     return render_template('404.html'), 404
 
-@app.route('/daily')
+def _requested_day():
+    """Date requested via the ``date`` query parameter, defaulting to today."""
+    date_param = request.args.get('date')
+    if date_param:
+        try:
+            return datetime.strptime(date_param, '%Y-%m-%d').date()
+        except ValueError:
+            pass
+    return date.today()
+
+def _daily_period():
+    view_date = _requested_day()
+    return view_date.isoformat(), view_date < date.today()
+
+@bp.route('/daily')
+@query_budget(7)
+@read_only
 @login_required
+@conditional
+@cached_page('daily', _daily_period)
+@timed_view('aggregate')
 def daily_report():
     """
     Detailed daily report page showing nutrition and exercise data
     """
     # Get the requested date or default to today
-    date_param = request.args.get('date')
-    print(date_param)
-    if date_param:
-        try:
-            view_date = datetime.strptime(date_param, '%Y-%m-%d').date()
-        except ValueError:
-            view_date = date.today()
-    else:
-        view_date = date.today()
-    print(view_date)
+    view_date = _requested_day()
     
     # Calculate previous and next days for navigation
     prev_date = view_date - timedelta(days=1)
@@ -798,16 +931,10 @@ def daily_report():
         target_sodium = 2300
     
     # Get all food logs for the specified date
-    food_logs = FoodLog.query.filter(
-        FoodLog.user_id == current_user.id,
-        FoodLog.only_date == view_date
-    ).order_by(FoodLog.date).all()
+    food_logs = food_logs_between(current_user.id, view_date, view_date)
     
     # Get all exercise logs for the specified date
-    exercise_logs = ExerciseLog.query.filter(
-        ExerciseLog.user_id == current_user.id,
-        ExerciseLog.only_date == view_date
-    ).order_by(ExerciseLog.date).all()
+    exercise_logs = exercise_logs_between(current_user.id, view_date, view_date)
     
     # Categorize food logs by meal type
     breakfast_logs = [log for log in food_logs if log.meal_type == 'breakfast']
@@ -922,25 +1049,35 @@ def daily_report():
         has_complete_profile=user_has_complete_profile
     )
 
-@app.route('/weekly')
+def _requested_week_start(today):
+    """Start date requested via ``start_date``, defaulting to the start of the current week (Monday)."""
+    date_str = request.args.get('start_date')
+    if date_str:
+        try:
+            return datetime.strptime(date_str, '%Y-%m-%d').date()
+        except ValueError:
+            pass
+    return today - timedelta(days=today.weekday())
+
+def _weekly_period():
+    today = datetime.now(tz_ist).date()
+    start_date = _requested_week_start(today)
+    return start_date.isoformat(), start_date + timedelta(days=7) <= today
+
+@bp.route('/weekly')
+@query_budget(5)
+@read_only
 @login_required
+@conditional
+@cached_page('weekly', _weekly_period)
+@timed_view('aggregate')
 def weekly_report():
     """
     Detailed weekly report page showing nutrition and exercise data
     """
     # Get start date parameter (default to start of current week)
-    date_str = request.args.get('start_date')
     today = datetime.now(tz_ist).date()
-    
-    if date_str:
-        try:
-            start_date = datetime.strptime(date_str, '%Y-%m-%d').date()
-        except ValueError:
-            # Default to start of current week (Monday)
-            start_date = today - timedelta(days=today.weekday())
-    else:
-        # Default to start of current week (Monday)
-        start_date = today - timedelta(days=today.weekday())
+    start_date = _requested_week_start(today)
     
     # Calculate end date (start_date + 6 days = one week)
     end_date = start_date + timedelta(days=6)
@@ -953,68 +1090,36 @@ def weekly_report():
     if next_week > today:
         next_week = None
     
-    # Get nutrition data for the selected week
-    food_logs = FoodLog.query.filter(
-        FoodLog.user_id == current_user.id,
-        FoodLog.only_date >= start_date,
-        FoodLog.only_date <= end_date
-    ).order_by(FoodLog.date).all()
-    
-    # Get exercise data for the selected week
-    exercise_logs = ExerciseLog.query.filter(
-        ExerciseLog.user_id == current_user.id,
-        ExerciseLog.only_date >= start_date,
-        ExerciseLog.only_date <= end_date
-    ).order_by(ExerciseLog.date).all()
+    # Get nutrition and exercise totals for each day of the selected week
+    series = load_series(current_user.id, start_date, end_date)
     
     # Calculate totals for the week
-    weekly_calories = sum(log.calories for log in food_logs)
-    weekly_protein = sum(log.protein for log in food_logs)
-    weekly_carbs = sum(log.carbohydrates for log in food_logs)
-    weekly_fiber = sum(log.fiber for log in food_logs)
-    weekly_sugar = sum(log.sugar for log in food_logs)
-    weekly_sodium = sum(log.sodium for log in food_logs)
+    weekly_calories = series.total('calories')
+    weekly_protein = series.total('protein')
+    weekly_carbs = series.total('carbohydrates')
+    weekly_fiber = series.total('fiber')
+    weekly_sugar = series.total('sugar')
+    weekly_sodium = series.total('sodium')
     
-    weekly_exercise_minutes = sum(log.duration for log in exercise_logs)
-    weekly_calories_burned = sum(log.calories_burned for log in exercise_logs)
+    weekly_exercise_minutes = series.total('minutes')
+    weekly_calories_burned = series.total('calories_burned')
     
     # Calculate net calories
     weekly_net_calories = weekly_calories - weekly_calories_burned
     
     # Calculate daily breakdown for the week
-    days = []
-    daily_calories = []
-    daily_protein = []
-    daily_carbs = []
-    daily_exercise_minutes = []
-    daily_calories_burned = []
-    
-    for i in range(7):
-        day = start_date + timedelta(days=i)
-        days.append(day.strftime('%a'))
-        
-        # Get food logs for this day
-        day_food = [log for log in food_logs if log.date.date() == day]
-        day_calories = sum(log.calories for log in day_food)
-        day_protein = sum(log.protein for log in day_food)
-        day_carbs = sum(log.carbohydrates for log in day_food)
-        
-        # Get exercise logs for this day
-        day_exercise = [log for log in exercise_logs if log.date.date() == day]
-        day_exercise_minutes = sum(log.duration for log in day_exercise)
-        day_calories_burned = sum(log.calories_burned for log in day_exercise)
-        
-        daily_calories.append(day_calories)
-        daily_protein.append(day_protein)
-        daily_carbs.append(day_carbs)
-        daily_exercise_minutes.append(day_exercise_minutes)
-        daily_calories_burned.append(day_calories_burned)
+    days = [day.strftime('%a') for day in series.dates()]
+    daily_calories = series.daily('calories')
+    daily_protein = series.daily('protein')
+    daily_carbs = series.daily('carbohydrates')
+    daily_exercise_minutes = series.daily('minutes')
+    daily_calories_burned = series.daily('calories_burned')
     
     # Count total unique days with food logs
-    days_with_food = len(set(log.date.date() for log in food_logs))
+    days_with_food = series.days_with('food')
     
     # Count total unique days with exercise logs
-    days_with_exercise = len(set(log.date.date() for log in exercise_logs))
+    days_with_exercise = series.days_with('exercise')
     
     return render_template(
         'weekly_report.html',
@@ -1039,35 +1144,42 @@ def weekly_report():
         daily_calories_burned=daily_calories_burned,
         days_with_food=days_with_food,
         days_with_exercise=days_with_exercise,
-        food_logs=food_logs,
-        exercise_logs=exercise_logs,
         timedelta=timedelta
     )
 
-@app.route('/monthly')
-@login_required
-def monthly_report():
-    """
-    Detailed monthly report page showing nutrition and exercise data
-    """
-    # Get month and year parameters (default to current month)
+def _requested_month(today):
+    """(year, month) requested via ``month``/``year``, defaulting to the current month."""
     month_str = request.args.get('month')
     year_str = request.args.get('year')
-    today = datetime.now(tz_ist).date()
-    
     if month_str and year_str:
         try:
             month = int(month_str)
             year = int(year_str)
-            if month < 1 or month > 12:
-                month = today.month
-                year = today.year
+            if 1 <= month <= 12:
+                return year, month
         except ValueError:
-            month = today.month
-            year = today.year
-    else:
-        month = today.month
-        year = today.year
+            pass
+    return today.year, today.month
+
+def _monthly_period():
+    today = datetime.now(tz_ist).date()
+    year, month = _requested_month(today)
+    return f'{year:04d}-{month:02d}', (year, month) < (today.year, today.month)
+
+@bp.route('/monthly')
+@query_budget(5)
+@read_only
+@login_required
+@conditional
+@cached_page('monthly', _monthly_period)
+@timed_view('aggregate')
+def monthly_report():
+    """
+    Detailed monthly report page showing nutrition and exercise data
+    """
+    # Get month and year parameters (default to current month)
+    today = datetime.now(tz_ist).date()
+    year, month = _requested_month(today)
     
     # Calculate start and end dates for the selected month
     start_date = date(year, month, 1)
@@ -1096,60 +1208,33 @@ def monthly_report():
         next_month = None
         next_year = None
     
-    # Get nutrition data for the selected month
-    food_logs = FoodLog.query.filter(
-        FoodLog.user_id == current_user.id,
-        FoodLog.only_date >= start_date,
-        FoodLog.only_date <= end_date
-    ).order_by(FoodLog.date).all()
-    
-    # Get exercise data for the selected month
-    exercise_logs = ExerciseLog.query.filter(
-        ExerciseLog.user_id == current_user.id,
-        ExerciseLog.only_date >= start_date,
-        ExerciseLog.only_date <= end_date
-    ).order_by(ExerciseLog.date).all()
+    # Get nutrition and exercise totals for each day of the selected month
+    series = load_series(current_user.id, start_date, end_date)
     
     # Calculate totals for the month
-    monthly_calories = sum(log.calories for log in food_logs)
-    monthly_protein = sum(log.protein for log in food_logs)
-    monthly_carbs = sum(log.carbohydrates for log in food_logs)
-    monthly_fiber = sum(log.fiber for log in food_logs)
-    monthly_sugar = sum(log.sugar for log in food_logs)
-    monthly_sodium = sum(log.sodium for log in food_logs)
+    monthly_calories = series.total('calories')
+    monthly_protein = series.total('protein')
+    monthly_carbs = series.total('carbohydrates')
+    monthly_fiber = series.total('fiber')
+    monthly_sugar = series.total('sugar')
+    monthly_sodium = series.total('sodium')
     
-    monthly_exercise_minutes = sum(log.duration for log in exercise_logs)
-    monthly_calories_burned = sum(log.calories_burned for log in exercise_logs)
+    monthly_exercise_minutes = series.total('minutes')
+    monthly_calories_burned = series.total('calories_burned')
     
     # Calculate net calories
     monthly_net_calories = monthly_calories - monthly_calories_burned
     
     # Calculate daily breakdown for charting
-    days_in_month = (end_date - start_date).days + 1
-    dates = []
-    daily_calories = []
-    daily_calories_burned = []
-    
-    for i in range(days_in_month):
-        day = start_date + timedelta(days=i)
-        dates.append(day.day)  # Just the day number
-        
-        # Get food logs for this day
-        day_food = [log for log in food_logs if log.date.date() == day]
-        day_calories = sum(log.calories for log in day_food)
-        
-        # Get exercise logs for this day
-        day_exercise = [log for log in exercise_logs if log.date.date() == day]
-        day_calories_burned = sum(log.calories_burned for log in day_exercise)
-        
-        daily_calories.append(day_calories)
-        daily_calories_burned.append(day_calories_burned)
+    days_in_month = series.days
+    dates = [day.day for day in series.dates()]  # Just the day number
+    daily_calories = series.daily('calories')
+    daily_calories_burned = series.daily('calories_burned')
     
     # Calculate weekly breakdown
     weeks = []
     weekly_breakdown = []
-    current_week = []
-    current_week_total = 0
+    week_start = start_date
     
     # Fill in days from previous month to start week on Monday
     first_day_weekday = start_date.weekday()
@@ -1160,30 +1245,22 @@ def monthly_report():
     
     for i in range(days_in_month):
         day = start_date + timedelta(days=i)
-        day_weekday = day.weekday()
-        
-        # Get food logs for this day
-        day_food = [log for log in food_logs if log.date.date() == day]
-        day_calories = sum(log.calories for log in day_food)
         
-        if day_weekday == 0 and i > 0:  # Monday, start new week
-            weekly_breakdown.append(current_week_total)
-            current_week = []
-            current_week_total = 0
+        if day.weekday() == 0 and i > 0:  # Monday, start new week
+            weekly_breakdown.append(series.total('calories', week_start, day - timedelta(days=1)))
+            week_start = day
             week_num = len(weekly_breakdown) + 1
             if i + 7 > days_in_month:
                 weeks.append(f"Week {week_num} (Partial)")
             else:
                 weeks.append(f"Week {week_num}")
-        
-        current_week_total += day_calories
     
     # Add the last week
-    weekly_breakdown.append(current_week_total)
+    weekly_breakdown.append(series.total('calories', week_start, end_date))
     
     # Count days with logs
-    days_with_food = len(set(log.date.date() for log in food_logs))
-    days_with_exercise = len(set(log.date.date() for log in exercise_logs))
+    days_with_food = series.days_with('food')
+    days_with_exercise = series.days_with('exercise')
     
     # Calculate daily averages (only for days with data)
     avg_daily_calories = monthly_calories / days_with_food if days_with_food > 0 else 0
@@ -1222,14 +1299,16 @@ def monthly_report():
         daily_calories_burned=daily_calories_burned,
         weeks=weeks,
         weekly_breakdown=weekly_breakdown,
-        food_logs=food_logs,
-        exercise_logs=exercise_logs,
         timedelta=timedelta,
         date=date
     )
 
-@app.route('/compare')
+@bp.route('/compare')
+@query_budget(5)
+@read_only
 @login_required
+@conditional
+@timed_view('aggregate')
 def compare():
     """
     Page to compare ideal vs. actual nutrition and exercise
@@ -1241,7 +1320,7 @@ def compare():
     if not all([current_user.weight, current_user.height, current_user.age, 
                 current_user.gender, current_user.activity_level, current_user.motive]):
         flash('Please complete your profile first to get personalized recommendations.', 'warning')
-        return redirect(url_for('profile'))
+        return redirect(url_for('main.profile'))
     
     # Get recommendations
     recommendations = get_full_recommendations(current_user)
@@ -1311,6 +1390,6 @@ def compare():
         }
     )
 
-@app.errorhandler(500)
+@bp.app_errorhandler(500)
 def internal_server_error(e):
     return render_template('500.html'), 500
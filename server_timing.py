@@ -0,0 +1,161 @@
+'''
+Server-Timing header for HealthTracker
+Each request's time is split into named phases and sent back as
+``Server-Timing: db;dur=1.2, aggregate;dur=3.4, render;dur=8.0, total;dur=14.1``
+(milliseconds), which browser devtools show per request:
+- db: executing SQL statements (timed once for every consumer, see
+  db_events.py) and committing or rolling back transactions; building
+  queries and loading rows into objects stays with the enclosing phase
+- render: Jinja templates, from Flask's template signals
+- upstream: calls to the food parser and exercise API, timed in NLPProcessor
+- aggregate: report views' own Python work, from @timed_view('aggregate')
+- app: whatever else ran outside those phases
+
+Phases nest, and each one reports only its own time: a query run while a
+template renders counts as db, not render.
+'''
+import logging
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import before_render_template, g, has_request_context, request, template_rendered
+from sqlalchemy import event
+
+from db_events import on_statement
+
+logger = logging.getLogger(__name__)
+
+
+def _active():
+    return has_request_context() and 'timing_stack' in g
+
+
+def _start(phase):
+    _end_transaction()
+    g.timing_stack.append([phase, time.perf_counter(), 0.0])
+
+
+def _stop():
+    phase, started, nested = g.timing_stack.pop()
+    elapsed = time.perf_counter() - started
+    _record(phase, elapsed - nested)
+    g.timing_stack[-1][2] += elapsed
+
+
+def _end_transaction():
+    # Statements are recorded without a frame, so an open 'db' frame is a commit or rollback.
+    # Not every rollback is followed by an event that ends it (Session.close() rolls back without
+    # the session's after_rollback), so one still open when anything else happens ends there
+    if g.timing_stack[-1][0] == 'db':
+        _stop()
+
+
+def _record(phase, seconds):
+    g.timing_phases[phase] = g.timing_phases.get(phase, 0.0) + seconds
+
+
+@contextmanager
+def timed(phase):
+    """Attribute the time spent in the block to ``phase``; a no-op outside a request."""
+    if not _active():
+        yield
+        return
+    _start(phase)
+    try:
+        yield
+    finally:
+        _end_transaction()
+        _stop()
+
+
+def timed_view(phase):
+    """Decorator attributing a view's own time (outside db, render and upstream) to ``phase``."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            with timed(phase):
+                return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _record_statement(conn, statement, parameters, executemany, seconds):
+    if _active():
+        _end_transaction()
+        _record('db', seconds)
+        g.timing_stack[-1][2] += seconds
+
+
+def _start_transaction_end(conn):
+    # Fired just before the DBAPI commit or rollback, which run no cursor events
+    if _active():
+        _start('db')
+
+
+def _stop_transaction_end(*args):
+    if _active():
+        _end_transaction()
+
+
+def _before_render(sender, template, context, **extra):
+    if _active():
+        _start('render')
+
+
+def _after_render(sender, template, context, **extra):
+    if _active():
+        _end_transaction()
+        if g.timing_stack[-1][0] == 'render':
+            _stop()
+
+
+def format_header(phases):
+    """Server-Timing header value for a mapping of phase -> seconds."""
+    return ', '.join(f'{phase};dur={seconds * 1000:.1f}' for phase, seconds in phases.items())
+
+
+def init_server_timing(app, db):
+    """Time every request's phases and add the Server-Timing header."""
+    if not app.config['SERVER_TIMING']:
+        return
+    with app.app_context():
+        for engine in db.engines.values():
+            on_statement(engine, _record_statement)
+            if not event.contains(engine, 'commit', _start_transaction_end):
+                event.listen(engine, 'commit', _start_transaction_end)
+                event.listen(engine, 'rollback', _start_transaction_end)
+                # A failed commit or rollback ends here instead of in the session events, and one
+                # made by Session.close() or an invalidated connection ends when it goes back to the pool
+                event.listen(engine, 'handle_error', _stop_transaction_end)
+                event.listen(engine, 'checkin', _stop_transaction_end)
+                event.listen(engine, 'invalidate', _stop_transaction_end)
+    if not event.contains(db.session, 'after_commit', _stop_transaction_end):
+        event.listen(db.session, 'after_commit', _stop_transaction_end)
+        event.listen(db.session, 'after_rollback', _stop_transaction_end)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_after_render, app)
+
+    @app.before_request
+    def _start_timing():
+        g.timing_phases = {}
+        # The request itself is the outermost phase; its own time is reported as 'app'
+        g.timing_stack = [['app', time.perf_counter(), 0.0]]
+
+    @app.after_request
+    def _add_header(response):
+        if not _active():
+            return response
+        # Close anything left open, such as a commit made outside the session or a view that raised
+        while len(g.timing_stack) > 1:
+            _stop()
+        stack = g.pop('timing_stack')
+        phase, started, nested = stack[0]
+        total = time.perf_counter() - started
+        phases = g.timing_phases
+        phases[phase] = phases.get(phase, 0.0) + total - nested
+        phases['total'] = total
+        response.headers['Server-Timing'] = format_header(phases)
+        logger.debug('request timing', extra={'path': request.path, **{
+            f'{name}_ms': round(seconds * 1000, 3) for name, seconds in phases.items()}})
+        return response
@@ -0,0 +1,201 @@
+'''
+Slow-query log for HealthTracker
+Statements that take at least SLOW_QUERY_MS are written as JSON lines to a
+rotating file (SLOW_QUERY_LOG, <instance>/slow_queries.log when unset) with
+their SQL, bound parameters, duration and the endpoint that ran them. With
+SLOW_QUERY_EXPLAIN on, the query plan (EXPLAIN QUERY PLAN on SQLite, EXPLAIN
+elsewhere) is captured as well, by re-running the statement under EXPLAIN
+inside a savepoint, so a failing EXPLAIN cannot abort the request's
+transaction.
+
+A statement is timed until its cursor returns, before any rows are fetched.
+On SQLite a SELECT only computes its first row by then, so a slow SELECT that
+returns many rows is logged with less time than it took, or not at all.
+
+`flask slow-queries summary` groups the log by statement shape. Each process
+writes the file through its own handler, so when several gunicorn workers
+share one file a line may be lost at rotation time.
+'''
+import json
+import logging
+import logging.handlers
+import math
+import os
+from datetime import datetime
+
+import click
+from flask import current_app, has_request_context, request
+from flask.cli import AppGroup
+
+from db_events import on_statement
+from query_guard import statement_shape
+
+# Parameters are truncated in the log so a bulk insert cannot fill it
+PARAMETER_CHARS = 1000
+# Savepoint the EXPLAIN of a slow query runs in, outside SQLite
+EXPLAIN_SAVEPOINT = 'slow_query_explain'
+
+
+def _parameters(parameters):
+    try:
+        text = json.dumps(parameters, default=str)
+    except (TypeError, ValueError):
+        text = repr(parameters)
+    return text[:PARAMETER_CHARS]
+
+
+def _query_plan(conn, statement, parameters):
+    """
+    The plan of a statement, as rows of strings, or an error message.
+
+    The EXPLAIN runs on the request's own connection, and on PostgreSQL a failed
+    statement aborts the whole transaction, so outside SQLite it runs inside a
+    savepoint that is rolled back to when it fails.
+    """
+    sqlite = conn.dialect.name == 'sqlite'
+    cursor = conn.connection.cursor()
+    try:
+        if not sqlite:
+            cursor.execute(f'SAVEPOINT {EXPLAIN_SAVEPOINT}')
+        try:
+            cursor.execute(('EXPLAIN QUERY PLAN ' if sqlite else 'EXPLAIN ') + statement, parameters)
+            # SQLite rows are (id, parent, notused, detail)
+            plan = [row[3] if sqlite else ' '.join(str(value) for value in row) for row in cursor.fetchall()]
+        except Exception as e:  # the plan is best effort; the statement itself already succeeded
+            if not sqlite:
+                cursor.execute(f'ROLLBACK TO SAVEPOINT {EXPLAIN_SAVEPOINT}')
+            plan = [f'EXPLAIN failed: {e}']
+        if not sqlite:
+            cursor.execute(f'RELEASE SAVEPOINT {EXPLAIN_SAVEPOINT}')
+        return plan
+    except Exception as e:
+        return [f'EXPLAIN failed: {e}']
+    finally:
+        cursor.close()
+
+
+class SlowQueryLog:
+    """Engine listener writing statements over a threshold to a rotating JSON-lines file."""
+
+    def __init__(self, path, threshold_ms, explain=False, max_bytes=10 * 1024 * 1024, backups=5):
+        self.threshold = threshold_ms / 1000
+        self.explain = explain
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups,
+                                                            encoding='utf-8', delay=True)
+        self.handler.setFormatter(logging.Formatter('%(message)s'))
+
+    def install(self, engine):
+        on_statement(engine, self.record)
+
+    def record(self, conn, statement, parameters, executemany, elapsed):
+        if elapsed < self.threshold:
+            return
+        entry = {
+            'time': datetime.now().isoformat(timespec='milliseconds'),
+            'ms': round(elapsed * 1000, 3),
+            'statement': statement,
+            'parameters': _parameters(parameters),
+            'executemany': executemany,
+            'endpoint': request.endpoint if has_request_context() else None,
+            'path': request.path if has_request_context() else None,
+        }
+        if self.explain and not executemany and statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+            entry['plan'] = _query_plan(conn, statement, parameters)
+        record = logging.LogRecord(__name__, logging.WARNING, __file__, 0, json.dumps(entry), None, None)
+        self.handler.handle(record)
+
+
+def read_entries(path):
+    """Entries from the log and its rotated backups, oldest file first; unreadable lines are skipped."""
+    paths = [path]
+    index = 1
+    while os.path.exists(f'{path}.{index}'):
+        paths.insert(0, f'{path}.{index}')
+        index += 1
+    for name in paths:
+        if not os.path.exists(name):
+            continue
+        with open(name, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+def summarize(entries):
+    """
+    Group slow-query entries by statement shape.
+
+    Args:
+        entries: Iterable of log entries
+
+    Returns:
+        List of dicts (shape, count, total_ms, mean_ms, p95_ms, max_ms, endpoints, slowest),
+        largest total time first
+    """
+    groups = {}
+    for entry in entries:
+        groups.setdefault(statement_shape(entry['statement']), []).append(entry)
+    summary = []
+    for shape, group in groups.items():
+        durations = sorted(entry['ms'] for entry in group)
+        endpoints = {}
+        for entry in group:
+            endpoints[entry.get('endpoint') or '-'] = endpoints.get(entry.get('endpoint') or '-', 0) + 1
+        summary.append({
+            'shape': shape,
+            'count': len(durations),
+            'total_ms': sum(durations),
+            'mean_ms': sum(durations) / len(durations),
+            'p95_ms': durations[min(len(durations) - 1, math.ceil(0.95 * len(durations)) - 1)],
+            'max_ms': durations[-1],
+            'endpoints': endpoints,
+            'slowest': max(group, key=lambda entry: entry['ms']),
+        })
+    return sorted(summary, key=lambda group: group['total_ms'], reverse=True)
+
+
+def init_slow_queries(app, db):
+    """Install the slow-query listener when SLOW_QUERY_MS is set and register the summary command."""
+    if app.config['SLOW_QUERY_LOG'] is None:
+        app.config['SLOW_QUERY_LOG'] = os.path.join(app.instance_path, 'slow_queries.log')
+
+    if app.config['SLOW_QUERY_MS'] > 0:
+        log = app.extensions['slow_queries'] = SlowQueryLog(
+            app.config['SLOW_QUERY_LOG'], app.config['SLOW_QUERY_MS'], explain=app.config['SLOW_QUERY_EXPLAIN'],
+            max_bytes=app.config['SLOW_QUERY_LOG_MAX_BYTES'], backups=app.config['SLOW_QUERY_LOG_BACKUPS'])
+        with app.app_context():
+            for engine in db.engines.values():
+                log.install(engine)
+
+    group = AppGroup('slow-queries', help='Inspect the slow-query log.')
+
+    @group.command('summary')
+    @click.option('--log', 'path', default=None, help='Log file; defaults to SLOW_QUERY_LOG.')
+    @click.option('--top', default=20, show_default=True, help='Statement shapes to show.')
+    @click.option('--plans/--no-plans', default=True, help='Show the plan of the slowest run of each shape.')
+    def summary_command(path, top, plans):
+        """Group logged slow queries by statement shape, largest total time first."""
+        path = path or current_app.config['SLOW_QUERY_LOG']
+        groups = summarize(read_entries(path))
+        if not groups:
+            click.echo(f'No slow queries in {path}')
+            return
+        click.echo(f"{'count':>7}{'total ms':>11}{'mean ms':>10}{'p95 ms':>10}{'max ms':>10}  statement")
+        for shape_group in groups[:top]:
+            click.echo(f"{shape_group['count']:>7}{shape_group['total_ms']:>11.1f}{shape_group['mean_ms']:>10.1f}"
+                       f"{shape_group['p95_ms']:>10.1f}{shape_group['max_ms']:>10.1f}  {shape_group['shape'][:160]}")
+            endpoints = ', '.join(f'{name} x{count}' for name, count in
+                                  sorted(shape_group['endpoints'].items(), key=lambda item: -item[1]))
+            click.echo(f"{'':>48}endpoints: {endpoints}")
+            slowest = shape_group['slowest']
+            click.echo(f"{'':>48}slowest: {slowest['ms']} ms, parameters {slowest['parameters'][:160]}")
+            if plans and slowest.get('plan'):
+                for row in slowest['plan']:
+                    click.echo(f"{'':>48}plan: {row}")
+        if len(groups) > top:
+            click.echo(f'... {len(groups) - top} more shapes')
+
+    app.cli.add_command(group)
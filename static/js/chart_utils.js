@@ -120,17 +120,99 @@ function createCalorieChart(ctx, labels, caloriesIn, caloriesBurned) {
   });
 }
 
-// Function to load chart data via AJAX
-function fetchChartData(period) {
-  return fetch(`/api/chart_data?period=${period}`)
+// Weight chart: readings as points and the smoothed trend as a line
+function createWeightChart(ctx, labels, weights, trend) {
+  return new Chart(ctx, {
+    type: 'line',
+    data: {
+      labels: labels,
+      datasets: [
+        {
+          label: 'Weight',
+          data: weights,
+          showLine: false,
+          backgroundColor: 'rgba(108, 117, 125, 0.6)',
+          borderColor: 'rgba(108, 117, 125, 0.6)',
+          pointRadius: 2
+        },
+        {
+          label: 'Trend',
+          data: trend,
+          borderColor: 'rgba(13, 110, 253, 1)',
+          backgroundColor: 'rgba(13, 110, 253, 0.2)',
+          borderWidth: 2,
+          pointRadius: 0,
+          fill: false
+        }
+      ]
+    },
+    options: {
+      ...chartOptions,
+      plugins: {
+        ...chartOptions.plugins,
+        tooltip: {
+          ...chartOptions.plugins.tooltip,
+          callbacks: {
+            label: context => `${context.dataset.label}: ${context.parsed.y} kg`
+          }
+        }
+      },
+      scales: {
+        ...chartOptions.scales,
+        y: {
+          ...chartOptions.scales.y,
+          beginAtZero: false,
+          ticks: { precision: 1 }
+        }
+      }
+    }
+  });
+}
+
+// Last response per URL, reused when the server answers 304 Not Modified
+const chartDataCache = {};
+
+// Fetch chart JSON, revalidating against the last response for the same URL
+function fetchCachedJson(url) {
+  const cached = chartDataCache[url];
+  const headers = {};
+  if (cached) {
+    headers['If-None-Match'] = cached.etag;
+  }
+
+  return fetch(url, { headers: headers })
     .then(response => {
+      if (response.status === 304 && cached) {
+        return cached.data;
+      }
       if (!response.ok) {
         throw new Error('Network response was not ok');
       }
-      return response.json();
+      const etag = response.headers.get('ETag');
+      return response.json().then(data => {
+        if (etag) {
+          chartDataCache[url] = { etag: etag, data: data };
+        }
+        return data;
+      });
     })
     .catch(error => {
       console.error('Error fetching chart data:', error);
       return null;
     });
 }
+
+// Function to load chart data via AJAX
+function fetchChartData(period) {
+  return fetchCachedJson(`/api/chart_data?period=${period}`);
+}
+
+// Chart data for any range; the server buckets and downsamples it to at most `points` points.
+// start and end are YYYY-MM-DD strings, granularity is 'auto', 'day', 'week' or 'month'.
+function fetchChartRange(start, end, granularity = 'auto', points = null) {
+  const params = new URLSearchParams({ start: start, end: end, granularity: granularity });
+  if (points) {
+    params.set('points', points);
+  }
+  return fetchCachedJson(`/api/chart_range?${params}`);
+}
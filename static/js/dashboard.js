@@ -11,9 +11,114 @@ let yearlyChart = null;
 // Initialize weekly chart with data passed from server
 function initWeeklyChart(labels, caloriesIn, caloriesBurned) {
   const ctx = document.getElementById('weeklyChart').getContext('2d');
+  if (weeklyChart) {
+    weeklyChart.destroy();
+  }
   weeklyChart = createCalorieChart(ctx, labels, caloriesIn, caloriesBurned);
 }
 
+// Set a progress bar's width, colour and the status line under it
+function setProgress(name, percent, level, message) {
+  const bar = document.getElementById(`${name}-progress`);
+  bar.className = `progress-bar bg-${level}`;
+  bar.style.width = `${Math.min(percent, 100)}%`;
+  bar.setAttribute('aria-valuenow', percent);
+
+  const status = document.getElementById(`${name}-status`);
+  status.className = `text-${level} mb-0 small`;
+  status.textContent = message;
+}
+
+function showMessages(messages) {
+  const container = document.getElementById('flash-messages');
+  container.replaceChildren();
+  messages.forEach(([category, message]) => {
+    const alert = document.createElement('div');
+    alert.className = `alert alert-${category} alert-dismissible fade show`;
+    alert.setAttribute('role', 'alert');
+    alert.textContent = message;
+    const close = document.createElement('button');
+    close.type = 'button';
+    close.className = 'btn-close';
+    close.setAttribute('data-bs-dismiss', 'alert');
+    close.setAttribute('aria-label', 'Close');
+    alert.appendChild(close);
+    container.appendChild(alert);
+  });
+}
+
+function fillTable(name, rows) {
+  const table = document.getElementById(`recent-${name}`);
+  const body = table.querySelector('tbody');
+  body.replaceChildren();
+  rows.forEach(cells => {
+    const row = document.createElement('tr');
+    cells.forEach(text => {
+      const cell = document.createElement('td');
+      cell.textContent = text;
+      row.appendChild(cell);
+    });
+    body.appendChild(row);
+  });
+  table.classList.toggle('d-none', rows.length === 0);
+  document.getElementById(`recent-${name}-empty`).classList.toggle('d-none', rows.length > 0);
+}
+
+// Fill the dashboard page, which is served as a static shell, from /api/dashboard
+function loadDashboard(url) {
+  return fetch(url, { headers: { 'Accept': 'application/json' } })
+    .then(response => {
+      if (!response.ok) {
+        throw new Error(`Dashboard request failed: ${response.status}`);
+      }
+      return response.json();
+    })
+    .then(data => {
+      showMessages(data.messages);
+      document.querySelectorAll('input[name="csrf_token"]').forEach(input => {
+        input.value = data.csrf_token || '';
+      });
+
+      document.querySelectorAll('[data-field]').forEach(element => {
+        const [group, key] = element.dataset.field.split('.');
+        element.textContent = data[group][key];
+      });
+      const net = document.getElementById('net-calories');
+      net.classList.toggle('text-success', data.today.net_calories > 0);
+      net.classList.toggle('text-danger', data.today.net_calories <= 0);
+
+      const calories = data.percent.calories;
+      if (calories > 100) {
+        setProgress('calories', calories, 'danger', `${calories}% of daily target`);
+      } else {
+        setProgress('calories', calories, calories <= 90 ? 'success' : 'warning', `${calories}% of daily target`);
+      }
+      const protein = data.percent.protein;
+      if (protein > 150) {
+        setProgress('protein', protein, 'warning', `${protein}% of daily target`);
+      } else if (protein < 50) {
+        setProgress('protein', protein, 'danger', `Only ${protein}% of target`);
+      } else {
+        setProgress('protein', protein, 'success', `${protein}% of daily target`);
+      }
+      document.querySelectorAll('[data-breakdown]').forEach(bar => {
+        const value = data.today[bar.dataset.breakdown];
+        bar.style.width = `${Math.min(value / bar.dataset.scale * 100, 100)}%`;
+        bar.setAttribute('aria-valuenow', value);
+      });
+
+      fillTable('food', data.recent_food_logs.map(log => [log.name, log.calories, log.date]));
+      fillTable('exercise', data.recent_exercise_logs.map(
+        log => [log.name, `${log.duration} min`, log.calories_burned, log.date]));
+
+      initWeeklyChart(data.week.labels, data.week.calories, data.week.calories_burned);
+      return data;
+    })
+    .catch(error => {
+      console.error('Error loading dashboard:', error);
+    });
+}
+
 // Function to load chart data for monthly and yearly views
 function loadChartData(period) {
   // Show loading indicator
@@ -55,6 +160,27 @@ function loadChartData(period) {
     });
 }
 
+// Fill the streak, moving average and adherence cards from /api/stats
+function loadRollingStats(url) {
+  return fetch(url, { headers: { 'Accept': 'application/json' } })
+    .then(response => {
+      if (!response.ok) {
+        throw new Error(`Statistics request failed: ${response.status}`);
+      }
+      return response.json();
+    })
+    .then(stats => {
+      document.querySelectorAll('[data-stat]').forEach(element => {
+        const value = element.dataset.stat.split('.').reduce((node, key) => node == null ? node : node[key], stats);
+        element.textContent = value == null ? '\u2013' : Math.round(value);
+      });
+      return stats;
+    })
+    .catch(error => {
+      console.error('Error loading statistics:', error);
+    });
+}
+
 // Initialize dashboard elements when the DOM is fully loaded
 document.addEventListener('DOMContentLoaded', function() {
   // Track active tab for charts
@@ -74,6 +200,14 @@ document.addEventListener('DOMContentLoaded', function() {
     });
   });
 
+  // Load monthly and yearly data when their tabs are first opened
+  [['monthly-tab', 'month'], ['yearly-tab', 'year']].forEach(([id, period]) => {
+    const tab = document.getElementById(id);
+    if (tab) {
+      tab.addEventListener('click', () => loadChartData(period), { once: true });
+    }
+  });
+
   // Handle natural language input form submissions
   const nlpForm = document.querySelector('form[action="/process_query"]');
   if (nlpForm) {
@@ -0,0 +1,51 @@
+'''
+Template compilation settings for HealthTracker
+Compiled Jinja bytecode is kept in a directory shared by all workers, and a
+CLI step compiles every template at deploy time so new workers start warm.
+'''
+import os
+import time
+
+import click
+from jinja2 import FileSystemBytecodeCache
+
+
+def init_templating(app):
+    """
+    Attach the bytecode cache to the app's Jinja environment and register the CLI.
+
+    Args:
+        app: Flask app; JINJA_BYTECODE_CACHE_DIR selects the cache directory,
+             an empty value disables the cache
+    """
+    cache_dir = app.config.get('JINJA_BYTECODE_CACHE_DIR')
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(cache_dir)
+
+    @app.cli.command('precompile-templates')
+    def precompile_templates_command():
+        """Compile every template into the bytecode cache."""
+        timings = precompile_templates(app)
+        for name, elapsed in timings:
+            click.echo(f'{elapsed * 1000:8.1f} ms  {name}')
+        click.echo(f'Compiled {len(timings)} templates into {cache_dir or "memory only"}')
+
+
+def precompile_templates(app):
+    """
+    Load every template so its bytecode is written to the cache.
+
+    Args:
+        app: Flask app
+
+    Returns:
+        List of (template name, seconds taken) tuples
+    """
+    timings = []
+    env = app.jinja_env
+    for name in env.list_templates(extensions=['html']):
+        start = time.perf_counter()
+        env.get_template(name)
+        timings.append((name, time.perf_counter() - start))
+    return timings
@@ -0,0 +1,336 @@
+'''
+Per-user daily time series for HealthTracker reports
+A DailySeries holds one contiguous array per metric, indexed by day offset
+from its start date, instead of a list of FoodLog/ExerciseLog objects. It is
+filled from a single aggregate query over the live logs plus any archived
+segments, and answers range totals in O(1) through prefix sums.
+'''
+from array import array
+from datetime import date, timedelta
+
+import sqlalchemy as sa
+
+from app import db
+from archive import archived_logs_by_kind
+from models import FoodLog, ExerciseLog
+
+FOOD_FIELDS = ('calories', 'protein', 'carbohydrates', 'fiber', 'sugar', 'sodium')
+EXERCISE_FIELDS = ('calories_burned', 'minutes')
+
+# Array typecode per metric; entry counts are whole numbers. Durations from the
+# exercise API can be fractional, but are shown as whole minutes when they are.
+_TYPECODES = dict(
+    {field: 'd' for field in FOOD_FIELDS},
+    calories_burned='d', minutes='d', food_entries='q', exercise_entries='q',
+)
+_WHOLE_WHEN_EXACT = ('minutes',)
+
+# Entry counter deciding whether a day (or range) has any data for a metric
+_ENTRIES = dict(
+    {field: 'food_entries' for field in FOOD_FIELDS},
+    calories_burned='exercise_entries', minutes='exercise_entries',
+)
+
+# Range sums of floats are rounded so prefix differences do not show up as 1e-13 noise
+_PRECISION = 6
+
+
+class DailySeries:
+    """
+    Daily food and exercise totals for one user between two dates inclusive.
+
+    Metrics are FOOD_FIELDS, EXERCISE_FIELDS and the food_entries and
+    exercise_entries counters. Ranges passed to total(), daily() and
+    days_with() default to the whole series and are clipped to it.
+    """
+
+    def __init__(self, start_date, end_date):
+        self.start_date = start_date
+        self.end_date = end_date
+        self.days = max((end_date - start_date).days + 1, 0)
+        self._values = {field: array(typecode, [0]) * self.days for field, typecode in _TYPECODES.items()}
+        self._prefix = {}
+
+    def add(self, day, field, amount):
+        """Add ``amount`` to ``field`` on ``day``; days outside the series are ignored."""
+        index = (day - self.start_date).days
+        if amount and 0 <= index < self.days:
+            self._values[field][index] += amount
+            self._prefix.clear()
+
+    def _span(self, start_date, end_date):
+        first = 0 if start_date is None else max((start_date - self.start_date).days, 0)
+        last = self.days if end_date is None else min((end_date - self.start_date).days + 1, self.days)
+        return first, max(first, last)
+
+    def _prefix_of(self, key):
+        prefix = self._prefix.get(key)
+        if prefix is None:
+            if isinstance(key, tuple):  # ('days', counter): number of days with entries
+                values = (1 if count else 0 for count in self._values[key[1]])
+                typecode = 'q'
+            else:
+                values = self._values[key]
+                typecode = _TYPECODES[key]
+            prefix = array(typecode, [0])
+            running = 0
+            for value in values:
+                running += value
+                prefix.append(running)
+            self._prefix[key] = prefix
+        return prefix
+
+    def _clean(self, field, value, entries):
+        if not entries:
+            return 0
+        if _TYPECODES[field] != 'd':
+            return value
+        value = round(value, _PRECISION)
+        return int(value) if field in _WHOLE_WHEN_EXACT and value.is_integer() else value
+
+    def total(self, field, start_date=None, end_date=None):
+        """Sum of ``field`` over a date range (0 when the range has no entries)."""
+        first, last = self._span(start_date, end_date)
+        counts = self._prefix_of(_ENTRIES.get(field, field))
+        prefix = self._prefix_of(field)
+        return self._clean(field, prefix[last] - prefix[first], counts[last] - counts[first])
+
+    def daily(self, field, start_date=None, end_date=None):
+        """Per-day values of ``field`` over a date range, 0 on days without entries."""
+        first, last = self._span(start_date, end_date)
+        values = self._values[field]
+        counts = self._values[_ENTRIES.get(field, field)]
+        return [self._clean(field, values[i], counts[i]) for i in range(first, last)]
+
+    def days_with(self, kind, start_date=None, end_date=None):
+        """Number of days with at least one 'food' or 'exercise' entry in a date range."""
+        first, last = self._span(start_date, end_date)
+        prefix = self._prefix_of(('days', f'{kind}_entries'))
+        return prefix[last] - prefix[first]
+
+    def dates(self):
+        """Every date covered by the series, in order."""
+        return [self.start_date + timedelta(days=i) for i in range(self.days)]
+
+
+def chart_start(period, today):
+    """First day covered by the dashboard chart for 'week', 'month' or 'year' (anything else)."""
+    if period == 'week':
+        return today - timedelta(days=6)
+    if period == 'month':
+        return today - timedelta(days=29)
+    return (today - timedelta(days=365)).replace(day=1)
+
+
+def chart_series(series, period, today):
+    """
+    Build the dashboard chart data from a series starting at chart_start(period, today).
+
+    Week and month charts have one point per day; the year chart has one per
+    calendar month, oldest first.
+
+    Args:
+        series: DailySeries ending today
+        period: 'week', 'month' or 'year'
+        today: Last day of the chart
+
+    Returns:
+        Dict of labels, foodData, exerciseData and netData lists
+    """
+    if period in ('week', 'month'):
+        date_format = '%a' if period == 'week' else '%d'
+        labels = [day.strftime(date_format) for day in series.dates()]
+        food_data = series.daily('calories')
+        exercise_data = series.daily('calories_burned')
+    else:
+        labels = [(today - timedelta(days=30 * i)).strftime('%b') for i in range(11, -1, -1)]
+        food_data = []
+        exercise_data = []
+        for months_back in range(11, -1, -1):
+            month_index = today.year * 12 + today.month - 1 - months_back
+            month_start = date(month_index // 12, month_index % 12 + 1, 1)
+            month_end = (month_start + timedelta(days=31)).replace(day=1) - timedelta(days=1)
+            food_data.append(series.total('calories', month_start, month_end))
+            exercise_data.append(series.total('calories_burned', month_start, month_end))
+
+    return {
+        'labels': labels,
+        'foodData': food_data,
+        'exerciseData': exercise_data,
+        # Net calories (intake - burned)
+        'netData': [food - burned for food, burned in zip(food_data, exercise_data)],
+    }
+
+
+GRANULARITIES = ('day', 'week', 'month')
+
+
+def auto_granularity(start_date, end_date, max_points):
+    """The finest granularity that fits the range in ``max_points`` buckets, else 'month'."""
+    days = (end_date - start_date).days + 1
+    if days <= max_points:
+        return 'day'
+    if days / 7 <= max_points:
+        return 'week'
+    return 'month'
+
+
+def bucket_starts(start_date, end_date, granularity):
+    """
+    First day of each bucket covering a date range.
+
+    Weeks start on Monday and months on the 1st; the first bucket starts at
+    ``start_date`` itself, so a range need not be aligned.
+    """
+    starts = [start_date]
+    while True:
+        current = starts[-1]
+        if granularity == 'day':
+            following = current + timedelta(days=1)
+        elif granularity == 'week':
+            following = current + timedelta(days=7 - current.weekday())
+        else:
+            following = (current.replace(day=1) + timedelta(days=32)).replace(day=1)
+        if following > end_date:
+            return starts
+        starts.append(following)
+
+
+def lttb(values, threshold):
+    """
+    Largest-Triangle-Three-Buckets downsampling.
+
+    Keeps the first and last points and, from each of ``threshold - 2`` equal
+    buckets in between, the point forming the largest triangle with the point
+    kept before it and the mean of the next bucket. Peaks and troughs survive,
+    which averaging would flatten. Points are taken as evenly spaced.
+
+    Args:
+        values: Sequence of numbers
+        threshold: Number of points to keep, at least 3
+
+    Returns:
+        Sorted indices of the kept points
+    """
+    count = len(values)
+    if threshold >= count:
+        return list(range(count))
+    if threshold < 3:
+        raise ValueError('LTTB needs a threshold of at least 3')
+    kept = [0]
+    size = (count - 2) / (threshold - 2)
+    previous = 0
+    for bucket in range(threshold - 2):
+        first = int(bucket * size) + 1
+        last = int((bucket + 1) * size) + 1
+        next_first, next_last = last, min(int((bucket + 2) * size) + 1, count)
+        mean_x = (next_first + next_last - 1) / 2
+        mean_y = sum(values[next_first:next_last]) / (next_last - next_first)
+        best, best_area = first, -1.0
+        for i in range(first, last):
+            area = abs((previous - mean_x) * (values[i] - values[previous])
+                       - (previous - i) * (mean_y - values[previous]))
+            if area > best_area:
+                best, best_area = i, area
+        kept.append(best)
+        previous = best
+    kept.append(count - 1)
+    return kept
+
+
+def range_series(series, granularity, max_points):
+    """
+    Build chart data for an arbitrary range, downsampled to at most ``max_points``.
+
+    Days are summed into day, week or month buckets; when that still leaves
+    more than ``max_points`` buckets, LTTB picks the points to keep, half of
+    them chosen to preserve the shape of calories in and half calories burned.
+
+    Args:
+        series: DailySeries covering the range
+        granularity: 'day', 'week' or 'month'
+        max_points: Largest number of points returned, at least 6
+
+    Returns:
+        Dict of labels (ISO date of each bucket start), foodData, exerciseData
+        and netData lists, plus the granularity and whether points were dropped
+    """
+    starts = bucket_starts(series.start_date, series.end_date, granularity)
+    if granularity == 'day':
+        food_data = series.daily('calories')
+        exercise_data = series.daily('calories_burned')
+    else:
+        ends = [following - timedelta(days=1) for following in starts[1:]] + [series.end_date]
+        food_data = [series.total('calories', start, end) for start, end in zip(starts, ends)]
+        exercise_data = [series.total('calories_burned', start, end) for start, end in zip(starts, ends)]
+
+    indices = range(len(starts))
+    downsampled = len(starts) > max_points
+    if downsampled:
+        food_budget = max_points // 2
+        indices = sorted(set(lttb(food_data, food_budget)) | set(lttb(exercise_data, max_points - food_budget)))
+    food_data = [food_data[i] for i in indices]
+    exercise_data = [exercise_data[i] for i in indices]
+    return {
+        'granularity': granularity,
+        'downsampled': downsampled,
+        'labels': [starts[i].isoformat() for i in indices],
+        'foodData': food_data,
+        'exerciseData': exercise_data,
+        'netData': [food - burned for food, burned in zip(food_data, exercise_data)],
+    }
+
+
+def _summed(column):
+    return sa.func.coalesce(sa.func.sum(column), 0)
+
+
+def load_series(user_id, start_date, end_date):
+    """
+    Build a user's DailySeries from the database.
+
+    Live logs are aggregated per day in one query; archived logs in the range
+    come from a single segment lookup.
+
+    Args:
+        user_id: Owner of the logs
+        start_date: First day of the series
+        end_date: Last day of the series (inclusive)
+
+    Returns:
+        DailySeries
+    """
+    zero = sa.literal(0)
+    food = sa.select(
+        sa.literal('food'), FoodLog.only_date, sa.func.count(FoodLog.id),
+        *(_summed(getattr(FoodLog, field)) for field in FOOD_FIELDS), zero, zero,
+    ).where(
+        FoodLog.user_id == user_id,
+        FoodLog.only_date >= start_date,
+        FoodLog.only_date <= end_date
+    ).group_by(FoodLog.only_date)
+    exercise = sa.select(
+        sa.literal('exercise'), ExerciseLog.only_date, sa.func.count(ExerciseLog.id),
+        *(zero for _ in FOOD_FIELDS), _summed(ExerciseLog.calories_burned), _summed(ExerciseLog.duration),
+    ).where(
+        ExerciseLog.user_id == user_id,
+        ExerciseLog.only_date >= start_date,
+        ExerciseLog.only_date <= end_date
+    ).group_by(ExerciseLog.only_date)
+
+    series = DailySeries(start_date, end_date)
+    for kind, day, entries, *sums in db.session.execute(sa.union_all(food, exercise)):
+        series.add(day, f'{kind}_entries', entries)
+        for field, amount in zip(FOOD_FIELDS + EXERCISE_FIELDS, sums):
+            series.add(day, field, amount)
+
+    archived = archived_logs_by_kind(user_id, start_date, end_date)
+    for log in archived['food']:
+        series.add(log.only_date, 'food_entries', 1)
+        for field in FOOD_FIELDS:
+            series.add(log.only_date, field, getattr(log, field))
+    for log in archived['exercise']:
+        series.add(log.only_date, 'exercise_entries', 1)
+        series.add(log.only_date, 'calories_burned', log.calories_burned)
+        series.add(log.only_date, 'minutes', log.duration)
+    return series
@@ -0,0 +1,117 @@
+'''
+Cached user loader for HealthTracker
+Flask-Login resolves the logged-in user on every request. Instead of a
+database round-trip each time, each process keeps a bounded LRU of read-only
+profile snapshots.
+
+Every profile change, weigh-ins included, bumps User.profile_version and
+records the new version in the session cookie of the browser that made it. A
+worker whose snapshot is older than the version the cookie asks for reloads
+it, so that browser sees its own edit at once, whichever worker answers.
+
+Other devices and sessions have no such signal, so a snapshot is trusted for
+USER_CACHE_TTL seconds only. After that it is revalidated with a one-column
+primary-key read of the stored version, and reloaded only if it changed. An
+edit made elsewhere therefore reaches a session within USER_CACHE_TTL.
+'''
+import time
+
+import sqlalchemy as sa
+from flask import current_app, session
+from flask_login import UserMixin
+
+from app import db
+from models import User
+from page_cache import LRUBackend
+
+# Flask session key holding the newest profile version this browser has seen
+PROFILE_VERSION_KEY = '_profile_version'
+
+PROFILE_FIELDS = (
+    'id', 'username', 'email', 'created_at', 'weight', 'height', 'age',
+    'gender', 'activity_level', 'motive', 'profile_version', 'trend_weight',
+)
+
+
+class UserSnapshot(UserMixin):
+    """Read-only copy of a User's profile columns, shared between requests."""
+
+    def __init__(self, user):
+        for field in PROFILE_FIELDS:
+            object.__setattr__(self, field, getattr(user, field))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f'UserSnapshot is read-only; load the User to change {name!r}')
+
+    def __repr__(self):
+        return f'<UserSnapshot {self.username} v{self.profile_version}>'
+
+
+def get_user_cache():
+    """Return the user cache of the current app, creating it on first use."""
+    extensions = current_app.extensions
+    if 'user_cache' not in extensions:
+        extensions['user_cache'] = LRUBackend(max_entries=current_app.config['USER_CACHE_SIZE'])
+    return extensions['user_cache']
+
+
+def _stored_profile_version(user_id):
+    # Deleted users read as None, which never matches, so their snapshot is dropped on reload
+    return db.session.execute(sa.select(User.profile_version).where(User.id == user_id)).scalar()
+
+
+def load_cached_user(user_id):
+    """
+    Return a snapshot of a user for Flask-Login, loading the row only when it is stale or missing.
+
+    Args:
+        user_id: Id of the logged-in user
+
+    Returns:
+        UserSnapshot, or None if the user no longer exists
+    """
+    cache = get_user_cache()
+    entry = cache.get(user_id)
+    if entry is not None:
+        snapshot, expires_at = entry
+        if snapshot.profile_version >= session.get(PROFILE_VERSION_KEY, 0):
+            if time.monotonic() < expires_at:
+                return snapshot
+            if snapshot.profile_version == _stored_profile_version(user_id):
+                # Unchanged elsewhere: trust the snapshot for another USER_CACHE_TTL
+                _store(snapshot)
+                return snapshot
+
+    user = db.session.get(User, user_id)
+    if user is None:
+        cache.delete(user_id)
+        return None
+    return cache_user(user, remember_version=False)
+
+
+def _store(snapshot):
+    get_user_cache().set(snapshot.id, (snapshot, time.monotonic() + current_app.config['USER_CACHE_TTL']))
+
+
+def cache_user(user, remember_version=True):
+    """
+    Store a fresh snapshot of ``user`` in this process's cache.
+
+    Args:
+        user: User that was just loaded, logged in or committed
+        remember_version: Also record its profile version in the session, so
+                          workers holding an older snapshot reload it
+
+    Returns:
+        UserSnapshot
+    """
+    snapshot = UserSnapshot(user)
+    _store(snapshot)
+    if remember_version:
+        session[PROFILE_VERSION_KEY] = snapshot.profile_version
+    return snapshot
+
+
+def invalidate_user(user_id):
+    """Drop any cached snapshot of a user in this process."""
+    get_user_cache().delete(user_id)
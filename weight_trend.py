@@ -0,0 +1,165 @@
+'''
+Body-weight time series for HealthTracker
+Each weigh-in is a WeightLog row that stores, next to the scale reading, the
+exponentially smoothed trend up to that point. Daily weight swings by a kilo
+or more with water and food, so recommendations use the trend, kept on
+User.trend_weight and so in the cached user snapshot, rather than the last
+reading.
+
+The trend moves towards each reading by WEIGHT_TREND_ALPHA per day elapsed
+since the previous weigh-in, so a reading after a long gap counts for more.
+Appending a weigh-in folds one reading into the previous trend; a back-dated
+one refolds only the readings after it.
+
+Readings are also rolled up per week in WeightWeek, so charts over years of
+daily weigh-ins read 52 rows a year, then downsample those with LTTB.
+'''
+from datetime import datetime, time, timedelta
+
+import pytz
+import sqlalchemy as sa
+from flask import current_app
+
+from app import db
+from models import User, WeightLog, WeightWeek
+from timeseries import lttb
+
+tz_ist = pytz.timezone('Asia/Kolkata')
+
+
+def smooth(previous_trend, elapsed_days, weight, alpha):
+    """
+    Fold one reading into the trend.
+
+    Args:
+        previous_trend: Trend before this reading, or None for the first one
+        elapsed_days: Days since the previous reading; same-day readings count as one step
+        weight: The reading
+        alpha: Smoothing factor per day
+
+    Returns:
+        New trend
+    """
+    if previous_trend is None:
+        return weight
+    factor = 1 - (1 - alpha) ** max(elapsed_days, 1)
+    return previous_trend + factor * (weight - previous_trend)
+
+
+def week_start(day):
+    return day - timedelta(days=day.weekday())
+
+
+def _readings_from(user_id, when):
+    """The reading just before ``when`` (or None) and every reading from ``when`` on, in order."""
+    ordering = (WeightLog.date, WeightLog.id)
+    before = db.session.execute(sa.select(WeightLog).where(
+        WeightLog.user_id == user_id, WeightLog.date < when
+    ).order_by(*(column.desc() for column in ordering)).limit(1)).scalar_one_or_none()
+    after = db.session.execute(sa.select(WeightLog).where(
+        WeightLog.user_id == user_id, WeightLog.date >= when
+    ).order_by(*ordering)).scalars().all()
+    return before, after
+
+
+def _update_weeks(user_id, readings, added):
+    """Set the trend of each week touched by ``readings`` and count ``added`` into its week."""
+    trends = {}
+    for reading in readings:
+        trends[week_start(reading.date.date())] = reading.trend
+    # One query for every affected week; per-week lookups would autoflush between updates
+    weeks = {week.week_start: week for week in db.session.execute(sa.select(WeightWeek).where(
+        WeightWeek.user_id == user_id,
+        WeightWeek.week_start >= min(trends)
+    )).scalars()}
+    start = week_start(added.date.date())
+    week = weeks.get(start)
+    if week is None:
+        week = weeks[start] = WeightWeek(user_id=user_id, week_start=start, count=0, total=0,
+                                         minimum=added.weight, maximum=added.weight, trend=added.trend)
+        db.session.add(week)
+    week.count += 1
+    week.total += added.weight
+    week.minimum = min(week.minimum, added.weight)
+    week.maximum = max(week.maximum, added.weight)
+    for start, trend in trends.items():
+        weeks[start].trend = trend
+
+
+def record_weight(user_id, weight, when=None):
+    """
+    Add a weigh-in and bring the trend, weekly rollup and user up to date.
+
+    Args:
+        user_id: Owner of the reading
+        weight: Weight in kg
+        when: Datetime of the reading (IST), now when omitted; earlier than the
+              latest reading re-smooths the readings after it
+
+    Returns:
+        The new WeightLog, added to the session but not committed
+    """
+    when = when or datetime.now(tz_ist).replace(tzinfo=None)
+    alpha = current_app.config['WEIGHT_TREND_ALPHA']
+    previous, later = _readings_from(user_id, when)
+
+    reading = WeightLog(user_id=user_id, date=when, weight=weight)
+    db.session.add(reading)
+    readings = [reading] + list(later)
+    trend = previous.trend if previous is not None else None
+    last_date = previous.date if previous is not None else None
+    for item in readings:
+        elapsed = (item.date.date() - last_date.date()).days if last_date is not None else 0
+        trend = item.trend = smooth(trend, elapsed, item.weight, alpha)
+        last_date = item.date
+    _update_weeks(user_id, readings, reading)
+
+    user = db.session.get(User, user_id)
+    latest = readings[-1]
+    user.weight = latest.weight
+    user.trend_weight = latest.trend
+    user.profile_version = User.profile_version + 1
+    return reading
+
+
+def weight_series(user_id, start_date, end_date, max_points):
+    """
+    Weight chart data between two dates inclusive.
+
+    Ranges of up to ``max_points`` days are read from the weigh-ins themselves;
+    longer ones from the weekly rollup. Either is downsampled with LTTB on the
+    trend when it still has more than ``max_points`` points.
+
+    Returns:
+        Dict of source ('daily' or 'weekly'), downsampled, labels (ISO dates),
+        weight (readings, or weekly means) and trend lists
+    """
+    if (end_date - start_date).days + 1 <= max_points:
+        source = 'daily'
+        rows = db.session.execute(sa.select(WeightLog.date, WeightLog.weight, WeightLog.trend).where(
+            WeightLog.user_id == user_id,
+            WeightLog.date >= datetime.combine(start_date, time.min),
+            WeightLog.date < datetime.combine(end_date + timedelta(days=1), time.min)
+        ).order_by(WeightLog.date, WeightLog.id)).all()
+        points = [(day.date(), weight, trend) for day, weight, trend in rows]
+    else:
+        source = 'weekly'
+        rows = db.session.execute(sa.select(
+            WeightWeek.week_start, WeightWeek.total / WeightWeek.count, WeightWeek.trend
+        ).where(
+            WeightWeek.user_id == user_id,
+            WeightWeek.week_start >= week_start(start_date),
+            WeightWeek.week_start <= end_date
+        ).order_by(WeightWeek.week_start)).all()
+        points = [tuple(row) for row in rows]
+
+    downsampled = len(points) > max_points
+    if downsampled:
+        points = [points[i] for i in lttb([trend for _, _, trend in points], max_points)]
+    return {
+        'source': source,
+        'downsampled': downsampled,
+        'labels': [day.isoformat() for day, _, _ in points],
+        'weight': [round(weight, 2) for _, weight, _ in points],
+        'trend': [round(trend, 2) for _, _, trend in points],
+    }
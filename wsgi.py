@@ -0,0 +1,56 @@
+'''
+WSGI entry point for production serving
+Run under gunicorn, which reads gunicorn.conf.py from the working directory:
+
+    gunicorn wsgi:app
+
+The app is built with FLASK_CONFIG, defaulting to 'production'. main.py stays
+the single-process development server.
+'''
+import gc
+import os
+
+from sqlalchemy import text
+from sqlalchemy.orm import configure_mappers
+
+from app import create_app, db
+from log_config import configure_logging
+
+app = create_app(os.environ.get('FLASK_CONFIG') or 'production')
+
+# Compiled in the master when the app is preloaded, so workers share them copy-on-write
+WARM_TEMPLATES = [
+    'base.html', 'index.html', 'login.html', 'dashboard.html', 'daily_report.html',
+    'weekly_report.html', 'monthly_report.html', 'compare.html', 'profile.html',
+]
+
+
+def preload():
+    """Do the one-off work every worker would otherwise repeat: mappers, templates, NLP client."""
+    configure_mappers()
+    for name in WARM_TEMPLATES:
+        app.jinja_env.get_template(name)
+    from routes import get_nlp_processor
+    with app.app_context():
+        get_nlp_processor()
+    # Keep the collector from touching (and so copying) the pages of these long-lived objects
+    gc.freeze()
+
+
+def after_fork():
+    """Drop state a forked worker must not share with the master: pooled connections and the log thread."""
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+    configure_logging(app)
+
+
+def warm_up():
+    """Open a connection on each engine so a worker's first request does not pay for it."""
+    with app.app_context():
+        for engine in db.engines.values():
+            with engine.connect() as connection:
+                connection.execute(text('SELECT 1'))
+
+
+preload()